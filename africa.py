@@ -8,19 +8,12 @@ if __name__ == "__main__" and not st.runtime.exists():  # pragma: no cover - CLI
     sys.exit(stcli.main())
 from pathlib import Path
 from copy import deepcopy
-from common import BANK_PACK_PRICES, calculate_plan, produtos, setup_page
+from lazy import lazy_import
+from pricing import BANK_PACK_PRICES, MODULOS, cached_calculate_plan, produtos
+from ui import setup_page
 
-WEB_MODULES = {
-    "CRM",
-    "Suporte",
-    "Equipa",
-    "Careers c/ Recrutamento",
-    "Vencimento",
-    "Contabilidade",
-    "Imobilizado",
-}
-
-WEB_ONLY_MODULES = {"Colaborador"}
+# Only needed to export the PDF
+fpdf = lazy_import("fpdf")
 
 
 def format_additional_users(qtd: int, tipo: str | None = None) -> str:
@@ -37,13 +30,6 @@ def format_full_users(qtd: int) -> str:
     return "1 Full User" if qtd == 1 else f"{qtd} Full Users"
 
 
-def format_postos(qtd: int, *, adicional: bool = False) -> str:
-    label = "Posto" if qtd == 1 else "Postos"
-    if adicional:
-        label += " Adicional" if qtd == 1 else " Adicionais"
-    return f"{qtd} {label}"
-
-
 st.set_page_config(layout="centered")
 setup_page(dark=st.get_option("theme.base") == "dark")
 
@@ -72,7 +58,7 @@ else:
     taxa = 75
     moeda = "MZN"
 
-web_modules = set(WEB_MODULES)
+web_modules = {nome for nome, info in MODULOS.items() if info.web}
 if pais == "Angola":
     web_modules.discard("Vencimento")
 
@@ -86,9 +72,7 @@ def format_moeda(valor: float) -> str:
 
 def gerar_pdf(linhas: list[tuple[str, int, float, float]]) -> bytes:
     """Create a simple PDF with a table of products."""
-    from fpdf import FPDF
-
-    pdf = FPDF()
+    pdf = fpdf.FPDF()
     pdf.add_page()
 
     font_name = _FONT_NAME
@@ -160,7 +144,7 @@ for area, modulos in africa_produtos.items():
             if escolha != "Nenhum":
                 info = modulos[escolha]
                 if info.get("per_user"):
-                    if escolha in WEB_ONLY_MODULES:
+                    if MODULOS[escolha].web_only:
                         qtd_web = st.number_input(
                             f"Nº Utilizadores Web - {escolha}",
                             min_value=0,
@@ -221,7 +205,7 @@ for area, modulos in africa_produtos.items():
                         )
                 elif ativado:
                     if info.get("per_user"):
-                        if modulo in WEB_ONLY_MODULES:
+                        if MODULOS[modulo].web_only:
                             qtd_web = st.number_input(
                                 f"Nº Utilizadores Web - {modulo}",
                                 min_value=0,
@@ -268,7 +252,7 @@ for area, modulos in africa_produtos.items():
                         selecoes[modulo] = 1
 
 if st.button("Calcular Plano Recomendado"):
-    resultado = calculate_plan(
+    resultado = cached_calculate_plan(
         plano_atual,
         tipo_gestao,
         utilizadores_desk,
@@ -324,49 +308,36 @@ if st.button("Calcular Plano Recomendado"):
                 )
             )
 
-    pos_info = resultado.get("pos_breakdown")
-    for modulo, custos in resultado["modulos_detalhe"].items():
-        custo_base, custo_desk, custo_web, qtd_desk, qtd_web = custos
-        if modulo == "Ponto de Venda (POS/Restauração)" and pos_info:
-            num_primeiros, ate_10, acima_10, preco_primeiro, preco_2_10, preco_maior_10 = pos_info
-            for _ in range(num_primeiros):
-                detalhes.append(("1º Ponto de Venda (POS/Restauração)", format_moeda(preco_primeiro), False))
-            if ate_10 > 0:
-                total = ate_10 * preco_2_10
-                detalhes.append(
-                    (
-                        f"Ponto de Venda (POS/Restauração) - ({format_postos(ate_10, adicional=True)} - Escalão de 2 a 10)",
-                        f"{format_moeda(total)} ({format_moeda(preco_2_10)} por Posto)",
-                        True,
-                    )
-                )
-            if acima_10 > 0:
-                total = acima_10 * preco_maior_10
-                detalhes.append(
-                    (
-                        f"Ponto de Venda (POS/Restauração) - ({format_postos(acima_10, adicional=True)} - Escalão de 11 a 50)",
-                        f"{format_moeda(total)} ({format_moeda(preco_maior_10)} por Posto)",
-                        True,
-                    )
-                )
+    for linha in resultado.linhas_modulos:
+        modulo = linha.modulo
+        if modulo == "Ponto de Venda (POS/Restauração)" and resultado.linhas_pos:
+            for pos in resultado.linhas_pos:
+                if pos.escalao > 0:
+                    valor = f"{format_moeda(pos.custo)} ({format_moeda(pos.preco_unidade)} por Posto)"
+                    detalhes.append((pos.descricao, valor, True))
+                elif pos.quantidade == 1:
+                    detalhes.append((pos.descricao, format_moeda(pos.preco_unidade), False))
+                else:
+                    valor = f"{format_moeda(pos.custo)} ({format_moeda(pos.preco_unidade)} por Loja)"
+                    detalhes.append((f"{pos.descricao} - ({pos.quantidade} Lojas)", valor, False))
         else:
-            detalhes.append((modulo, format_moeda(custo_base), False))
-            if custo_desk > 0:
-                texto_extra = format_additional_users(qtd_desk, "Desktop")
-                unit_price = custo_desk / qtd_desk if qtd_desk else custo_desk
+            detalhes.append((modulo, format_moeda(linha.custo_base), False))
+            if linha.custo_desktop > 0:
+                texto_extra = format_additional_users(linha.utilizadores_desktop, "Desktop")
+                unit_price = linha.preco_unidade_desktop
                 detalhes.append(
                     (
                         f"{modulo} ({texto_extra})",
-                        f"{format_moeda(custo_desk)} ({format_moeda(unit_price)} por Utilizador)",
+                        f"{format_moeda(linha.custo_desktop)} ({format_moeda(unit_price)} por Utilizador)",
                         True,
                     )
                 )
-            if custo_web > 0:
-                unit_price = custo_web / qtd_web if qtd_web else custo_web
+            if linha.custo_web > 0:
+                unit_price = linha.preco_unidade_web
                 detalhes.append(
                     (
-                        f"{modulo} ({format_additional_users(qtd_web, 'Web')})",
-                        f"{format_moeda(unit_price * qtd_web)} ({format_moeda(unit_price)} por Utilizador)",
+                        f"{modulo} ({format_additional_users(linha.utilizadores_web, 'Web')})",
+                        f"{format_moeda(unit_price * linha.utilizadores_web)} ({format_moeda(unit_price)} por Utilizador)",
                         True,
                     )
                 )
@@ -430,50 +401,35 @@ if st.button("Calcular Plano Recomendado"):
             unit = resultado['custo_extra_utilizadores'] / resultado['extras_utilizadores']
             linhas_pdf.append((f"  {format_full_users(resultado['extras_utilizadores'])} adicional", resultado['extras_utilizadores'], unit, resultado['custo_extra_utilizadores']))
 
-    pos_info = resultado.get('pos_breakdown')
-    for modulo, custos in resultado['modulos_detalhe'].items():
-        custo_base, custo_desk, custo_web, qtd_desk, qtd_web = custos
-
-        if modulo == 'Ponto de Venda (POS/Restauração)' and pos_info:
-            num_primeiros, ate_10, acima_10, preco_primeiro, preco_2_10, preco_maior_10 = pos_info
-            for _ in range(num_primeiros):
-                linhas_pdf.append(("1º Ponto de Venda (POS/Restauração)", 1, preco_primeiro, preco_primeiro))
-            if ate_10 > 0:
-                linhas_pdf.append((
-                    f"  Ponto de Venda (POS/Restauração) - ({format_postos(ate_10, adicional=True)} - Escalão de 2 a 10)",
-                    ate_10,
-                    preco_2_10,
-                    ate_10 * preco_2_10,
-                ))
-            if acima_10 > 0:
-                linhas_pdf.append((
-                    f"  Ponto de Venda (POS/Restauração) - ({format_postos(acima_10, adicional=True)} - Escalão de 11 a 50)",
-                    acima_10,
-                    preco_maior_10,
-                    acima_10 * preco_maior_10,
-                ))
+    for linha in resultado.linhas_modulos:
+        modulo = linha.modulo
+
+        if modulo == 'Ponto de Venda (POS/Restauração)' and resultado.linhas_pos:
+            for pos in resultado.linhas_pos:
+                texto = pos.descricao if pos.escalao == 0 else f"  {pos.descricao}"
+                linhas_pdf.append((texto, pos.quantidade, pos.preco_unidade, pos.custo))
         else:
-            linhas_pdf.append((modulo, 1, custo_base, custo_base))
+            linhas_pdf.append((modulo, 1, linha.custo_base, linha.custo_base))
 
-            if custo_desk > 0:
-                unit_extra = custo_desk / qtd_desk if qtd_desk else custo_desk
-                texto_extra = format_additional_users(qtd_desk, 'Desktop')
+            if linha.custo_desktop > 0:
+                unit_extra = linha.preco_unidade_desktop
+                texto_extra = format_additional_users(linha.utilizadores_desktop, 'Desktop')
                 linhas_pdf.append(
                     (
                         f"  {modulo} ({texto_extra})",
-                        qtd_desk,
+                        linha.utilizadores_desktop,
                         unit_extra,
-                        custo_desk,
+                        linha.custo_desktop,
                     )
                 )
-            if custo_web > 0:
-                unit_extra = custo_web / qtd_web if qtd_web else custo_web
+            if linha.custo_web > 0:
+                unit_extra = linha.preco_unidade_web
                 linhas_pdf.append(
                     (
-                        f"  {modulo} ({format_additional_users(qtd_web, 'Web')})",
-                        qtd_web,
+                        f"  {modulo} ({format_additional_users(linha.utilizadores_web, 'Web')})",
+                        linha.utilizadores_web,
                         unit_extra,
-                        custo_web,
+                        linha.custo_web,
                     )
                 )
 
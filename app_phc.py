@@ -7,8 +7,9 @@ if __name__ == "__main__" and not st.runtime.exists():  # pragma: no cover - CLI
     sys.argv = ["streamlit", "run", __file__] + sys.argv[1:]
     sys.exit(stcli.main())
 
-from common import BANK_PACK_PRICES, calculate_plan, format_euro, produtos, setup_page
-from phc_logic import WEB_MODULES, WEB_ONLY_MODULES
+from pricing import BANK_PACK_PRICES, cached_calculate_plan, format_euro, produtos
+from ui import setup_page
+from phc_logic import MODULOS
 
 
 def format_additional_users(qtd: int, tipo: str | None = None) -> str:
@@ -25,13 +26,6 @@ def format_full_users(qtd: int) -> str:
     return "1 Full User" if qtd == 1 else f"{qtd} Full Users"
 
 
-def format_postos(qtd: int, *, adicional: bool = False) -> str:
-    label = "Posto" if qtd == 1 else "Postos"
-    if adicional:
-        label += " Adicional" if qtd == 1 else " Adicionais"
-    return f"{qtd} {label}"
-
-
 def render_phc() -> None:
     st.subheader("PHC Evolution")
     plano_atual = st.selectbox("Plano Atual", ["Corporate", "Advanced", "Enterprise"])
@@ -56,11 +50,11 @@ def render_phc() -> None:
                 if escolha != "Nenhum":
                     info = modulos[escolha]
                     if info.get("per_user"):
-                        if escolha in WEB_ONLY_MODULES:
+                        if MODULOS[escolha].web_only:
                             qtd_web = st.number_input(f"Nº Utilizadores Web - {escolha}", min_value=0, step=1, format="%d", key=f"phc_{escolha}_web")
                             selecoes[escolha] = qtd_web
                             web_selecoes[escolha] = qtd_web
-                        elif escolha in WEB_MODULES:
+                        elif MODULOS[escolha].web:
                             cpd, cpw = st.columns(2)
                             with cpd:
                                 qtd_desk = st.number_input(f"Nº Utilizadores Desktop - {escolha}", min_value=0, step=1, format="%d", key=f"phc_{escolha}_desk")
@@ -82,11 +76,11 @@ def render_phc() -> None:
                             selecoes[modulo] = st.number_input("Nº Bancos Adicionais", min_value=0, step=1, format="%d")
                     elif ativado:
                         if info.get("per_user"):
-                            if modulo in WEB_ONLY_MODULES:
+                            if MODULOS[modulo].web_only:
                                 qtd_web = st.number_input(f"Nº Utilizadores Web - {modulo}", min_value=0, step=1, format="%d", key=f"phc_{modulo}_web")
                                 selecoes[modulo] = qtd_web
                                 web_selecoes[modulo] = qtd_web
-                            elif modulo in WEB_MODULES:
+                            elif MODULOS[modulo].web:
                                 cd, cw = st.columns(2)
                                 with cd:
                                     qtd_desk = st.number_input(f"Nº Utilizadores Desktop - {modulo}", min_value=0, step=1, format="%d", key=f"phc_{modulo}_desk")
@@ -101,7 +95,7 @@ def render_phc() -> None:
                             selecoes[modulo] = 1
 
     if st.button("Calcular Plano PHC", key="btn_phc"):
-        resultado = calculate_plan(plano_atual, tipo_gestao, utilizadores_desk, utilizadores_web, selecoes, web_selecoes)
+        resultado = cached_calculate_plan(plano_atual, tipo_gestao, utilizadores_desk, utilizadores_web, selecoes, web_selecoes)
         for msg in resultado["warnings"]:
             st.warning(msg)
 
@@ -122,28 +116,27 @@ def render_phc() -> None:
             else:
                 detalhes.append((f"Preço de {format_full_users(resultado['extras_utilizadores'])} adicional", format_euro(resultado["custo_extra_utilizadores"]), True))
 
-        pos_info = resultado.get("pos_breakdown")
-        for modulo, custos in resultado["modulos_detalhe"].items():
-            custo_base, custo_desk, custo_web, qtd_desk, qtd_web = custos
-            if modulo == "Ponto de Venda (POS/Restauração)" and pos_info:
-                num_primeiros, ate_10, acima_10, preco_primeiro, preco_2_10, preco_maior_10 = pos_info
-                for _ in range(num_primeiros):
-                    detalhes.append(("1º Ponto de Venda (POS/Restauração)", format_euro(preco_primeiro), False))
-                if ate_10 > 0:
-                    total = ate_10 * preco_2_10
-                    detalhes.append((f"Ponto de Venda (POS/Restauração) - ({format_postos(ate_10, adicional=True)} - Escalão de 2 a 10)", f"{format_euro(total)} ({format_euro(preco_2_10)} por Posto)", True))
-                if acima_10 > 0:
-                    total = acima_10 * preco_maior_10
-                    detalhes.append((f"Ponto de Venda (POS/Restauração) - ({format_postos(acima_10, adicional=True)} - Escalão de 11 a 50)", f"{format_euro(total)} ({format_euro(preco_maior_10)} por Posto)", True))
+        for linha in resultado.linhas_modulos:
+            modulo = linha.modulo
+            if modulo == "Ponto de Venda (POS/Restauração)" and resultado.linhas_pos:
+                for pos in resultado.linhas_pos:
+                    if pos.escalao > 0:
+                        valor = f"{format_euro(pos.custo)} ({format_euro(pos.preco_unidade)} por Posto)"
+                        detalhes.append((pos.descricao, valor, True))
+                    elif pos.quantidade == 1:
+                        detalhes.append((pos.descricao, format_euro(pos.preco_unidade), False))
+                    else:
+                        valor = f"{format_euro(pos.custo)} ({format_euro(pos.preco_unidade)} por Loja)"
+                        detalhes.append((f"{pos.descricao} - ({pos.quantidade} Lojas)", valor, False))
             else:
-                detalhes.append((modulo, format_euro(custo_base), False))
-                if custo_desk > 0:
-                    texto_extra = format_additional_users(qtd_desk, "Desktop")
-                    unit_price = custo_desk / qtd_desk if qtd_desk else custo_desk
-                    detalhes.append((f"{modulo} ({texto_extra})", f"{format_euro(custo_desk)} ({format_euro(unit_price)} por Utilizador)", True))
-                if custo_web > 0:
-                    unit_price = custo_web / qtd_web if qtd_web else custo_web
-                    detalhes.append((f"{modulo} ({format_additional_users(qtd_web, 'Web')})", f"{format_euro(unit_price * qtd_web)} ({format_euro(unit_price)} por Utilizador)", True))
+                detalhes.append((modulo, format_euro(linha.custo_base), False))
+                if linha.custo_desktop > 0:
+                    texto_extra = format_additional_users(linha.utilizadores_desktop, "Desktop")
+                    unit_price = linha.preco_unidade_desktop
+                    detalhes.append((f"{modulo} ({texto_extra})", f"{format_euro(linha.custo_desktop)} ({format_euro(unit_price)} por Utilizador)", True))
+                if linha.custo_web > 0:
+                    unit_price = linha.preco_unidade_web
+                    detalhes.append((f"{modulo} ({format_additional_users(linha.utilizadores_web, 'Web')})", f"{format_euro(unit_price * linha.utilizadores_web)} ({format_euro(unit_price)} por Utilizador)", True))
 
         for texto, valor, indent in detalhes:
             bullet = "" if indent else "• "
@@ -7,7 +7,8 @@ if __name__ == "__main__" and not st.runtime.exists():  # pragma: no cover - CLI
     sys.argv = ["streamlit", "run", __file__] + sys.argv[1:]
     sys.exit(stcli.main())
 
-from common import format_euro, setup_page
+from pricing import format_euro
+from ui import setup_page
 from primavera_logic import (
     PRIMAVERA_CORE_MODULE_MIN_PLAN,
     PRIMAVERA_ADDONS,
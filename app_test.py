@@ -1,6 +1,5 @@
 try:
     import streamlit as st
-    import pandas as pd
     if __name__ == "__main__" and not st.runtime.exists():  # pragma: no cover - CLI guard
         import sys
         import streamlit.web.cli as stcli
@@ -9,7 +8,12 @@ try:
         sys.exit(stcli.main())
 except ModuleNotFoundError:  # pragma: no cover - optional dependency
     st = None
-    pd = None
+
+from lazy import lazy_import
+
+# Loaded on first use: pandas parses pasted tables, fpdf exports the PDF.
+pd = lazy_import("pandas")
+fpdf = lazy_import("fpdf")
 
 __test__ = False
 import unicodedata
@@ -18,13 +22,14 @@ if st is None or pd is None:
     def normalize(text: str) -> str:
         return str(text)
 else:
-    from common import (
+    from pricing import (
         BANK_PACK_PRICES,
-        calculate_plan,
+        MODULOS,
+        cached_calculate_plan,
         format_euro,
         produtos,
-        setup_page,
     )
+    from ui import setup_page
     from pathlib import Path
 
     st.set_page_config(layout="centered")
@@ -52,13 +57,6 @@ else:
     def format_full_users(qtd: int) -> str:
         return "1 Full User" if qtd == 1 else f"{qtd} Full Users"
 
-    def format_postos(qtd: int, *, adicional: bool = False) -> str:
-        label = "Posto" if qtd == 1 else "Postos"
-        if adicional:
-            label += " Adicional" if qtd == 1 else " Adicionais"
-        return f"{qtd} {label}"
-
-
     def normalize(text: str) -> str:
         """Return lowercase text without accents."""
         return "".join(
@@ -68,9 +66,7 @@ else:
     
     def gerar_pdf(linhas: list[tuple[str, int, float, float]]) -> bytes:
         """Create a simple PDF with a table of products."""
-        from fpdf import FPDF
-
-        pdf = FPDF()
+        pdf = fpdf.FPDF()
         pdf.add_page()
 
         font_name = _FONT_NAME
@@ -114,9 +110,7 @@ else:
 
     def gerar_pdf_sem_preco(linhas: list[tuple[str, int]]) -> bytes:
         """Create a PDF listing products and quantities without prices."""
-        from fpdf import FPDF
-
-        pdf = FPDF()
+        pdf = fpdf.FPDF()
         pdf.add_page()
 
         font_name = _FONT_NAME
@@ -179,16 +173,6 @@ else:
     extras_importados = set()
     manuf_count = 0
     nao_disponiveis = set()
-    WEB_MODULES = {
-        "CRM",
-        "Suporte",
-        "Equipa",
-        "Careers c/ Recrutamento",
-        "Vencimento",
-        "Contabilidade",
-        "Imobilizado",
-    }
-    WEB_ONLY_MODULES = {"Colaborador"}
     
     if texto_tabela:
         try:
@@ -358,8 +342,6 @@ else:
                 "revisao": "Full Project - Controlo + Medição + Orçamentação + Planeamento + Revisão de Preços",
             }
     
-            modulos_validos = [m for area in produtos.values() for m in area]
-    
             modulos_ignorados = {
                 "doc.eletr\u00f3nicos",
                 "doc.eletronicos",
@@ -435,7 +417,7 @@ else:
                         nao_disponiveis.add(modulo)
                     continue
                 modulo_nome = nome_map.get(modulo_lower, modulo)
-                if modulo_nome in modulos_validos:
+                if modulo_nome in MODULOS:
                     import_data[modulo_nome] = import_data.get(modulo_nome, 0) + quantidade
                     if web_mod:
                         web_data[modulo_nome] = web_data.get(modulo_nome, 0) + web_mod
@@ -532,7 +514,7 @@ else:
                 if escolha != "Nenhum":
                     info = modulos[escolha]
                     if info.get("per_user"):
-                        if escolha in WEB_ONLY_MODULES:
+                        if MODULOS[escolha].web_only:
                             def_web = web_data.get(escolha, 0)
                             qtd_web = st.number_input(
                                 f"Nº Utilizadores Web - {escolha}",
@@ -543,7 +525,7 @@ else:
                             )
                             selecoes[escolha] = qtd_web
                             web_data[escolha] = qtd_web
-                        elif escolha in WEB_MODULES:
+                        elif MODULOS[escolha].web:
                             def_total = import_data.get(escolha, 0)
                             def_web = web_data.get(escolha, 0)
                             def_desk = max(0, def_total - def_web)
@@ -595,7 +577,7 @@ else:
                             )
                     elif ativado:
                         if info.get("per_user"):
-                            if modulo in WEB_ONLY_MODULES:
+                            if MODULOS[modulo].web_only:
                                 def_web = web_data.get(modulo, 0)
                                 qtd_web = st.number_input(
                                     f"Nº Utilizadores Web - {modulo}",
@@ -607,7 +589,7 @@ else:
                                 )
                                 selecoes[modulo] = qtd_web
                                 web_data[modulo] = qtd_web
-                            elif modulo in WEB_MODULES:
+                            elif MODULOS[modulo].web:
                                 def_total = import_data.get(modulo, 0)
                                 def_web = web_data.get(modulo, 0)
                                 def_desk = max(0, def_total - def_web)
@@ -647,7 +629,7 @@ else:
     
     # Lógica do plano
     if st.button("Calcular Plano Recomendado"):
-        resultado = calculate_plan(
+        resultado = cached_calculate_plan(
             plano_atual,
             tipo_gestao,
             utilizadores_desk,
@@ -706,49 +688,36 @@ else:
                     )
                 )
     
-        pos_info = resultado.get("pos_breakdown")
-        for modulo, custos in resultado["modulos_detalhe"].items():
-            custo_base, custo_desk, custo_web, qtd_desk, qtd_web = custos
-            if modulo == "Ponto de Venda (POS/Restauração)" and pos_info:
-                num_primeiros, ate_10, acima_10, preco_primeiro, preco_2_10, preco_maior_10 = pos_info
-                for _ in range(num_primeiros):
-                    detalhes.append(("1º Ponto de Venda (POS/Restauração)", format_euro(preco_primeiro), False))
-                if ate_10 > 0:
-                    total = ate_10 * preco_2_10
-                    detalhes.append(
-                        (
-                            f"Ponto de Venda (POS/Restauração) - ({format_postos(ate_10, adicional=True)} - Escalão de 2 a 10)",
-                            f"{format_euro(total)} ({format_euro(preco_2_10)} por Posto)",
-                            True,
-                        )
-                    )
-                if acima_10 > 0:
-                    total = acima_10 * preco_maior_10
-                    detalhes.append(
-                        (
-                            f"Ponto de Venda (POS/Restauração) - ({format_postos(acima_10, adicional=True)} - Escalão de 11 a 50)",
-                            f"{format_euro(total)} ({format_euro(preco_maior_10)} por Posto)",
-                            True,
-                        )
-                    )
+        for linha in resultado.linhas_modulos:
+            modulo = linha.modulo
+            if modulo == "Ponto de Venda (POS/Restauração)" and resultado.linhas_pos:
+                for pos in resultado.linhas_pos:
+                    if pos.escalao > 0:
+                        valor = f"{format_euro(pos.custo)} ({format_euro(pos.preco_unidade)} por Posto)"
+                        detalhes.append((pos.descricao, valor, True))
+                    elif pos.quantidade == 1:
+                        detalhes.append((pos.descricao, format_euro(pos.preco_unidade), False))
+                    else:
+                        valor = f"{format_euro(pos.custo)} ({format_euro(pos.preco_unidade)} por Loja)"
+                        detalhes.append((f"{pos.descricao} - ({pos.quantidade} Lojas)", valor, False))
             else:
-                detalhes.append((modulo, format_euro(custo_base), False))
-                if custo_desk > 0:
-                    texto_extra = format_additional_users(qtd_desk, 'Desktop')
-                    unit_price = custo_desk / qtd_desk if qtd_desk else custo_desk
+                detalhes.append((modulo, format_euro(linha.custo_base), False))
+                if linha.custo_desktop > 0:
+                    texto_extra = format_additional_users(linha.utilizadores_desktop, 'Desktop')
+                    unit_price = linha.preco_unidade_desktop
                     detalhes.append(
                         (
                             f"{modulo} ({texto_extra})",
-                            f"{format_euro(custo_desk)} ({format_euro(unit_price)} por Utilizador)",
+                            f"{format_euro(linha.custo_desktop)} ({format_euro(unit_price)} por Utilizador)",
                             True,
                         )
                     )
-                if custo_web > 0:
-                    unit_price = custo_web / qtd_web if qtd_web else custo_web
+                if linha.custo_web > 0:
+                    unit_price = linha.preco_unidade_web
                     detalhes.append(
                         (
-                            f"{modulo} ({format_additional_users(qtd_web, 'Web')})",
-                            f"{format_euro(unit_price * qtd_web)} ({format_euro(unit_price)} por Utilizador)",
+                            f"{modulo} ({format_additional_users(linha.utilizadores_web, 'Web')})",
+                            f"{format_euro(unit_price * linha.utilizadores_web)} ({format_euro(unit_price)} por Utilizador)",
                             True,
                         )
                     )
@@ -822,50 +791,35 @@ else:
                 unit = resultado['custo_extra_utilizadores'] / resultado['extras_utilizadores']
                 linhas_pdf.append((f"  {format_full_users(resultado['extras_utilizadores'])} adicional", resultado['extras_utilizadores'], unit, resultado['custo_extra_utilizadores']))
     
-        pos_info = resultado.get('pos_breakdown')
-        for modulo, custos in resultado['modulos_detalhe'].items():
-            custo_base, custo_desk, custo_web, qtd_desk, qtd_web = custos
+        for linha in resultado.linhas_modulos:
+            modulo = linha.modulo
 
-        if modulo == 'Ponto de Venda (POS/Restauração)' and pos_info:
-            num_primeiros, ate_10, acima_10, preco_primeiro, preco_2_10, preco_maior_10 = pos_info
-            for _ in range(num_primeiros):
-                linhas_pdf.append(("1º Ponto de Venda (POS/Restauração)", 1, preco_primeiro, preco_primeiro))
-            if ate_10 > 0:
-                linhas_pdf.append((
-                    f"  Ponto de Venda (POS/Restauração) - ({format_postos(ate_10, adicional=True)} - Escalão de 2 a 10)",
-                    ate_10,
-                    preco_2_10,
-                    ate_10 * preco_2_10,
-                ))
-            if acima_10 > 0:
-                linhas_pdf.append((
-                    f"  Ponto de Venda (POS/Restauração) - ({format_postos(acima_10, adicional=True)} - Escalão de 11 a 50)",
-                    acima_10,
-                    preco_maior_10,
-                    acima_10 * preco_maior_10,
-                ))
+            if modulo == 'Ponto de Venda (POS/Restauração)' and resultado.linhas_pos:
+                for pos in resultado.linhas_pos:
+                    texto = pos.descricao if pos.escalao == 0 else f"  {pos.descricao}"
+                    linhas_pdf.append((texto, pos.quantidade, pos.preco_unidade, pos.custo))
             else:
-                linhas_pdf.append((modulo, 1, custo_base, custo_base))
+                linhas_pdf.append((modulo, 1, linha.custo_base, linha.custo_base))
 
-                if custo_desk > 0:
-                    unit_extra = custo_desk / qtd_desk if qtd_desk else custo_desk
-                    texto_extra = format_additional_users(qtd_desk, 'Desktop')
+                if linha.custo_desktop > 0:
+                    unit_extra = linha.preco_unidade_desktop
+                    texto_extra = format_additional_users(linha.utilizadores_desktop, 'Desktop')
                     linhas_pdf.append(
                         (
                             f"  {modulo} ({texto_extra})",
-                            qtd_desk,
+                            linha.utilizadores_desktop,
                             unit_extra,
-                            custo_desk,
+                            linha.custo_desktop,
                         )
                     )
-                if custo_web > 0:
-                    unit_extra = custo_web / qtd_web if qtd_web else custo_web
+                if linha.custo_web > 0:
+                    unit_extra = linha.preco_unidade_web
                     linhas_pdf.append(
                         (
-                            f"  {modulo} ({format_additional_users(qtd_web, 'Web')})",
-                            qtd_web,
+                            f"  {modulo} ({format_additional_users(linha.utilizadores_web, 'Web')})",
+                            linha.utilizadores_web,
                             unit_extra,
-                            custo_web,
+                            linha.custo_web,
                         )
                     )
     
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+from typing import NamedTuple
+
+_BASE_DIR = Path(__file__).resolve().parent
+
+# Seconds each Streamlit entry point may take to render its first frame in a
+# fresh session (script imports included, the Streamlit import itself not).
+FIRST_FRAME_BUDGETS = {
+    "app.py": 1.0,
+    "app_phc.py": 1.0,
+    "africa.py": 1.0,
+    "app_test.py": 1.0,
+    "task_force.py": 1.0,
+    "task_force_teste.py": 1.0,
+}
+
+# Dependencies that must stay out of the first frame (see ``lazy.py``)
+HEAVY_MODULES = ("pandas", "fpdf", "openpyxl")
+
+_MARCA = "-- first frame --"
+
+_SCRIPT = f"""
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+
+app = AppTest.from_file(sys.argv[1], default_timeout=60)
+sys.stderr.write({_MARCA!r} + "\\n")
+sys.stderr.flush()
+inicio = time.perf_counter()
+app.run()
+segundos = time.perf_counter() - inicio
+print(json.dumps({{
+    "segundos": segundos,
+    "excecoes": [str(e.value) for e in app.exception],
+    "carregados": [m for m in {HEAVY_MODULES!r} if m in sys.modules],
+}}))
+"""
+
+
+class FirstFrame(NamedTuple):
+    entrada: str
+    segundos: float
+    excecoes: tuple[str, ...]
+    carregados: tuple[str, ...]  # HEAVY_MODULES imported by the first frame
+    importacoes: tuple[tuple[str, int], ...]  # (module, cumulative µs), slowest first
+
+
+def parse_importtime(texto: str) -> tuple[tuple[str, int], ...]:
+    """Top-level imports of a ``-X importtime`` log as (module, cumulative µs)."""
+    importacoes = []
+    for linha in texto.splitlines():
+        if not linha.startswith("import time:"):
+            continue
+        _, cumulativo, nome = linha[len("import time:") :].split("|")
+        if cumulativo.strip().isdigit() and not nome.startswith("  "):
+            importacoes.append((nome.strip(), int(cumulativo)))
+    return tuple(sorted(importacoes, key=lambda item: -item[1]))
+
+
+def profile_first_frame(entrada: str) -> FirstFrame:
+    """Render ``entrada`` once in a fresh interpreter and profile its imports."""
+    processo = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _SCRIPT, entrada],
+        cwd=_BASE_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    resultado = json.loads(processo.stdout.splitlines()[-1])
+    _, _, depois = processo.stderr.partition(_MARCA)
+    return FirstFrame(
+        entrada,
+        resultado["segundos"],
+        tuple(resultado["excecoes"]),
+        tuple(resultado["carregados"]),
+        parse_importtime(depois),
+    )
+
+
+def main(argv: list[str]) -> int:
+    """``python -m import_profile [entry.py ...]``: record and check each entry point.
+
+    Writes ``import_profile.json`` and exits non-zero when an entry point
+    fails, loads a heavy module or exceeds its budget.
+    """
+    registos = {}
+    falhas = 0
+    for entrada in argv or list(FIRST_FRAME_BUDGETS):
+        frame = profile_first_frame(entrada)
+        orcamento = FIRST_FRAME_BUDGETS.get(entrada)
+        ok = not frame.excecoes and not frame.carregados and (orcamento is None or frame.segundos < orcamento)
+        falhas += not ok
+        registos[entrada] = {**frame._asdict(), "orcamento": orcamento, "importacoes": dict(frame.importacoes)}
+        print(f"{'ok ' if ok else 'FAIL'} {entrada:<22} {frame.segundos:6.3f}s / {orcamento}s")
+        for modulo, micro in frame.importacoes[:5]:
+            print(f"       {micro / 1e6:6.3f}s {modulo}")
+        for erro in frame.excecoes:
+            print(f"       exception: {erro}")
+        if frame.carregados:
+            print(f"       loaded: {', '.join(frame.carregados)}")
+    (_BASE_DIR / "import_profile.json").write_text(json.dumps(registos, indent=2, ensure_ascii=False), encoding="utf-8")
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import importlib
+import importlib.util
+from types import ModuleType
+
+
+class LazyModule:
+    """Stand-in for a module that is only imported on first attribute access.
+
+    Streamlit runs a page script for every new session, so a heavy
+    dependency used by a single action (pasting a table, exporting a PDF)
+    is imported when that action first runs instead of before the first
+    frame.
+    """
+
+    __slots__ = ("nome", "_modulo")
+
+    def __init__(self, nome: str) -> None:
+        self.nome = nome
+        self._modulo: ModuleType | None = None
+
+    @property
+    def carregado(self) -> bool:
+        return self._modulo is not None
+
+    def __getattr__(self, atributo: str):
+        if self._modulo is None:
+            self._modulo = importlib.import_module(self.nome)
+        return getattr(self._modulo, atributo)
+
+    def __repr__(self) -> str:
+        estado = "loaded" if self.carregado else "not loaded"
+        return f"<lazy module {self.nome!r} ({estado})>"
+
+
+def lazy_import(nome: str) -> LazyModule | None:
+    """Return a lazy handle on module ``nome`` (``None`` if it is not installed)."""
+    if importlib.util.find_spec(nome) is None:
+        return None
+    return LazyModule(nome)
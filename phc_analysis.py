@@ -0,0 +1,476 @@
+from __future__ import annotations
+
+from itertools import compress
+from typing import NamedTuple
+
+import numpy as np
+
+from phc_logic import (
+    MODULOS,
+    PLANO_MODULOS,
+    POS_BREAKPOINTS,
+    POS_MODULE,
+    _avisos_dependencias,
+    _orcamento,
+    _piso_pos,
+    _pos_escaloes,
+    _utilizadores_pagos,
+    calculate_all_plans,
+    calculate_plan,
+    plan_floors,
+)
+from phc_pricebook import SEM_LIMITE, PriceBook, default_price_book, euros
+from phc_result import PisoPlano, piso_determinante
+
+
+def cheapest_plan(
+    plano_atual: str,
+    tipo_gestao: str | None,
+    utilizadores_desktop: int,
+    utilizadores_web: int,
+    selecoes: dict[str, int],
+    web_selecoes: dict[str, int] | None = None,
+    extras_importados: set[str] | None = None,
+    extras_planos: dict[str, int] | None = None,
+    pos_counts: list[int] | None = None,
+    price_book: PriceBook | None = None,
+) -> dict:
+    """Return the cheapest plan allowed for a configuration.
+
+    ``calculate_plan`` recommends the lowest plan meeting every rule, but a
+    higher plan may include more users or price modules differently. Every
+    plan at or above that floor is priced in one pass and ranked by
+    ``custo_estimado`` (ties keep the lower plan).
+
+    The result holds ``plano_minimo`` (the floor), ``ranking`` as a list of
+    ``(plano_id, nome, custo_estimado)`` from cheapest to dearest,
+    ``poupanca`` against the floor and ``resultado``, the full
+    ``calculate_plan``-style dictionary for the cheapest plan.
+    """
+    web_selecoes = web_selecoes or {}
+    price_book = price_book or default_price_book()
+    todos = calculate_all_plans(
+        plano_atual,
+        tipo_gestao,
+        utilizadores_desktop,
+        utilizadores_web,
+        selecoes,
+        web_selecoes,
+        extras_importados,
+        extras_planos,
+        pos_counts,
+        price_book,
+    )
+
+    validos = np.flatnonzero(todos["valido"])
+    custos = todos["custo_estimado_centimos"][validos]
+    ordem = validos[np.argsort(custos, kind="stable")]
+    ranking = [
+        (int(todos["planos"][i]), todos["nomes"][i], float(todos["custo_estimado"][i])) for i in ordem
+    ]
+
+    plano_minimo = todos["plano_final"]
+    custo_minimo = todos["custo_estimado_centimos"][np.searchsorted(todos["planos"], plano_minimo)]
+    plano_final, _, custo = ranking[0]
+
+    return {
+        "plano_minimo": plano_minimo,
+        "plano_final": plano_final,
+        "custo_estimado": custo,
+        "poupanca": float(euros(custo_minimo - todos["custo_estimado_centimos"][ordem[0]])),
+        "ranking": ranking,
+        "resultado": _orcamento(
+            plano_final,
+            todos["pisos"],
+            todos["warnings"],
+            utilizadores_desktop,
+            utilizadores_web,
+            selecoes,
+            web_selecoes,
+            pos_counts,
+            price_book,
+        ),
+    }
+
+
+def user_sweep(
+    plano_atual: str,
+    tipo_gestao: str | None,
+    utilizadores,
+    selecoes: dict[str, int] | None = None,
+    web_selecoes: dict[str, int] | None = None,
+    extras_importados: set[str] | None = None,
+    extras_planos: dict[str, int] | None = None,
+    pos_counts: list[int] | None = None,
+    utilizadores_web: int = 0,
+    price_book: PriceBook | None = None,
+) -> dict:
+    """Price a configuration for every desktop user count in ``utilizadores``.
+
+    ``utilizadores`` is a sequence of counts (e.g. ``range(1, 201)``) or an
+    ``int`` ``n`` meaning ``1..n``; web users stay at ``utilizadores_web``.
+    Module costs do not depend on the user count, so they are priced once
+    per plan and the extra-user cost curves are evaluated in closed form.
+
+    Returns ``utilizadores`` and ``planos`` plus, per user count, the
+    ``custo_estimado`` of every plan (``utilizadores × plano``), the
+    ``valido`` mask, the recommended ``plano_final`` and the cheapest valid
+    plan. ``mudancas`` lists ``(utilizadores, plano_anterior, plano_novo)``
+    at each count where the recommended plan changes.
+    """
+    if isinstance(utilizadores, int):
+        utilizadores = range(1, utilizadores + 1)
+    utilizadores = np.asarray(utilizadores, dtype=np.int64)
+    price_book = price_book or default_price_book()
+    m = price_book.matrices
+
+    # The floor of every other rule, priced with no desktop users.
+    base = calculate_all_plans(
+        plano_atual,
+        tipo_gestao,
+        0,
+        utilizadores_web,
+        selecoes or {},
+        web_selecoes,
+        extras_importados,
+        extras_planos,
+        pos_counts,
+        price_book,
+    )
+    plano_final = np.maximum(
+        base["plano_final"],
+        price_book.planos_por_utilizadores(np.maximum(utilizadores, utilizadores_web)),
+    )
+
+    incluidos_web = np.where(m.plano_ids >= 3, m.utilizadores_incluidos, 0)
+    extras = np.maximum(utilizadores[:, None] - m.utilizadores_incluidos, 0) + np.maximum(
+        utilizadores_web - incluidos_web, 0
+    )
+    centimos = m.preco_base + m.custo_utilizadores(extras) + base["custo_modulos_centimos"]
+    custo = euros(centimos)
+    valido = m.plano_ids >= plano_final[:, None]
+    mais_barato = m.plano_ids[np.argmin(np.where(valido, centimos, np.iinfo(np.int64).max), axis=1)]
+
+    idx = np.flatnonzero(np.diff(plano_final)) + 1
+    mudancas = [(int(utilizadores[i]), int(plano_final[i - 1]), int(plano_final[i])) for i in idx]
+
+    return {
+        "utilizadores": utilizadores,
+        "planos": m.plano_ids,
+        "custo_estimado": custo,
+        "valido": valido,
+        "plano_final": plano_final,
+        "custo_recomendado": custo[np.arange(len(utilizadores)), np.searchsorted(m.plano_ids, plano_final)],
+        "plano_mais_barato": mais_barato,
+        "mudancas": mudancas,
+        "versao_precos": price_book.versao,
+    }
+
+
+def upsell_matrix(
+    plano_atual: str,
+    tipo_gestao: str | None,
+    utilizadores_desktop: int,
+    utilizadores_web: int,
+    selecoes: dict[str, int],
+    web_selecoes: dict[str, int] | None = None,
+    extras_importados: set[str] | None = None,
+    extras_planos: dict[str, int] | None = None,
+    pos_counts: list[int] | None = None,
+    quantidade: int = 1,
+    price_book: PriceBook | None = None,
+) -> dict:
+    """Price adding each catalog module not yet in ``selecoes``.
+
+    Every candidate is added with ``quantidade`` desktop users (terminals
+    for POS) and no web users. The configuration is priced under every plan
+    once; the candidates' price rows are then gathered from the
+    ``módulo × plano`` matrices in a single pass and each candidate lands
+    on ``max(current floor, module floor)``, the plan ``calculate_plan``
+    would recommend with the module added.
+
+    Returns the current floor (``plano_minimo``) and ``custo_atual``, the
+    candidate ``modulos`` and, per candidate, the resulting
+    ``plano_final``, whether it forces a plan change (``muda_plano``), the
+    new ``custo_estimado`` and ``custo_marginal`` against the current
+    recommendation (euros, with ``*_centimos`` twins) and ``custo_por_plano``
+    (``módulo × plano``, the new total under each plan). ``ranking`` lists
+    ``(modulo, plano_final, custo_marginal)`` from cheapest to dearest.
+    Bank packs are left out, as in ``custo_estimado``.
+    """
+    web_selecoes = web_selecoes or {}
+    price_book = price_book or default_price_book()
+    m = price_book.matrices
+    base = calculate_all_plans(
+        plano_atual,
+        tipo_gestao,
+        utilizadores_desktop,
+        utilizadores_web,
+        selecoes,
+        web_selecoes,
+        extras_importados,
+        extras_planos,
+        pos_counts,
+        price_book,
+    )
+    plano_minimo = base["plano_final"]
+    custo_atual = base["custo_estimado_centimos"][np.searchsorted(m.plano_ids, plano_minimo)]
+
+    modulos = tuple(modulo for modulo in MODULOS if modulo not in selecoes)
+    # Unknown products point at a trailing row of zeros.
+    linhas = np.array([m.indice_produtos.get(modulo, len(m.produtos)) for modulo in modulos], dtype=np.intp)
+    zeros = np.zeros((1, len(m.plano_ids)), dtype=np.int64)
+    precos_base = np.vstack([m.base, zeros])[linhas]
+    precos_unidade = np.vstack([m.unidade, zeros])[linhas]
+    pagos = np.array([sum(_utilizadores_pagos(modulo, quantidade, web_selecoes)) for modulo in modulos], dtype=np.int64)
+    custo_modulos = precos_base + pagos[:, None] * precos_unidade
+    pisos = np.array([PLANO_MODULOS.get(modulo, 0) for modulo in modulos], dtype=np.int64)
+
+    if "Bank Connector" in modulos:
+        custo_modulos[modulos.index("Bank Connector")] = 0
+    if POS_MODULE in modulos and quantidade > 0:
+        i = modulos.index(POS_MODULE)
+        primeiros, ate_10, acima_10 = _pos_escaloes(quantidade, pos_counts)
+        custo_modulos[i] = (
+            primeiros * m.linha("POS (1º)")[0]
+            + ate_10 * m.linha("POS (2 a 10)")[1]
+            + acima_10 * m.linha("POS (>10)")[1]
+        )
+        pisos[i] = max(pisos[i], _piso_pos(quantidade))
+
+    custo_por_plano = base["custo_estimado_centimos"] + custo_modulos
+    plano_final = np.maximum(plano_minimo, pisos)
+    centimos = custo_por_plano[np.arange(len(modulos)), np.searchsorted(m.plano_ids, plano_final)]
+    marginal = centimos - custo_atual
+    ordem = np.argsort(marginal, kind="stable")
+
+    return {
+        "modulos": modulos,
+        "planos": m.plano_ids,
+        "plano_minimo": plano_minimo,
+        "custo_atual": float(euros(custo_atual)),
+        "plano_final": plano_final,
+        "muda_plano": plano_final != plano_minimo,
+        "custo_estimado": euros(centimos),
+        "custo_estimado_centimos": centimos,
+        "custo_marginal": euros(marginal),
+        "custo_marginal_centimos": marginal,
+        "custo_por_plano": euros(custo_por_plano),
+        "ranking": [(modulos[i], int(plano_final[i]), float(euros(marginal[i]))) for i in ordem],
+        "versao_precos": price_book.versao,
+    }
+
+
+class Downgrade(NamedTuple):
+    """Smallest change that fits a configuration into plan ``plano``.
+
+    Drop ``modulos`` and ``extras`` and cap desktop and web users at
+    ``utilizadores`` and POS terminals at ``pos`` (``None`` = unchanged).
+    ``bloqueios`` are floors no change can lift (current PHC CS plan,
+    management type); ``warnings`` are the dependency warnings left by the
+    dropped modules.
+    """
+
+    plano: int
+    nome: str
+    modulos: tuple[str, ...]
+    extras: tuple[str, ...]
+    utilizadores: int | None
+    pos: int | None
+    bloqueios: tuple[PisoPlano, ...]
+    warnings: tuple[str, ...]
+
+    @property
+    def viavel(self) -> bool:
+        return not self.bloqueios
+
+
+def _maximo_por_plano(breakpoints, planos) -> np.ndarray:
+    """Largest quantity each of ``planos`` allows under bisect ``breakpoints``.
+
+    ``-1`` means not even one unit fits and ``SEM_LIMITE`` means unlimited.
+    """
+    limites, planos_limites = breakpoints
+    k = np.searchsorted(np.array(planos_limites, dtype=np.int64), planos, side="right") - 1
+    return np.array((*limites, SEM_LIMITE, -1), dtype=np.int64)[k]
+
+
+def downgrade_options(
+    plano_atual: str,
+    tipo_gestao: str | None,
+    utilizadores_desktop: int,
+    utilizadores_web: int,
+    selecoes: dict[str, int],
+    extras_importados: set[str] | None = None,
+    extras_planos: dict[str, int] | None = None,
+    price_book: PriceBook | None = None,
+) -> list[Downgrade]:
+    """What to drop to stay on each plan below the recommendation.
+
+    The recommended plan is the highest of the per-rule floors, so a lower
+    plan is reached by lifting every floor above it and each floor is
+    lifted on its own: drop the module or imported extra, or cap the users
+    or POS terminals at the plan's limit. The union of those changes is the
+    minimal one. Floors are evaluated once and compared with every lower
+    plan as a ``piso × plano`` mask.
+
+    Returns one :class:`Downgrade` per plan below ``plano_final``, nearest
+    first (an empty list when the configuration already fits the lowest
+    plan).
+    """
+    price_book = price_book or default_price_book()
+    m = price_book.matrices
+    pisos = plan_floors(
+        plano_atual,
+        tipo_gestao,
+        utilizadores_desktop,
+        utilizadores_web,
+        selecoes,
+        extras_importados,
+        extras_planos,
+        price_book,
+    )
+    determinante = piso_determinante(pisos)
+    plano_final = determinante.plano if determinante else 1
+    alvos = m.plano_ids[m.plano_ids < plano_final][::-1]
+    if not len(alvos):
+        return []
+
+    bloqueia = np.array([piso.plano for piso in pisos], dtype=np.int64)[:, None] > alvos
+    max_utilizadores = _maximo_por_plano(price_book.limites_utilizadores, alvos)
+    max_pos = _maximo_por_plano(POS_BREAKPOINTS, alvos)
+
+    opcoes = []
+    for j, alvo in enumerate(alvos.tolist()):
+        modulos: list[str] = []
+        extras: list[str] = []
+        bloqueios: list[PisoPlano] = []
+        utilizadores = pos = None
+        for piso in compress(pisos, bloqueia[:, j]):
+            if piso.regra == "modulo":
+                modulos.append(piso.origem)
+            elif piso.regra == "extra":
+                extras.append(piso.origem)
+            elif piso.regra == "utilizadores":
+                utilizadores = int(max_utilizadores[j])
+            elif piso.regra == "pos":
+                pos = int(max_pos[j])
+            else:
+                bloqueios.append(piso)
+        if pos is not None and (pos < 1 or POS_MODULE in modulos):
+            # No terminal fits the plan: the module itself has to go.
+            if POS_MODULE not in modulos:
+                modulos.append(POS_MODULE)
+            pos = None
+
+        restantes = {modulo: q for modulo, q in selecoes.items() if modulo not in modulos}
+        opcoes.append(
+            Downgrade(
+                plano=alvo,
+                nome=m.nomes[int(np.searchsorted(m.plano_ids, alvo))],
+                modulos=tuple(modulos),
+                extras=tuple(extras),
+                utilizadores=utilizadores,
+                pos=pos,
+                bloqueios=tuple(bloqueios),
+                warnings=tuple(_avisos_dependencias(restantes)),
+            )
+        )
+    return opcoes
+
+
+def optimize_user_split(
+    plano_atual: str,
+    tipo_gestao: str | None,
+    utilizadores: int,
+    selecoes: dict[str, int],
+    web_fixos: dict[str, int] | None = None,
+    extras_importados: set[str] | None = None,
+    extras_planos: dict[str, int] | None = None,
+    pos_counts: list[int] | None = None,
+    desktop_minimo: int = 0,
+    web_minimo: int = 0,
+    price_book: PriceBook | None = None,
+) -> dict:
+    """Cheapest split of the users between desktop and web.
+
+    ``utilizadores`` is the management headcount and ``selecoes`` the total
+    headcount of each module; ``desktop_minimo``/``web_minimo`` bound the
+    management split and ``web_fixos`` pins the web users of given modules.
+
+    Desktop and web users of a module share its unit price and each side
+    has one free user, so a module with two or more users is cheapest with
+    at least one web user, whatever the plan. The management split moves
+    the plan (through ``max(desktop, web)``) and the extra users (plans
+    from id 3 include as many web as desktop users); every split is priced
+    in closed form as a ``divisão × plano`` matrix, as in
+    :func:`user_sweep`. Ties keep more desktop users.
+
+    Returns the chosen ``utilizadores_desktop``, ``utilizadores_web`` and
+    ``web_selecoes``, the recommended ``plano_final`` and ``custo_estimado``,
+    ``desktop``/``custo_por_divisao`` for every split considered and
+    ``resultado``, the ``calculate_plan`` result for the chosen split.
+    """
+    web_fixos = web_fixos or {}
+    if desktop_minimo + web_minimo > utilizadores:
+        raise ValueError("desktop_minimo + web_minimo exceeds utilizadores")
+    price_book = price_book or default_price_book()
+    m = price_book.matrices
+
+    web_selecoes = {}
+    for modulo, quantidade in selecoes.items():
+        info = MODULOS.get(modulo)
+        if modulo in web_fixos:
+            web_selecoes[modulo] = web_fixos[modulo]
+        elif info and info.web_only:
+            web_selecoes[modulo] = quantidade
+        elif info and info.web and quantidade >= 2:
+            web_selecoes[modulo] = 1
+
+    # Every other rule and the module costs, priced with no management users.
+    base = calculate_all_plans(
+        plano_atual,
+        tipo_gestao,
+        0,
+        0,
+        selecoes,
+        web_selecoes,
+        extras_importados,
+        extras_planos,
+        pos_counts,
+        price_book,
+    )
+    desktop = np.arange(utilizadores - web_minimo, desktop_minimo - 1, -1, dtype=np.int64)
+    web = utilizadores - desktop
+    plano_final = np.maximum(base["plano_final"], price_book.planos_por_utilizadores(np.maximum(desktop, web)))
+
+    incluidos_web = np.where(m.plano_ids >= 3, m.utilizadores_incluidos, 0)
+    extras = np.maximum(desktop[:, None] - m.utilizadores_incluidos, 0) + np.maximum(web[:, None] - incluidos_web, 0)
+    por_plano = m.preco_base + m.custo_utilizadores(extras) + base["custo_modulos_centimos"]
+    centimos = por_plano[np.arange(len(desktop)), np.searchsorted(m.plano_ids, plano_final)]
+    i = int(np.argmin(centimos))
+
+    return {
+        "utilizadores_desktop": int(desktop[i]),
+        "utilizadores_web": int(web[i]),
+        "web_selecoes": web_selecoes,
+        "plano_final": int(plano_final[i]),
+        "custo_estimado": float(euros(centimos[i])),
+        "custo_estimado_centimos": int(centimos[i]),
+        "desktop": desktop,
+        "plano_por_divisao": plano_final,
+        "custo_por_divisao": euros(centimos),
+        "resultado": calculate_plan(
+            plano_atual,
+            tipo_gestao,
+            int(desktop[i]),
+            int(web[i]),
+            selecoes,
+            web_selecoes,
+            extras_importados,
+            extras_planos,
+            pos_counts,
+            price_book=price_book,
+        ),
+        "versao_precos": price_book.versao,
+    }
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from threading import Lock
+from typing import NamedTuple
+
+from phc_logic import calculate_plan
+from phc_pricebook import PriceBook, default_price_book
+from phc_result import PlanResult
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    invalidations: int
+    currsize: int
+    maxsize: int
+
+
+def _request_key(
+    plano_atual: str,
+    tipo_gestao: str | None,
+    utilizadores_desktop: int,
+    utilizadores_web: int,
+    selecoes: dict[str, int],
+    web_selecoes: dict[str, int] | None = None,
+    extras_importados: set[str] | None = None,
+    extras_planos: dict[str, int] | None = None,
+    pos_counts: list[int] | None = None,
+    price_book: PriceBook | None = None,
+) -> tuple:
+    """Return a hashable key identifying a ``calculate_plan`` request.
+
+    The price book enters the key through its ``versao``; books compiled
+    without one are keyed by identity. Module order is kept because it
+    drives the order of ``modulos_detalhe``. Web quantities of unselected modules and plan floors of extras that were
+    not imported cannot change the result, so they are dropped.
+    """
+    web_selecoes = web_selecoes or {}
+    extras = frozenset(extras_importados or ())
+    extras_planos = extras_planos or {}
+    return (
+        None if price_book is None else price_book.versao or price_book,
+        plano_atual,
+        tipo_gestao,
+        int(utilizadores_desktop),
+        int(utilizadores_web),
+        tuple((modulo, int(qtd)) for modulo, qtd in selecoes.items()),
+        frozenset((modulo, int(qtd)) for modulo, qtd in web_selecoes.items() if modulo in selecoes),
+        extras,
+        frozenset((extra, extras_planos.get(extra, 0)) for extra in extras),
+        None if pos_counts is None else tuple(int(q) for q in pos_counts),
+    )
+
+
+class PlanCache:
+    """Size-bounded LRU cache in front of :func:`phc_logic.calculate_plan`.
+
+    Results are read-only :class:`~phc_result.PlanResult` objects shared
+    between callers.
+    Entries are keyed by the version of the price book they were computed
+    with, so callers alternating between explicit books share the cache.
+    When the registry's active book changes (e.g. the default book is
+    rebuilt) the cache is emptied before answering.
+    """
+
+    def __init__(self, maxsize: int = 1024) -> None:
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        self.maxsize = maxsize
+        self._entries: OrderedDict[tuple, PlanResult] = OrderedDict()
+        self._ativo: PriceBook | None = None
+        self._lock = Lock()
+        self._hits = self._misses = self._evictions = self._invalidations = 0
+
+    def calculate_plan(
+        self,
+        plano_atual: str,
+        tipo_gestao: str | None,
+        utilizadores_desktop: int,
+        utilizadores_web: int,
+        selecoes: dict[str, int],
+        web_selecoes: dict[str, int] | None = None,
+        extras_importados: set[str] | None = None,
+        extras_planos: dict[str, int] | None = None,
+        pos_counts: list[int] | None = None,
+        price_book: PriceBook | None = None,
+    ) -> PlanResult:
+        """Cached equivalent of :func:`phc_logic.calculate_plan`."""
+        book = price_book or default_price_book()
+        args = (
+            plano_atual,
+            tipo_gestao,
+            utilizadores_desktop,
+            utilizadores_web,
+            selecoes,
+            web_selecoes,
+            extras_importados,
+            extras_planos,
+            pos_counts,
+        )
+        key = _request_key(*args, price_book=book)
+        with self._lock:
+            if price_book is None and book is not self._ativo:
+                if self._ativo is not None and self._entries:
+                    self._invalidations += 1
+                    self._entries.clear()
+                self._ativo = book
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return result
+            self._misses += 1
+
+        result = calculate_plan(*args, price_book=book)
+
+        with self._lock:
+            self._entries[key] = result
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+        return result
+
+    def cache_info(self) -> CacheInfo:
+        with self._lock:
+            return CacheInfo(
+                self._hits,
+                self._misses,
+                self._evictions,
+                self._invalidations,
+                len(self._entries),
+                self.maxsize,
+            )
+
+    def cache_clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._hits = self._misses = self._evictions = self._invalidations = 0
+
+
+plan_cache = PlanCache()
+cached_calculate_plan = plan_cache.calculate_plan
@@ -1,22 +1,25 @@
-from functools import lru_cache
-from pathlib import Path
+from __future__ import annotations
 
-import pandas as pd
+from array import array
+from bisect import bisect_left
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Callable, Mapping, NamedTuple
 
-_BASE_DIR = Path(__file__).resolve().parent
-
-
-@lru_cache(maxsize=None)
-def load_precos_planos() -> pd.DataFrame:
-    """Load pricing table for plans with caching."""
-    return pd.read_csv(_BASE_DIR / "precos_planos.csv", sep=",")
-
-
-@lru_cache(maxsize=None)
-def load_precos_produtos() -> pd.DataFrame:
-    """Load pricing table for modules with caching."""
-    return pd.read_csv(_BASE_DIR / "precos_produtos.csv", sep=",")
+import numpy as np
 
+from phc_pricebook import (
+    CENTIMOS,
+    PlanPrice,
+    PriceBook,
+    default_price_book,
+    dividir_escaloes,
+    euros,
+    load_precos_planos,
+    load_precos_produtos,
+    price_book_registry,
+)
+from phc_result import PackBancos, PisoPlano, PlanResult, PosBreakdown, piso_determinante
 
 produtos = {
     "Funcionalidades Adicionais de Gestão": {
@@ -72,6 +75,38 @@ WEB_MODULES = {
 
 WEB_ONLY_MODULES = {"Colaborador"}
 
+
+class ModuleInfo(NamedTuple):
+    """Flattened catalog entry of one module."""
+
+    id: int
+    nome: str
+    area: str
+    plano: int
+    per_user: bool
+    web: bool
+    web_only: bool
+
+
+def _build_module_registry() -> MappingProxyType:
+    modulos = {}
+    for area, mods in produtos.items():
+        for nome, info in mods.items():
+            modulos[nome] = ModuleInfo(
+                id=len(modulos),
+                nome=nome,
+                area=area,
+                plano=info.get("plano") or 0,
+                per_user=bool(info.get("per_user")),
+                web=nome in WEB_MODULES,
+                web_only=bool(info.get("web_only")) or nome in WEB_ONLY_MODULES,
+            )
+    return MappingProxyType(modulos)
+
+
+# Module name → ModuleInfo, ids follow the catalog order of ``produtos``
+MODULOS = _build_module_registry()
+
 # Maximum number of POS stations allowed per plan
 POS_LIMITS = {
     1: 1,
@@ -88,221 +123,929 @@ BANK_PACK_PRICES = {
     10: 380,
 }
 
+# Banks included with the Bank Connector on each plan
+BANCOS_INCLUIDOS = {
+    4: 1,
+    5: 3,
+    6: 5,
+}
 
-def calculate_plan(
+POS_MODULE = "Ponto de Venda (POS/Restauração)"
+
+# Lowest plan implied by the customer's current PHC CS plan
+PLANO_ATUAL_MINIMO = {
+    "Enterprise": 6,
+    "Advanced": 4,
+    "Corporate": 1,
+}
+
+# Extra floor for Corporate customers depending on their management type
+TIPO_GESTAO_MINIMO = {
+    "Gestão Terceiros": 2,
+    "Gestão Completo": 3,
+}
+
+
+def _compilar_limites(limites: dict[int, int | None]) -> tuple[tuple[int, ...], tuple[int, ...]]:
+    """Turn ``{plano: limite}`` into bisect breakpoints ``(limites, planos)``.
+
+    The lowest plan whose limit fits wins, so a plan only gets a breakpoint
+    when its limit exceeds every limit before it; ``None`` means unlimited
+    and closes the table.
+    """
+    valores: list[int] = []
+    planos: list[int] = []
+    for pid in sorted(limites):
+        limite = limites[pid]
+        if limite is None:
+            return tuple(valores), tuple(planos) + (pid,)
+        if not valores or limite > valores[-1]:
+            valores.append(limite)
+            planos.append(pid)
+    return tuple(valores), tuple(planos) + (planos[-1],)
+
+
+# POS stations → lowest plan, as bisect breakpoints over POS_LIMITS
+POS_BREAKPOINTS = _compilar_limites(POS_LIMITS)
+
+# Module name → lowest plan offering it
+PLANO_MODULOS = MappingProxyType({nome: info.plano for nome, info in MODULOS.items()})
+
+
+class PedidoPlano(NamedTuple):
+    """Inputs the plan-floor rules read."""
+
+    plano_atual: str
+    tipo_gestao: str | None
+    utilizadores_desktop: int
+    utilizadores_web: int
+    selecoes: Mapping[str, int]
+    extras_importados: frozenset[str] | set[str]
+    extras_planos: Mapping[str, int]
+    price_book: PriceBook
+
+
+# Rule kinds: look the input up in a dict, bisect a quantity over
+# ``(limites, planos)`` breakpoints, or look up every item of a collection.
+REGRA_MAPA = "mapa"
+REGRA_LIMITES = "limites"
+REGRA_CONJUNTO = "conjunto"
+
+
+class RegraPlano(NamedTuple):
+    """One row of :data:`REGRAS_PLANO`.
+
+    ``entrada`` extracts the rule's input from a :class:`PedidoPlano`
+    (``None`` = rule does not apply). ``tabela`` is the lookup table, or a
+    callable returning it for tables that come from the request or the
+    price book.
+    """
+
+    nome: str
+    tipo: str
+    entrada: Callable[[PedidoPlano], object]
+    tabela: object
+
+
+REGRAS_PLANO = (
+    RegraPlano("plano_atual", REGRA_MAPA, lambda p: p.plano_atual, PLANO_ATUAL_MINIMO),
+    RegraPlano(
+        "tipo_gestao",
+        REGRA_MAPA,
+        lambda p: p.tipo_gestao if p.plano_atual == "Corporate" else None,
+        TIPO_GESTAO_MINIMO,
+    ),
+    RegraPlano(
+        "utilizadores",
+        REGRA_LIMITES,
+        lambda p: max(p.utilizadores_desktop, p.utilizadores_web),
+        lambda p: p.price_book.limites_utilizadores,
+    ),
+    RegraPlano("pos", REGRA_LIMITES, lambda p: p.selecoes.get(POS_MODULE) or None, POS_BREAKPOINTS),
+    RegraPlano("modulo", REGRA_CONJUNTO, lambda p: p.selecoes, PLANO_MODULOS),
+    RegraPlano("extra", REGRA_CONJUNTO, lambda p: p.extras_importados, lambda p: p.extras_planos),
+)
+
+
+def _avaliar_pisos(pedido: PedidoPlano, regras=REGRAS_PLANO) -> tuple[PisoPlano, ...]:
+    """Evaluate every rule once and return the floors they impose."""
+    pisos: list[PisoPlano] = []
+    for regra in regras:
+        valor = regra.entrada(pedido)
+        if valor is None:
+            continue
+        tabela = regra.tabela(pedido) if callable(regra.tabela) else regra.tabela
+        if regra.tipo == REGRA_MAPA:
+            plano = tabela.get(valor)
+            if plano:
+                pisos.append(PisoPlano(regra.nome, plano, valor))
+        elif regra.tipo == REGRA_LIMITES:
+            limites, planos = tabela
+            pisos.append(PisoPlano(regra.nome, planos[bisect_left(limites, valor)], valor))
+        else:
+            for item in valor:
+                plano = tabela.get(item)
+                if plano:
+                    pisos.append(PisoPlano(regra.nome, plano, item))
+    return tuple(pisos)
+
+
+def plan_floors(
     plano_atual: str,
     tipo_gestao: str | None,
     utilizadores_desktop: int,
     utilizadores_web: int,
     selecoes: dict[str, int],
-    web_selecoes: dict[str, int] | None = None,
     extras_importados: set[str] | None = None,
     extras_planos: dict[str, int] | None = None,
-    pos_counts: list[int] | None = None,
-) -> dict:
-    """Return planning information based on selections."""
-    extras_importados = extras_importados or set()
-    extras_planos = extras_planos or {}
-    web_selecoes = web_selecoes or {}
-    warnings: list[str] = []
-
-    planos = []
-    if plano_atual == "Enterprise":
-        planos.append(6)
-    elif plano_atual == "Advanced":
-        planos.append(4)
-    elif plano_atual == "Corporate":
-        planos.append(1)
-        if tipo_gestao == "Gestão Terceiros":
-            planos.append(2)
-        elif tipo_gestao == "Gestão Completo":
-            planos.append(3)
-
-    df_precos = load_precos_planos()
-    df_produtos = load_precos_produtos()
-
-    limites = [
-        (int(row["plano_id"]), row.get("limite_utilizadores"))
-        for _, row in df_precos.iterrows()
-    ]
-    limites.sort(key=lambda x: x[0])
-
-    plano_utilizadores = None
-    for pid, limite in limites:
-        if pd.notna(limite) and str(limite).strip() != "":
-            lim = int(limite)
-            if utilizadores_desktop <= lim and utilizadores_web <= lim:
-                plano_utilizadores = pid
-                break
-    if plano_utilizadores is None:
-        plano_utilizadores = max(pid for pid, _ in limites)
-
-    planos.append(plano_utilizadores)
-
-    pos_qtd = selecoes.get("Ponto de Venda (POS/Restauração)", 0)
-    if pos_qtd:
-        for pid in sorted(POS_LIMITS):
-            limite = POS_LIMITS[pid]
-            if limite is None or pos_qtd <= limite:
-                planos.append(pid)
-                break
-
-    for modulo in selecoes:
-        for area in produtos.values():
-            if modulo in area:
-                planos.append(area[modulo].get("plano"))
-                break
-
-    for extra_mod in extras_importados:
-        planos.append(extras_planos.get(extra_mod, 0))
-
-    if "Colaborador" in selecoes and "Vencimento" not in selecoes:
-        warnings.append("O módulo Colaborador requer Vencimento")
-    if "SHST" in selecoes and "Vencimento" not in selecoes:
-        warnings.append("O módulo SHST requer Vencimento")
-    if "Ocupação" in selecoes and "Inventário Avançado" not in selecoes:
-        warnings.append("O módulo Ocupação faz parte do Inventário Avançado")
-
-    plano_final = max(planos) if planos else 1
-
-    preco_planos = {
-        int(row["plano_id"]): (
-            row["nome"],
-            float(row.get("preco_base", 0) or 0),
-            int(row.get("utilizadores_incluidos", 0) or 0),
-            float(row.get("preco_extra_ate_10", 0)) if str(row.get("preco_extra_ate_10", "")).strip() else 0,
-            float(row.get("preco_extra_ate_50", 0)) if str(row.get("preco_extra_ate_50", "")).strip() else 0,
-            float(row.get("preco_extra_acima_50", 0)) if str(row.get("preco_extra_acima_50", "")).strip() else 0,
+    price_book: PriceBook | None = None,
+) -> tuple[PisoPlano, ...]:
+    """Return the plan floor imposed by each rule for a configuration."""
+    return _avaliar_pisos(
+        PedidoPlano(
+            plano_atual,
+            tipo_gestao,
+            utilizadores_desktop,
+            utilizadores_web,
+            selecoes,
+            extras_importados or frozenset(),
+            extras_planos or {},
+            price_book or default_price_book(),
         )
-        for _, row in df_precos.iterrows()
-    }
+    )
 
-    nome, preco_base, incluidos_desk, preco_ate_10, preco_ate_50, preco_mais_50 = preco_planos[plano_final]
-    incluidos_web = incluidos_desk if plano_final >= 3 else 0
 
-    preco_produtos = {
-        (row["produto"], int(row["plano_id"])): (
-            float(row.get("preco_base", 0) or 0),
-            float(row.get("preco_unidade", 0) or 0),
+def _plano_minimo(
+    plano_atual: str,
+    tipo_gestao: str | None,
+    utilizadores_desktop: int,
+    utilizadores_web: int,
+    selecoes: dict[str, int],
+    extras_importados: set[str],
+    extras_planos: dict[str, int],
+    price_book: PriceBook,
+) -> tuple[int, tuple[PisoPlano, ...], list[str]]:
+    """Return the lowest plan id satisfying every rule, the floors and dependency warnings."""
+    pisos = _avaliar_pisos(
+        PedidoPlano(
+            plano_atual,
+            tipo_gestao,
+            utilizadores_desktop,
+            utilizadores_web,
+            selecoes,
+            extras_importados,
+            extras_planos,
+            price_book,
         )
-        for _, row in df_produtos.iterrows()
-    }
+    )
+    determinante = piso_determinante(pisos)
+    plano_final = determinante.plano if determinante else 1
+    return plano_final, pisos, _avisos_dependencias(selecoes)
+
 
-    extras_desk = max(0, utilizadores_desktop - incluidos_desk)
-    extras_web = max(0, utilizadores_web - incluidos_web)
-    extras = extras_desk + extras_web
+def _piso_pos(quantidade: int) -> int:
+    """Lowest plan allowing ``quantidade`` POS terminals."""
+    limites, planos = POS_BREAKPOINTS
+    return planos[bisect_left(limites, quantidade)]
+
+
+# Module dependencies as ``(módulo, requisito, aviso)``, warned in this order
+DEPENDENCIAS = (
+    ("Colaborador", "Vencimento", "O módulo Colaborador requer Vencimento"),
+    ("SHST", "Vencimento", "O módulo SHST requer Vencimento"),
+    ("Ocupação", "Inventário Avançado", "O módulo Ocupação faz parte do Inventário Avançado"),
+)
+
+
+def _bits(mascara: int):
+    """Yield the indices of the set bits of ``mascara``."""
+    while mascara:
+        baixo = mascara & -mascara
+        yield baixo.bit_length() - 1
+        mascara ^= baixo
+
+
+@dataclass(frozen=True, eq=False)
+class DependencyGraph:
+    """Module dependencies compiled into integer bitmasks.
+
+    Every module gets a bit (catalog modules first, by ``ModuleInfo.id``).
+    A selection is a mask, each rule is ``(bit, requisitos, aviso)`` and
+    ``fecho[bit]`` holds the transitive requirements of a module, so
+    validating a selection is a few ``&``/``~`` operations per selected
+    module that has rules.
+    """
+
+    nomes: tuple[str, ...]
+    bits: Mapping[str, int]
+    regras: tuple[tuple[int, int, str], ...]
+    com_regras: int
+    fecho: Mapping[int, int]
+
+    @classmethod
+    def compile(cls, dependencias=DEPENDENCIAS, modulos=MODULOS) -> DependencyGraph:
+        nomes = list(modulos)
+        for modulo, requisito, _ in dependencias:
+            for nome in (modulo, requisito):
+                if nome not in nomes:
+                    nomes.append(nome)
+        bits = {nome: i for i, nome in enumerate(nomes)}
+
+        diretos: dict[int, int] = {}
+        regras = []
+        for modulo, requisito, aviso in dependencias:
+            diretos[bits[modulo]] = diretos.get(bits[modulo], 0) | 1 << bits[requisito]
+            regras.append((bits[modulo], 1 << bits[requisito], aviso))
+
+        fecho = dict(diretos)
+        alterado = True
+        while alterado:
+            alterado = False
+            for bit, mascara in fecho.items():
+                expandida = mascara
+                for requisito in _bits(mascara):
+                    expandida |= fecho.get(requisito, 0)
+                if expandida != mascara:
+                    fecho[bit] = expandida
+                    alterado = True
+
+        return cls(
+            nomes=tuple(nomes),
+            bits=MappingProxyType(bits),
+            regras=tuple(regras),
+            com_regras=sum(1 << bit for bit in diretos),
+            fecho=MappingProxyType(fecho),
+        )
+
+    def mascara(self, selecoes) -> int:
+        """Bitmask of the known modules in ``selecoes``."""
+        bits = self.bits
+        mascara = 0
+        for modulo in selecoes:
+            if modulo in bits:
+                mascara |= 1 << bits[modulo]
+        return mascara
+
+    def avisos(self, mascara: int) -> list[str]:
+        """Warnings of the rules broken by a selection mask, in rule order."""
+        if not mascara & self.com_regras:
+            return []
+        return [aviso for bit, requisitos, aviso in self.regras if mascara >> bit & 1 and requisitos & ~mascara]
+
+    def em_falta(self, mascara: int) -> int:
+        """Mask of every module a selection needs, directly or transitively, but lacks."""
+        necessarios = 0
+        for bit in _bits(mascara & self.com_regras):
+            necessarios |= self.fecho[bit]
+        return necessarios & ~mascara
+
+    def resolver(self, selecoes) -> list[str]:
+        """Return the minimal modules to add so ``selecoes`` breaks no rule."""
+        return [self.nomes[bit] for bit in _bits(self.em_falta(self.mascara(selecoes)))]
+
+    def mascaras(self, lista_selecoes) -> np.ndarray:
+        """Selection masks of many customers, as ``int64`` while the bits fit."""
+        dtype = np.int64 if len(self.nomes) < 63 else object
+        return np.array([self.mascara(selecoes) for selecoes in lista_selecoes], dtype=dtype)
+
+    def violacoes(self, mascaras: np.ndarray) -> np.ndarray:
+        """Boolean ``cliente × regra`` array of the rules each mask breaks."""
+        mascaras = np.asarray(mascaras)
+        resultado = np.zeros((len(mascaras), len(self.regras)), dtype=bool)
+        for j, (bit, requisitos, _) in enumerate(self.regras):
+            resultado[:, j] = ((mascaras >> bit) & 1 != 0) & ((mascaras & requisitos) != requisitos)
+        return resultado
+
+    def avisos_lote(self, mascaras: np.ndarray) -> list[list[str]]:
+        """:meth:`avisos` for many masks at once."""
+        violacoes = self.violacoes(mascaras)
+        avisos = [aviso for _, _, aviso in self.regras]
+        resultado: list[list[str]] = [[] for _ in range(len(violacoes))]
+        for i, j in zip(*np.nonzero(violacoes)):
+            resultado[i].append(avisos[j])
+        return resultado
+
+
+DEPENDENCY_GRAPH = DependencyGraph.compile()
+
+
+def _avisos_dependencias(selecoes) -> list[str]:
+    return DEPENDENCY_GRAPH.avisos(DEPENDENCY_GRAPH.mascara(selecoes))
+
+
+def resolve_dependencies(selecoes) -> list[str]:
+    """Return the modules to add to ``selecoes`` to satisfy every dependency."""
+    return DEPENDENCY_GRAPH.resolver(selecoes)
+
+
+def _utilizadores_pagos(modulo: str, quantidade: int, web_selecoes: dict[str, int]) -> tuple[int, int]:
+    """Return the paid ``(desktop, web)`` users of a per-user module.
+
+    The first desktop and the first web user of each module are free.
+    """
+    info = MODULOS.get(modulo)
+    if info and info.web_only:
+        return 0, max(0, web_selecoes.get(modulo, 0) - 1)
+    if info and info.web:
+        web_total = web_selecoes.get(modulo, 0)
+        return max(0, quantidade - web_total - 1), max(0, web_total - 1)
+    return max(0, quantidade - 1), 0
+
+
+def _pos_escaloes(quantidade: int, pos_counts) -> tuple[int, int, int]:
+    """Return ``(primeiros, 2 a 10, acima de 10)`` POS counts over all stores.
+
+    ``pos_counts`` holds the terminals of each store; without it the
+    ``quantidade`` terminals are one store. Whole chains are split into
+    tiers in one NumPy pass.
+    """
+    if pos_counts is None:
+        extras = max(quantidade - 1, 0)
+        return 1, min(extras, 9), max(extras - 9, 0)
+    extras = np.maximum(np.asarray(pos_counts, dtype=np.int64) - 1, 0)
+    ate_10 = int(np.minimum(extras, 9).sum())
+    return len(extras), ate_10, int(extras.sum()) - ate_10
+
+
+@dataclass(frozen=True, eq=False)
+class BankPackTable:
+    """Cheapest Bank Connector pack mix for every number of extra banks.
+
+    ``centimos[n]`` is the lowest price in cents of a pack mix adding at
+    least ``n`` banks and ``packs[n]`` how many packs of each size it takes (sizes in
+    ascending order), computed once by dynamic programming up to
+    ``maximo``. Larger requests are first brought into the table with the
+    pack of lowest price per bank, so every lookup is O(1); ``maximo`` only
+    has to stay well above the largest pack.
+    """
+
+    tamanhos: tuple[int, ...]
+    precos_centimos: tuple[int, ...]
+    maximo: int
+    packs: np.ndarray
+    bancos: np.ndarray
+    centimos: np.ndarray
+    melhor: int
+
+    @classmethod
+    def compile(cls, precos: Mapping[int, float] = BANK_PACK_PRICES, maximo: int = 1000) -> BankPackTable:
+        """Compile the table for pack prices in euros (``BANK_PACK_PRICES``)."""
+        tamanhos = tuple(sorted(precos))
+        centimos_pack = {tamanho: round(precos[tamanho] * CENTIMOS) for tamanho in tamanhos}
+        custo = [0] * (maximo + 1)
+        anterior = [0] * (maximo + 1)
+        escolha = [-1] * (maximo + 1)
+        for n in range(1, maximo + 1):
+            # Larger packs first so ties keep the mix with fewer packs.
+            for j in reversed(range(len(tamanhos))):
+                resto = max(n - tamanhos[j], 0)
+                c = centimos_pack[tamanhos[j]] + custo[resto]
+                if escolha[n] < 0 or c < custo[n]:
+                    custo[n], anterior[n], escolha[n] = c, resto, j
+
+        linhas = [(0,) * len(tamanhos)]
+        for n in range(1, maximo + 1):
+            linha = list(linhas[anterior[n]])
+            linha[escolha[n]] += 1
+            linhas.append(tuple(linha))
+        packs = np.array(linhas, dtype=np.int64)
+        bancos = packs @ np.asarray(tamanhos, dtype=np.int64)
+        centimos = np.array(custo, dtype=np.int64)
+        for tabela in (packs, bancos, centimos):
+            tabela.setflags(write=False)
+
+        melhor = min(range(len(tamanhos)), key=lambda j: (centimos_pack[tamanhos[j]] / tamanhos[j], -tamanhos[j]))
+        return cls(
+            tamanhos=tamanhos,
+            precos_centimos=tuple(centimos_pack[t] for t in tamanhos),
+            maximo=maximo,
+            packs=packs,
+            bancos=bancos,
+            centimos=centimos,
+            melhor=melhor,
+        )
+
+    def resolver(self, extras_bancos: int) -> PackBancos:
+        """Return the cheapest packs adding at least ``extras_bancos`` banks."""
+        n = max(int(extras_bancos), 0)
+        fora = 0
+        if n > self.maximo:
+            tamanho = self.tamanhos[self.melhor]
+            fora = -(-(n - self.maximo) // tamanho)
+            n -= fora * tamanho
+        packs = self.packs[n].tolist()
+        if not fora:
+            return PackBancos(tuple(packs), int(self.bancos[n]), int(self.centimos[n]))
+        packs[self.melhor] += fora
+        return PackBancos(
+            tuple(packs),
+            int(self.bancos[n]) + fora * self.tamanhos[self.melhor],
+            int(self.centimos[n]) + fora * self.precos_centimos[self.melhor],
+        )
+
+    def resolver_lote(self, extras_bancos: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Vectorised :meth:`resolver`: ``(packs, bancos, centimos)`` per row."""
+        n = np.maximum(np.asarray(extras_bancos, dtype=np.int64), 0)
+        tamanho = self.tamanhos[self.melhor]
+        fora = -(-np.maximum(n - self.maximo, 0) // tamanho)
+        n = n - fora * tamanho
+        packs = self.packs[n].copy()
+        packs[:, self.melhor] += fora
+        return packs, self.bancos[n] + fora * tamanho, self.centimos[n] + fora * self.precos_centimos[self.melhor]
+
+
+BANK_PACKS = BankPackTable.compile()
+SEM_PACKS = BANK_PACKS.resolver(0)
+
+
+def solve_bank_packs(bancos: int) -> PackBancos:
+    """Return the cheapest Bank Connector packs adding ``bancos`` banks.
+
+    ``bancos`` counts the banks beyond those the plan includes (the
+    "Nº Bancos Adicionais" of the simulators), so ``BANCOS_INCLUIDOS`` is
+    not discounted here.
+    """
+    return BANK_PACKS.resolver(bancos)
+
+
+def _custo_utilizadores(
+    plano: PlanPrice, utilizadores_desktop: int, utilizadores_web: int
+) -> tuple[int, tuple[int, int, int], int]:
+    """Return ``(extras, escalões, centimos)`` of the users beyond the plan's included ones."""
+    incluidos_desk = plano.utilizadores_incluidos
+    incluidos_web = incluidos_desk if plano.plano_id >= 3 else 0
+
+    extras = max(0, utilizadores_desktop - incluidos_desk) + max(0, utilizadores_web - incluidos_web)
     grupo1 = grupo2 = grupo3 = 0
-    custo_extra_utilizadores = 0
+    custo = 0
 
     if extras > 0:
-        if plano_final == 6:
+        if plano.plano_id == 6:
             grupo1 = min(5, extras)
             grupo2 = min(40, max(0, extras - 5))
             grupo3 = max(0, extras - 45)
-            custo_extra_utilizadores = grupo1 * preco_ate_10 + grupo2 * preco_ate_50 + grupo3 * preco_mais_50
+            ate_10, ate_50, acima_50 = plano.extras_centimos
+            custo = grupo1 * ate_10 + grupo2 * ate_50 + grupo3 * acima_50
         else:
             grupo1 = extras
-            custo_extra_utilizadores = grupo1 * preco_ate_10
+            custo = grupo1 * plano.extras_centimos[0]
+
+    return extras, (grupo1, grupo2, grupo3), custo
+
 
-    custo_modulos = 0
-    modulos_detalhe: dict[str, tuple[float, float, float, int, int]] = {}
+def _linha_modulo(
+    modulo: str,
+    quantidade: int,
+    plano_final: int,
+    web_selecoes: dict[str, int],
+    pos_counts: list[int] | None,
+    price_book: PriceBook,
+) -> tuple[tuple[int, int, int, int, int], PosBreakdown | None]:
+    """Price one selected module under ``plano_final``.
+
+    Returns its ``modulos_detalhe`` entry with costs in cents and, for the
+    POS module, its :class:`PosBreakdown` (``None`` otherwise).
+    """
+    if modulo == POS_MODULE:
+        preco_primeiro = price_book.centimos_produto("POS (1º)", plano_final)[0]
+        preco_2_10 = price_book.centimos_produto("POS (2 a 10)", plano_final)[1]
+        preco_maior_10 = price_book.centimos_produto("POS (>10)", plano_final)[1]
+
+        if quantidade > 0:
+            num_primeiros, ate_10, acima_10 = _pos_escaloes(quantidade, pos_counts)
+            custo_base = num_primeiros * preco_primeiro
+            custo_extra = ate_10 * preco_2_10 + acima_10 * preco_maior_10
+            breakdown = PosBreakdown(
+                num_primeiros,
+                ate_10,
+                acima_10,
+                euros(preco_primeiro),
+                euros(preco_2_10),
+                euros(preco_maior_10),
+            )
+            return (custo_base, custo_extra, 0, ate_10 + acima_10, 0), breakdown
+        return (0, 0, 0, 0, 0), None
+
+    base, unidade = price_book.centimos_produto(modulo, plano_final)
+    if unidade and quantidade > 0:
+        qtd_desk, qtd_web = _utilizadores_pagos(modulo, quantidade, web_selecoes)
+        return (base, qtd_desk * unidade, qtd_web * unidade, qtd_desk, qtd_web), None
+    return (base, 0, 0, 0, 0), None
+
+
+def calculate_plan(
+    plano_atual: str,
+    tipo_gestao: str | None,
+    utilizadores_desktop: int,
+    utilizadores_web: int,
+    selecoes: dict[str, int],
+    web_selecoes: dict[str, int] | None = None,
+    extras_importados: set[str] | None = None,
+    extras_planos: dict[str, int] | None = None,
+    pos_counts: list[int] | None = None,
+    price_book: PriceBook | None = None,
+) -> PlanResult:
+    """Return planning information based on selections.
+
+    ``price_book`` defaults to the process-wide :func:`default_price_book`;
+    its version is returned as ``versao_precos``. The :class:`PlanResult`
+    reads like the historical result dictionary (``to_dict()`` returns it).
+    """
+    extras_importados = extras_importados or set()
+    extras_planos = extras_planos or {}
+    web_selecoes = web_selecoes or {}
+    price_book = price_book or default_price_book()
+
+    plano_final, pisos, warnings = _plano_minimo(
+        plano_atual,
+        tipo_gestao,
+        utilizadores_desktop,
+        utilizadores_web,
+        selecoes,
+        extras_importados,
+        extras_planos,
+        price_book,
+    )
+
+    return _orcamento(
+        plano_final,
+        pisos,
+        warnings,
+        utilizadores_desktop,
+        utilizadores_web,
+        selecoes,
+        web_selecoes,
+        pos_counts,
+        price_book,
+    )
+
+
+def _orcamento(
+    plano_final: int,
+    pisos: tuple[PisoPlano, ...],
+    warnings: list[str],
+    utilizadores_desktop: int,
+    utilizadores_web: int,
+    selecoes: dict[str, int],
+    web_selecoes: dict[str, int],
+    pos_counts: list[int] | None,
+    price_book: PriceBook,
+) -> PlanResult:
+    """Price a configuration under ``plano_final`` (the ``calculate_plan`` result)."""
+    plano = price_book.plano(plano_final)
+    extras, escaloes, extra_centimos = _custo_utilizadores(plano, utilizadores_desktop, utilizadores_web)
+
+    modulos_centimos = 0
+    modulos: list[str] = []
+    tabela: list[int] = []
     pos_breakdown = None
-    bank_packs = (0, 0)
+    packs_bancos = SEM_PACKS
 
     for modulo, quantidade in selecoes.items():
         if modulo == "Bank Connector":
-            extras_bancos = quantidade
-            pack10 = extras_bancos // 10
-            resto = extras_bancos % 10
-            pack5 = 0
-            if resto:
-                if resto <= 5:
-                    pack5 = 1
-                else:
-                    pack10 += 1
-            bank_packs = (pack5, pack10)
+            packs_bancos = solve_bank_packs(quantidade)
             continue
-        if modulo == "Ponto de Venda (POS/Restauração)":
-            preco_primeiro = preco_produtos.get(("POS (1º)", plano_final), (0, 0))[0]
-            preco_2_10 = preco_produtos.get(("POS (2 a 10)", plano_final), (0, 0))[1]
-            preco_maior_10 = preco_produtos.get(("POS (>10)", plano_final), (0, 0))[1]
+        detalhe, breakdown = _linha_modulo(
+            modulo, quantidade, plano_final, web_selecoes, pos_counts, price_book
+        )
+        if breakdown is not None:
+            pos_breakdown = breakdown
+        modulos_centimos += detalhe[0] + detalhe[1] + detalhe[2]
+        modulos.append(modulo)
+        tabela.extend(detalhe)
 
-            if quantidade > 0:
-                grupos = pos_counts if pos_counts is not None else [quantidade]
-                extras_grupos = [max(q - 1, 0) for q in grupos]
-                num_primeiros = len(grupos)
-                ate_10 = sum(min(e, 9) for e in extras_grupos)
-                acima_10 = sum(max(e - 9, 0) for e in extras_grupos)
-                custo_base = num_primeiros * preco_primeiro
-                custo_extra = ate_10 * preco_2_10 + acima_10 * preco_maior_10
-                qtd_desk = ate_10 + acima_10
-                pos_breakdown = (num_primeiros, ate_10, acima_10, preco_primeiro, preco_2_10, preco_maior_10)
-            else:
-                custo_base = 0
-                custo_extra = 0
-                qtd_desk = 0
-            qtd_web = 0
-            custo_extra_desk = custo_extra
-            custo_extra_web = 0
-        else:
-            base, unidade = preco_produtos.get((modulo, plano_final), (0, 0))
-            custo_base = base
-            if unidade and quantidade > 0:
-                info = None
-                for mods in produtos.values():
-                    if modulo in mods:
-                        info = mods[modulo]
-                        break
-                if info and info.get("web_only"):
-                    web_total = web_selecoes.get(modulo, 0)
-                    web_paid = max(0, web_total - 1)
-                    desk_paid = 0
-                elif modulo in WEB_MODULES:
-                    web_total = web_selecoes.get(modulo, 0)
-                    desk_total = quantidade - web_total
-                    web_paid = max(0, web_total - 1)
-                    desk_paid = max(0, desk_total - 1)
-                else:
-                    web_paid = 0
-                    desk_paid = max(0, quantidade - 1)
-                custo_extra_desk = desk_paid * unidade
-                custo_extra_web = web_paid * unidade
-                qtd_desk = desk_paid
-                qtd_web = web_paid
-            else:
-                custo_extra_desk = custo_extra_web = 0
-                qtd_desk = qtd_web = 0
+    return PlanResult(
+        plano=plano,
+        versao_precos=price_book.versao,
+        extras_utilizadores=extras,
+        extras_breakdown=escaloes,
+        extra_centimos=extra_centimos,
+        modulos=tuple(modulos),
+        tabela=array("q", tabela),
+        modulos_centimos=modulos_centimos,
+        packs_bancos=packs_bancos,
+        bancos_base=BANCOS_INCLUIDOS.get(plano_final, 0) if "Bank Connector" in selecoes else 0,
+        pos_breakdown=pos_breakdown,
+        warnings=warnings,
+        pisos=pisos,
+    )
 
-        custo_extra = custo_extra_desk + custo_extra_web
-        custo_modulos += custo_base + custo_extra
-        modulos_detalhe[modulo] = (custo_base, custo_extra_desk, custo_extra_web, qtd_desk, qtd_web)
 
-    custo_estimado = preco_base + custo_extra_utilizadores + custo_modulos
+def calculate_plan_versions(
+    plano_atual: str,
+    tipo_gestao: str | None,
+    utilizadores_desktop: int,
+    utilizadores_web: int,
+    selecoes: dict[str, int],
+    web_selecoes: dict[str, int] | None = None,
+    extras_importados: set[str] | None = None,
+    extras_planos: dict[str, int] | None = None,
+    pos_counts: list[int] | None = None,
+    price_books=(),
+) -> dict:
+    """Quote one configuration under several price books in one call.
+
+    ``price_books`` is an iterable of :class:`PriceBook` objects or version
+    strings known to :data:`price_book_registry`, keyed in the result by
+    their ``versao``, or a mapping of labels (e.g. years) to either.
+    Returns ``{chave: calculate_plan result}``.
 
-    bancos_base = 0
-    if "Bank Connector" in selecoes:
-        if plano_final == 4:
-            bancos_base = 1
-        elif plano_final == 5:
-            bancos_base = 3
-        elif plano_final == 6:
-            bancos_base = 5
+    Prices do not move the plan floor, so it is computed once for every
+    group of books sharing the same user limits; only the cost stage runs
+    once per book.
+    """
+    extras_importados = extras_importados or set()
+    extras_planos = extras_planos or {}
+    web_selecoes = web_selecoes or {}
+    if not isinstance(price_books, Mapping):
+        price_books = {
+            book if isinstance(book, str) else book.versao: book for book in price_books
+        }
+
+    pisos: dict[tuple, tuple[int, tuple[PisoPlano, ...], list[str]]] = {}
+    resultados = {}
+    for chave, book in price_books.items():
+        if isinstance(book, str):
+            book = price_book_registry.get(book)
+        if book.limites not in pisos:
+            pisos[book.limites] = _plano_minimo(
+                plano_atual,
+                tipo_gestao,
+                utilizadores_desktop,
+                utilizadores_web,
+                selecoes,
+                extras_importados,
+                extras_planos,
+                book,
+            )
+        plano_final, pisos_book, warnings = pisos[book.limites]
+        resultados[chave] = _orcamento(
+            plano_final,
+            pisos_book,
+            list(warnings),
+            utilizadores_desktop,
+            utilizadores_web,
+            selecoes,
+            web_selecoes,
+            pos_counts,
+            book,
+        )
+    return resultados
 
-    bancos_total = bancos_base + bank_packs[0] * 5 + bank_packs[1] * 10
+
+def calculate_all_plans(
+    plano_atual: str,
+    tipo_gestao: str | None,
+    utilizadores_desktop: int,
+    utilizadores_web: int,
+    selecoes: dict[str, int],
+    web_selecoes: dict[str, int] | None = None,
+    extras_importados: set[str] | None = None,
+    extras_planos: dict[str, int] | None = None,
+    pos_counts: list[int] | None = None,
+    price_book: PriceBook | None = None,
+) -> dict:
+    """Price one configuration under every plan at once.
+
+    Takes the same arguments as :func:`calculate_plan` and returns NumPy
+    arrays with one entry per plan id (``planos``), priced in ``int64``
+    cents and converted to euros on the way out (``custo_estimado_centimos``
+    keeps the exact totals). ``valido`` flags the
+    plans at or above ``plano_final``, the floor ``calculate_plan`` would
+    recommend; the entry for ``plano_final`` matches its result exactly.
+    """
+    extras_importados = extras_importados or set()
+    extras_planos = extras_planos or {}
+    web_selecoes = web_selecoes or {}
+    price_book = price_book or default_price_book()
+    m = price_book.matrices
+
+    plano_final, pisos, warnings = _plano_minimo(
+        plano_atual,
+        tipo_gestao,
+        utilizadores_desktop,
+        utilizadores_web,
+        selecoes,
+        extras_importados,
+        extras_planos,
+        price_book,
+    )
+
+    incluidos_web = np.where(m.plano_ids >= 3, m.utilizadores_incluidos, 0)
+    extras = np.maximum(utilizadores_desktop - m.utilizadores_incluidos, 0) + np.maximum(
+        utilizadores_web - incluidos_web, 0
+    )
+    escaloes = m.escaloes(extras)
+    extra_centimos = (escaloes * m.precos_extras).sum(axis=-1)
+
+    modulos: dict[str, np.ndarray] = {}
+    for modulo, quantidade in selecoes.items():
+        if modulo == "Bank Connector":
+            continue
+        if modulo == POS_MODULE:
+            if quantidade > 0:
+                num_primeiros, ate_10, acima_10 = _pos_escaloes(quantidade, pos_counts)
+                modulos[modulo] = (
+                    num_primeiros * m.linha("POS (1º)")[0]
+                    + ate_10 * m.linha("POS (2 a 10)")[1]
+                    + acima_10 * m.linha("POS (>10)")[1]
+                )
+            else:
+                modulos[modulo] = np.zeros(len(m.plano_ids), dtype=np.int64)
+            continue
+        base, unidade = m.linha(modulo)
+        custo = base.copy()
+        if quantidade > 0:
+            qtd_desk, qtd_web = _utilizadores_pagos(modulo, quantidade, web_selecoes)
+            custo += (qtd_desk + qtd_web) * unidade
+        modulos[modulo] = custo
+
+    modulos_centimos = sum(modulos.values(), np.zeros(len(m.plano_ids), dtype=np.int64))
+    custo_estimado_centimos = m.preco_base + extra_centimos + modulos_centimos
 
     return {
-        "nome": nome,
-        "preco_base": preco_base,
-        "custo_estimado": custo_estimado,
-        "extras_utilizadores": extras,
-        "custo_extra_utilizadores": custo_extra_utilizadores,
-        "extras_breakdown": (grupo1, grupo2, grupo3),
-        "precos_extras": (preco_ate_10, preco_ate_50, preco_mais_50),
-        "modulos_detalhe": modulos_detalhe,
+        "planos": m.plano_ids,
+        "nomes": m.nomes,
+        "valido": m.plano_ids >= plano_final,
         "plano_final": plano_final,
-        "bancos_base": bancos_base,
-        "bank_packs": bank_packs,
-        "bancos_total": bancos_total,
-        "pos_breakdown": pos_breakdown,
+        "preco_base": euros(m.preco_base),
+        "extras_utilizadores": extras,
+        "extras_breakdown": escaloes,
+        "custo_extra_utilizadores": euros(extra_centimos),
+        "modulos": {modulo: euros(custo) for modulo, custo in modulos.items()},
+        "custo_modulos": euros(modulos_centimos),
+        "custo_modulos_centimos": modulos_centimos,
+        "custo_estimado": euros(custo_estimado_centimos),
+        "custo_estimado_centimos": custo_estimado_centimos,
+        "pisos": pisos,
         "warnings": warnings,
+        "versao_precos": price_book.versao,
     }
+
+
+# Input columns of calculate_plans_batch besides one column per module
+BATCH_COLUMNS = (
+    "plano_atual",
+    "tipo_gestao",
+    "utilizadores_desktop",
+    "utilizadores_web",
+    "pos_counts",
+    "extras_importados",
+)
+WEB_COLUMN_PREFIX = "web:"
+COST_COLUMN_PREFIX = "custo:"
+
+
+def _is_grupo(value) -> bool:
+    return isinstance(value, (list, tuple, set, frozenset, np.ndarray))
+
+
+def calculate_plans_batch(
+    df,
+    extras_planos: dict[str, int] | None = None,
+    price_book: PriceBook | None = None,
+):
+    """Price many scenarios at once, one DataFrame row per customer.
+
+    Expected columns are ``plano_atual``, ``tipo_gestao``,
+    ``utilizadores_desktop`` and ``utilizadores_web``, plus one column per
+    selected module holding its quantity (``NaN`` = not selected) and
+    optional ``web:<módulo>`` web quantities, ``pos_counts`` (list per row)
+    and ``extras_importados`` (set per row). Columns that are not modules
+    are ignored.
+
+    Returns a DataFrame on the same index with ``plano_final``, ``nome``,
+    the extra-user tiers, ``custo:<módulo>`` per module, bank counts,
+    totals, ``versao_precos`` and the dependency ``warnings``, each equal
+    to what :func:`calculate_plan` returns for the row. Prices are summed
+    as ``int64`` cents; ``custo_estimado_centimos`` keeps the exact totals
+    for aggregations over many rows.
+    """
+    import pandas as pd
+
+    extras_planos = extras_planos or {}
+    price_book = price_book or default_price_book()
+    m = price_book.matrices
+    n = len(df)
+
+    def numeric(column: str) -> np.ndarray:
+        if column not in df.columns:
+            return np.full(n, np.nan)
+        return pd.to_numeric(df[column], errors="coerce").to_numpy(dtype=np.float64)
+
+    def users(column: str) -> np.ndarray:
+        return np.nan_to_num(numeric(column)).astype(np.int64)
+
+    desk = users("utilizadores_desktop")
+    web = users("utilizadores_web")
+
+    # Plan floors
+    vazio = pd.Series([None] * n, index=df.index)
+    plano_atual = df["plano_atual"] if "plano_atual" in df.columns else vazio
+    tipo_gestao = df["tipo_gestao"] if "tipo_gestao" in df.columns else vazio
+    plano_final = plano_atual.map(PLANO_ATUAL_MINIMO).fillna(0).to_numpy(dtype=np.int64)
+    gestao = tipo_gestao.map(TIPO_GESTAO_MINIMO).fillna(0).to_numpy(dtype=np.int64)
+    plano_final = np.maximum(plano_final, np.where(plano_atual.to_numpy() == "Corporate", gestao, 0))
+
+    plano_final = np.maximum(plano_final, price_book.planos_por_utilizadores(np.maximum(desk, web)))
+
+    grafo = DEPENDENCY_GRAPH
+    modulos = [c for c in df.columns if c in MODULOS or c in m.indice_produtos or c in grafo.bits]
+    quantidades = {modulo: numeric(modulo) for modulo in modulos}
+    selecionado = {modulo: ~np.isnan(q) for modulo, q in quantidades.items()}
+    quantidades = {modulo: np.nan_to_num(q).astype(np.int64) for modulo, q in quantidades.items()}
+
+    if POS_MODULE in quantidades:
+        pos_limites, pos_planos = (np.array(t, dtype=np.int64) for t in POS_BREAKPOINTS)
+        pos_qtd = quantidades[POS_MODULE]
+        plano_final = np.maximum(plano_final, np.where(pos_qtd != 0, pos_planos[np.searchsorted(pos_limites, pos_qtd)], 0))
+
+    for modulo in modulos:
+        if modulo in PLANO_MODULOS:
+            plano_final = np.maximum(plano_final, np.where(selecionado[modulo], PLANO_MODULOS[modulo], 0))
+
+    if "extras_importados" in df.columns:
+        pisos_extras = [
+            max((extras_planos.get(e, 0) for e in extras), default=0) if _is_grupo(extras) else 0
+            for extras in df["extras_importados"]
+        ]
+        plano_final = np.maximum(plano_final, np.array(pisos_extras, dtype=np.int64))
+
+    # Costs, gathered from the column of each row's final plan
+    col = np.searchsorted(m.plano_ids, plano_final)
+    incluidos = m.utilizadores_incluidos[col]
+    incluidos_web = np.where(plano_final >= 3, incluidos, 0)
+    extras = np.maximum(desk - incluidos, 0) + np.maximum(web - incluidos_web, 0)
+    escaloes = dividir_escaloes(extras, m.larguras_escaloes[col])
+    extra_centimos = (escaloes * m.precos_extras[col]).sum(axis=-1)
+    base_centimos = m.preco_base[col]
+
+    resultado = {
+        "plano_final": plano_final,
+        "nome": np.array(m.nomes, dtype=object)[col],
+        "preco_base": euros(base_centimos),
+        "extras_utilizadores": extras,
+        "extras_ate_10": escaloes[:, 0],
+        "extras_ate_50": escaloes[:, 1],
+        "extras_acima_50": escaloes[:, 2],
+        "custo_extra_utilizadores": euros(extra_centimos),
+    }
+
+    modulos_centimos = np.zeros(n, dtype=np.int64)
+    bancos_base = np.zeros(n, dtype=np.int64)
+    bancos_total = np.zeros(n, dtype=np.int64)
+    bancos_centimos = np.zeros(n, dtype=np.int64)
+    for modulo in modulos:
+        q = quantidades[modulo]
+        sel = selecionado[modulo]
+        if modulo == "Bank Connector":
+            _, bancos_packs, centimos_packs = BANK_PACKS.resolver_lote(np.where(sel, q, 0))
+            incluidos_banco = np.array([BANCOS_INCLUIDOS.get(int(p), 0) for p in m.plano_ids])[col]
+            bancos_base = np.where(sel, incluidos_banco, 0)
+            bancos_total = np.where(sel, bancos_base + bancos_packs, 0)
+            bancos_centimos = np.where(sel, centimos_packs, 0)
+            continue
+        if modulo == POS_MODULE:
+            grupos_col = df["pos_counts"] if "pos_counts" in df.columns else vazio
+            grupos = [g if _is_grupo(g) else [qtd] for g, qtd in zip(grupos_col, q)]
+            linhas = np.repeat(np.arange(n), [len(g) for g in grupos])
+            extras_grupos = np.maximum(np.fromiter((x for g in grupos for x in g), dtype=np.int64) - 1, 0)
+            primeiros = np.bincount(linhas, minlength=n)
+            ate_10 = np.bincount(linhas, weights=np.minimum(extras_grupos, 9), minlength=n).astype(np.int64)
+            acima_10 = np.bincount(linhas, weights=np.maximum(extras_grupos - 9, 0), minlength=n).astype(np.int64)
+            custo = (
+                primeiros * m.linha("POS (1º)")[0][col]
+                + ate_10 * m.linha("POS (2 a 10)")[1][col]
+                + acima_10 * m.linha("POS (>10)")[1][col]
+            )
+            custo = np.where(sel & (q > 0), custo, 0)
+        else:
+            base, unidade = (linha[col] for linha in m.linha(modulo))
+            web_total = np.nan_to_num(numeric(WEB_COLUMN_PREFIX + modulo)).astype(np.int64)
+            info = MODULOS.get(modulo)
+            if info and info.web_only:
+                pagos_desk, pagos_web = np.zeros(n, dtype=np.int64), np.maximum(web_total - 1, 0)
+            elif info and info.web:
+                pagos_desk, pagos_web = np.maximum(q - web_total - 1, 0), np.maximum(web_total - 1, 0)
+            else:
+                pagos_desk, pagos_web = np.maximum(q - 1, 0), np.zeros(n, dtype=np.int64)
+            extra = np.where(q > 0, pagos_desk * unidade + pagos_web * unidade, 0)
+            custo = np.where(sel, base + extra, 0)
+        resultado[COST_COLUMN_PREFIX + modulo] = euros(custo)
+        modulos_centimos = modulos_centimos + custo
+
+    custo_estimado_centimos = base_centimos + extra_centimos + modulos_centimos
+    resultado["custo_modulos"] = euros(modulos_centimos)
+    resultado["custo_estimado"] = euros(custo_estimado_centimos)
+    resultado["custo_estimado_centimos"] = custo_estimado_centimos
+    resultado["bancos_base"] = bancos_base
+    resultado["bancos_total"] = bancos_total
+    resultado["custo_bancos"] = euros(bancos_centimos)
+    resultado["versao_precos"] = price_book.versao
+
+    mascaras = np.zeros(n, dtype=np.int64 if len(grafo.nomes) < 63 else object)
+    for modulo in modulos:
+        if modulo in grafo.bits:
+            mascaras = mascaras | np.where(selecionado[modulo], 1 << grafo.bits[modulo], 0)
+    resultado["warnings"] = grafo.avisos_lote(mascaras)
+    return pd.DataFrame(resultado, index=df.index)
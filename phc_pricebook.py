@@ -0,0 +1,485 @@
+from __future__ import annotations
+
+import csv
+import hashlib
+import io
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import cached_property, lru_cache
+from pathlib import Path
+from threading import Lock, Thread
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Mapping, NamedTuple
+
+import numpy as np
+
+if TYPE_CHECKING:  # pandas is only needed by the DataFrame helpers
+    import pandas as pd
+
+_BASE_DIR = Path(__file__).resolve().parent
+PRECOS_PLANOS_CSV = _BASE_DIR / "precos_planos.csv"
+PRECOS_PRODUTOS_CSV = _BASE_DIR / "precos_produtos.csv"
+# Binary snapshot of every price table, built by ``python -m phc_snapshot``
+PRECOS_SNAPSHOT = _BASE_DIR / "precos.snapshot"
+
+
+def _assinatura(path: Path) -> tuple[int, int]:
+    stat = path.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+@lru_cache(maxsize=4)
+def _read_csv(path: Path, assinatura: tuple[int, int]) -> pd.DataFrame:
+    # ``assinatura`` is only part of the cache key: a changed file is re-read.
+    import pandas as pd
+
+    return pd.read_csv(path, sep=",")
+
+
+def load_precos_planos() -> pd.DataFrame:
+    """Load pricing table for plans as a DataFrame (needs pandas), cached until the file changes."""
+    return _read_csv(PRECOS_PLANOS_CSV, _assinatura(PRECOS_PLANOS_CSV))
+
+
+def load_precos_produtos() -> pd.DataFrame:
+    """Load pricing table for modules as a DataFrame (needs pandas), cached until the file changes."""
+    return _read_csv(PRECOS_PRODUTOS_CSV, _assinatura(PRECOS_PRODUTOS_CSV))
+
+
+def _is_blank(value) -> bool:
+    # Covers both ``None``/``""`` (csv rows) and ``NaN`` (pandas rows).
+    return value is None or str(value).strip() in {"", "nan", "NaN"}
+
+
+def _as_float(value) -> float:
+    return 0.0 if _is_blank(value) else float(value)
+
+
+# Prices are compiled to integer cents; euros only appear at the edges.
+CENTIMOS = 100
+
+
+def _as_centimos(value) -> int:
+    return round(_as_float(value) * CENTIMOS)
+
+
+def euros(centimos):
+    """Convert cents (an ``int`` or an integer array) to euros."""
+    return centimos / CENTIMOS
+
+
+def _as_int(value) -> int:
+    return 0 if _is_blank(value) else int(float(value))
+
+
+# Width of each extra-user tier on plans priced by tiers (Ultimate): users
+# 6–10, 11–50 and above 50 once the 5 included users are discounted.
+ESCALOES_ULTIMATE = (5, 40)
+PLANO_ESCALONADO = 6
+# Width of an unbounded tier, kept small enough that sums of widths fit int64
+SEM_LIMITE = 2**40
+
+
+class PlanPrice(NamedTuple):
+    """One row of ``precos_planos.csv`` with typed fields.
+
+    Prices are stored in cents (``*_centimos``); the ``preco_*`` properties
+    return them in euros.
+    """
+
+    plano_id: int
+    nome: str
+    base_centimos: int
+    utilizadores_incluidos: int
+    limite_utilizadores: int | None
+    extras_centimos: tuple[int, int, int]
+
+    @property
+    def preco_base(self) -> float:
+        return euros(self.base_centimos)
+
+    @property
+    def preco_extra_ate_10(self) -> float:
+        return euros(self.extras_centimos[0])
+
+    @property
+    def preco_extra_ate_50(self) -> float:
+        return euros(self.extras_centimos[1])
+
+    @property
+    def preco_extra_acima_50(self) -> float:
+        return euros(self.extras_centimos[2])
+
+
+@dataclass(frozen=True, eq=False)
+class PriceMatrices:
+    """Dense NumPy view of a :class:`PriceBook`, one column per plan.
+
+    ``base``/``unidade`` are ``módulo × plano`` arrays indexed through
+    ``indice_produtos``; ``precos_extras`` and ``larguras_escaloes`` are
+    ``plano × escalão`` arrays for extra users. Plans without tiers have an
+    unbounded first tier (``SEM_LIMITE``), so the same tier arithmetic
+    prices every plan. Every array is ``int64`` and prices are in cents.
+    """
+
+    plano_ids: np.ndarray
+    nomes: tuple[str, ...]
+    preco_base: np.ndarray
+    utilizadores_incluidos: np.ndarray
+    precos_extras: np.ndarray
+    larguras_escaloes: np.ndarray
+    produtos: tuple[str, ...]
+    indice_produtos: Mapping[str, int]
+    base: np.ndarray
+    unidade: np.ndarray
+
+    @classmethod
+    def from_price_book(cls, book: PriceBook) -> PriceMatrices:
+        plano_ids = np.array(sorted(book.planos), dtype=np.int64)
+        col = {int(pid): j for j, pid in enumerate(plano_ids)}
+        planos = [book.planos[int(pid)] for pid in plano_ids]
+
+        precos_extras = np.array([p.extras_centimos for p in planos], dtype=np.int64).reshape(-1, 3)
+        larguras = np.zeros((len(planos), 3), dtype=np.int64)
+        larguras[:, 0] = SEM_LIMITE
+        escalonado = plano_ids == PLANO_ESCALONADO
+        larguras[escalonado] = (*ESCALOES_ULTIMATE, SEM_LIMITE)
+
+        produtos = tuple(dict.fromkeys(produto for produto, _ in book.produtos))
+        indice = {produto: i for i, produto in enumerate(produtos)}
+        base = np.zeros((len(produtos), len(planos)), dtype=np.int64)
+        unidade = np.zeros_like(base)
+        for (produto, pid), (preco_base, preco_unidade) in book.produtos.items():
+            if pid in col:
+                base[indice[produto], col[pid]] = preco_base
+                unidade[indice[produto], col[pid]] = preco_unidade
+
+        preco_base = np.array([p.base_centimos for p in planos], dtype=np.int64)
+        incluidos = np.array([p.utilizadores_incluidos for p in planos], dtype=np.int64)
+        for array in (plano_ids, preco_base, incluidos, precos_extras, larguras, base, unidade):
+            array.setflags(write=False)
+
+        return cls(
+            plano_ids=plano_ids,
+            nomes=tuple(p.nome for p in planos),
+            preco_base=preco_base,
+            utilizadores_incluidos=incluidos,
+            precos_extras=precos_extras,
+            larguras_escaloes=larguras,
+            produtos=produtos,
+            indice_produtos=MappingProxyType(indice),
+            base=base,
+            unidade=unidade,
+        )
+
+    def linha(self, produto: str) -> tuple[np.ndarray, np.ndarray]:
+        """Return the ``(base, unidade)`` price rows of ``produto`` (zeros if unknown)."""
+        i = self.indice_produtos.get(produto)
+        if i is None:
+            zeros = np.zeros(len(self.plano_ids), dtype=np.int64)
+            return zeros, zeros
+        return self.base[i], self.unidade[i]
+
+    def escaloes(self, extras) -> np.ndarray:
+        """Split per-plan extra users ``(..., plano)`` into tiers ``(..., plano, 3)``."""
+        return dividir_escaloes(extras, self.larguras_escaloes)
+
+    @cached_property
+    def _inicio_escaloes(self) -> tuple[np.ndarray, np.ndarray]:
+        # First extra user of each tier and the cost of all users before it.
+        larguras = self.larguras_escaloes
+        inicio = np.zeros_like(larguras)
+        inicio[:, 1:] = np.cumsum(larguras[:, :2], axis=1)
+        finitas = np.where(larguras < SEM_LIMITE, larguras * self.precos_extras, 0)
+        acumulado = np.zeros_like(larguras)
+        acumulado[:, 1:] = np.cumsum(finitas[:, :2], axis=1)
+        return inicio, acumulado
+
+    def custo_utilizadores(self, extras) -> np.ndarray:
+        """Cost of per-plan extra users ``(..., plano)`` in closed form.
+
+        Uses prefix sums over the tier boundaries instead of splitting the
+        users into tiers; equals ``(escaloes(extras) * precos_extras).sum(-1)``.
+        """
+        extras = np.asarray(extras, dtype=np.int64)
+        inicio, acumulado = self._inicio_escaloes
+        escalao = (extras >= inicio[:, 1]).astype(np.int64) + (extras >= inicio[:, 2])
+        colunas = np.arange(len(self.plano_ids))
+        return acumulado[colunas, escalao] + (extras - inicio[colunas, escalao]) * self.precos_extras[
+            colunas, escalao
+        ]
+
+
+def dividir_escaloes(extras, larguras: np.ndarray) -> np.ndarray:
+    """Split ``extras`` into three tier counts given matching tier ``larguras``.
+
+    ``larguras`` has a trailing axis of 3 widths and broadcasts against
+    ``extras``; the result has ``extras``' shape plus a trailing axis of 3.
+    """
+    extras = np.asarray(extras, dtype=np.int64)
+    g1 = np.minimum(extras, larguras[..., 0])
+    g2 = np.minimum(np.maximum(extras - larguras[..., 0], 0), larguras[..., 1])
+    g3 = np.maximum(extras - larguras[..., 0] - larguras[..., 1], 0)
+    return np.stack([g1, g2, g3], axis=-1)
+
+
+@dataclass(frozen=True, eq=False)
+class PriceBook:
+    """Immutable, pre-indexed view of the PHC Evolution price tables.
+
+    ``planos`` maps plan id → :class:`PlanPrice`, ``produtos`` maps
+    ``(produto, plano_id)`` → ``(preco_base, preco_unidade)`` in cents and
+    ``limites`` holds the user-limit breakpoints as ``(limite, plano_id)``
+    sorted by limit, so plan lookups are dictionary hits or a bisect.
+    ``versao`` identifies the price tables the book was compiled from.
+    """
+
+    planos: Mapping[int, PlanPrice]
+    produtos: Mapping[tuple[str, int], tuple[int, int]]
+    limites: tuple[tuple[int, int], ...]
+    versao: str = ""
+
+    @classmethod
+    def from_rows(cls, linhas_planos, linhas_produtos, versao: str = "") -> PriceBook:
+        """Compile a price book from ``precos_planos``/``precos_produtos`` rows."""
+        planos = {}
+        for row in linhas_planos:
+            limite = row.get("limite_utilizadores")
+            plano = PlanPrice(
+                plano_id=_as_int(row["plano_id"]),
+                nome=str(row["nome"]),
+                base_centimos=_as_centimos(row.get("preco_base")),
+                utilizadores_incluidos=_as_int(row.get("utilizadores_incluidos")),
+                limite_utilizadores=None if _is_blank(limite) else _as_int(limite),
+                extras_centimos=(
+                    _as_centimos(row.get("preco_extra_ate_10")),
+                    _as_centimos(row.get("preco_extra_ate_50")),
+                    _as_centimos(row.get("preco_extra_acima_50")),
+                ),
+            )
+            planos[plano.plano_id] = plano
+
+        produtos = {
+            (str(row["produto"]), _as_int(row["plano_id"])): (
+                _as_centimos(row.get("preco_base")),
+                _as_centimos(row.get("preco_unidade")),
+            )
+            for row in linhas_produtos
+        }
+        return cls.from_tables(planos, produtos, versao)
+
+    @classmethod
+    def from_tables(
+        cls,
+        planos: Mapping[int, PlanPrice],
+        produtos: Mapping[tuple[str, int], tuple[int, int]],
+        versao: str = "",
+    ) -> PriceBook:
+        """Build a price book from already typed plan and product tables."""
+        # The lowest plan id whose limit fits wins, so a plan can only be
+        # selected if its limit exceeds every limit of the plans before it.
+        limites: list[tuple[int, int]] = []
+        for pid in sorted(planos):
+            limite = planos[pid].limite_utilizadores
+            if limite is not None and (not limites or limite > limites[-1][0]):
+                limites.append((limite, pid))
+
+        return cls(
+            planos=MappingProxyType(dict(sorted(planos.items()))),
+            produtos=MappingProxyType(dict(produtos)),
+            limites=tuple(limites),
+            versao=versao,
+        )
+
+    @classmethod
+    def from_csv(cls, caminho_planos: Path | str, caminho_produtos: Path | str) -> PriceBook:
+        """Compile a price book from a pair of pricing CSVs (e.g. an older year)."""
+        return _compilar([Path(caminho_planos).read_bytes(), Path(caminho_produtos).read_bytes()])
+
+    @classmethod
+    def from_frames(cls, df_planos: pd.DataFrame, df_produtos: pd.DataFrame) -> PriceBook:
+        """Compile a price book from the two pricing DataFrames."""
+        return cls.from_rows(
+            (row for _, row in df_planos.iterrows()),
+            (row for _, row in df_produtos.iterrows()),
+        )
+
+    @property
+    def plano_maximo(self) -> int:
+        return max(self.planos)
+
+    @cached_property
+    def matrices(self) -> PriceMatrices:
+        """Dense per-plan price arrays, compiled on first use."""
+        return PriceMatrices.from_price_book(self)
+
+    def plano(self, plano_id: int) -> PlanPrice:
+        return self.planos[plano_id]
+
+    def centimos_produto(self, produto: str, plano_id: int) -> tuple[int, int]:
+        """Return ``(preco_base, preco_unidade)`` in cents or zeros when not priced."""
+        return self.produtos.get((produto, plano_id), (0, 0))
+
+    def preco_produto(self, produto: str, plano_id: int) -> tuple[float, float]:
+        """Return ``(preco_base, preco_unidade)`` in euros or zeros when not priced."""
+        base, unidade = self.centimos_produto(produto, plano_id)
+        return euros(base), euros(unidade)
+
+    @cached_property
+    def limites_utilizadores(self) -> tuple[tuple[int, ...], tuple[int, ...]]:
+        """User-limit breakpoints as ``(limites, planos)``.
+
+        ``planos[bisect_left(limites, n)]`` is the lowest plan allowing ``n``
+        users; ``planos`` ends with :attr:`plano_maximo` for counts above
+        every limit.
+        """
+        return (
+            tuple(limite for limite, _ in self.limites),
+            tuple(pid for _, pid in self.limites) + (self.plano_maximo,),
+        )
+
+    def planos_por_utilizadores(self, necessarios) -> np.ndarray:
+        """Vectorised :meth:`plano_por_utilizadores` over ``max(desktop, web)`` counts."""
+        limites, planos = self.limites_utilizadores
+        return np.array(planos, dtype=np.int64)[np.searchsorted(np.array(limites, dtype=np.int64), necessarios)]
+
+    def plano_por_utilizadores(self, utilizadores_desktop: int, utilizadores_web: int) -> int:
+        """Lowest plan whose user limit fits both desktop and web users."""
+        limites, planos = self.limites_utilizadores
+        return planos[bisect_left(limites, max(utilizadores_desktop, utilizadores_web))]
+
+
+def _ler_linhas(dados: bytes) -> list[dict[str, str]]:
+    return list(csv.DictReader(io.StringIO(dados.decode("utf-8")), delimiter=","))
+
+
+def _versao(dados: list[bytes]) -> str:
+    return hashlib.sha256(b"\0".join(dados)).hexdigest()[:12]
+
+
+def _compilar(dados: list[bytes]) -> PriceBook:
+    """Compile the raw ``precos_planos``/``precos_produtos`` CSV contents."""
+    return PriceBook.from_rows(_ler_linhas(dados[0]), _ler_linhas(dados[1]), versao=_versao(dados))
+
+
+class PriceBookRegistry:
+    """Source of the current :class:`PriceBook`, reloaded when the CSVs change.
+
+    :meth:`current` is the hot path: it returns the active book and, at most
+    every ``intervalo`` seconds, compares the files' mtime and size with the
+    ones it was built from. A change starts a rebuild in a background
+    thread; callers keep getting the previous book until the new one is
+    compiled and swapped in. Books are immutable, so whoever holds one keeps
+    a consistent snapshot. ``versao`` is a digest of the CSV contents, so
+    touching a file without changing it keeps the active book.
+
+    With ``snapshot`` set, loads first try the binary snapshot built by
+    ``python -m phc_snapshot`` and fall back to parsing the CSVs when it is
+    missing or was built from other versions of them.
+    """
+
+    def __init__(
+        self,
+        caminho_planos: Path | str,
+        caminho_produtos: Path | str,
+        intervalo: float = 2.0,
+        historico: int = 8,
+        snapshot: Path | str | None = None,
+    ) -> None:
+        self.caminhos = (Path(caminho_planos), Path(caminho_produtos))
+        self.snapshot = Path(snapshot) if snapshot is not None else None
+        self.intervalo = intervalo
+        self.historico = historico
+        self.ultimo_erro: Exception | None = None
+        self._lock = Lock()
+        self._ativo: PriceBook | None = None
+        self._assinaturas: tuple | None = None
+        self._verificado = 0.0
+        self._recarga: Thread | None = None
+        self._versoes: OrderedDict[str, PriceBook] = OrderedDict()
+
+    def current(self) -> PriceBook:
+        """Return the active price book, scheduling a reload if the files changed."""
+        ativo = self._ativo
+        if ativo is None:
+            return self.reload()
+        agora = time.monotonic()
+        if agora - self._verificado >= self.intervalo:
+            self._verificado = agora
+            assinaturas = self._ler_assinaturas()
+            if assinaturas is not None and assinaturas != self._assinaturas:
+                self._recarregar_em_fundo()
+        return ativo
+
+    def reload(self) -> PriceBook:
+        """Re-read the CSVs now and activate them if their content changed."""
+        assinaturas = self._ler_assinaturas()
+        book = self._do_snapshot(assinaturas)
+        if book is None:
+            dados = [caminho.read_bytes() for caminho in self.caminhos]
+            book = self._versoes.get(_versao(dados)) or _compilar(dados)
+        book.matrices  # compile the arrays before callers can see the book
+        versao = book.versao
+
+        with self._lock:
+            self._ativo = book
+            self._assinaturas = assinaturas
+            self._versoes[versao] = book
+            self._versoes.move_to_end(versao)
+            while len(self._versoes) > self.historico:
+                self._versoes.popitem(last=False)
+        return book
+
+    def get(self, versao: str) -> PriceBook:
+        """Return a previously loaded version (``KeyError`` once evicted)."""
+        return self._versoes[versao]
+
+    @property
+    def versoes(self) -> tuple[str, ...]:
+        """Versions still available through :meth:`get`, oldest first."""
+        return tuple(self._versoes)
+
+    def _ler_assinaturas(self) -> tuple | None:
+        try:
+            return tuple(_assinatura(caminho) for caminho in self.caminhos)
+        except OSError:
+            # A file being replaced may briefly be missing; check again later.
+            return None
+
+    def _do_snapshot(self, assinaturas: tuple | None) -> PriceBook | None:
+        if self.snapshot is None or assinaturas is None:
+            return None
+        from phc_snapshot import open_snapshot  # imports this module
+
+        snapshot = open_snapshot(self.snapshot)
+        if snapshot is None or tuple(snapshot.fontes.get(c.name) for c in self.caminhos) != assinaturas:
+            return None
+        return self._versoes.get(snapshot.versao) or snapshot.price_book()
+
+    def _recarregar_em_fundo(self) -> None:
+        with self._lock:
+            if self._recarga is not None and self._recarga.is_alive():
+                return
+            self._recarga = Thread(target=self._recarregar, name="price-book-reload", daemon=True)
+            self._recarga.start()
+
+    def _recarregar(self) -> None:
+        assinaturas = self._ler_assinaturas()
+        try:
+            self.reload()
+            self.ultimo_erro = None
+        except Exception as exc:  # keep serving the previous book
+            self.ultimo_erro = exc
+            with self._lock:
+                # Retry only once the files change again.
+                self._assinaturas = assinaturas
+
+
+price_book_registry = PriceBookRegistry(PRECOS_PLANOS_CSV, PRECOS_PRODUTOS_CSV, snapshot=PRECOS_SNAPSHOT)
+
+
+def default_price_book() -> PriceBook:
+    """Return the process-wide price book compiled from the bundled CSVs."""
+    return price_book_registry.current()
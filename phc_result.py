@@ -0,0 +1,361 @@
+from __future__ import annotations
+
+from array import array
+from collections.abc import Iterable, Iterator, Mapping
+from typing import NamedTuple
+
+import numpy as np
+
+from phc_pricebook import PlanPrice, euros
+
+# Keys of the dictionary ``calculate_plan`` used to return, in order
+RESULT_KEYS = (
+    "nome",
+    "preco_base",
+    "custo_estimado",
+    "extras_utilizadores",
+    "custo_extra_utilizadores",
+    "extras_breakdown",
+    "precos_extras",
+    "modulos_detalhe",
+    "plano_final",
+    "bancos_base",
+    "bank_packs",
+    "bancos_total",
+    "custo_bancos",
+    "pos_breakdown",
+    "warnings",
+    "versao_precos",
+)
+
+# Values per module in ``PlanResult.tabela``: custo base, custo desktop and
+# custo web in cents, utilizadores desktop pagos, utilizadores web pagos
+LARGURA_TABELA = 5
+
+
+class LinhaModulo(NamedTuple):
+    """Cost line of one selected module."""
+
+    modulo: str
+    custo_base: float
+    custo_desktop: float
+    custo_web: float
+    utilizadores_desktop: int
+    utilizadores_web: int
+
+    @property
+    def custo_total(self) -> float:
+        return self.custo_base + (self.custo_desktop + self.custo_web)
+
+    @property
+    def preco_unidade_desktop(self) -> float:
+        if self.utilizadores_desktop:
+            return self.custo_desktop / self.utilizadores_desktop
+        return self.custo_desktop
+
+    @property
+    def preco_unidade_web(self) -> float:
+        if self.utilizadores_web:
+            return self.custo_web / self.utilizadores_web
+        return self.custo_web
+
+
+class LinhaEscalao(NamedTuple):
+    """Extra users charged in one tier (``escalao`` 0, 1 or 2)."""
+
+    escalao: int
+    quantidade: int
+    preco_unidade: float
+    custo: float
+
+
+class LinhaPos(NamedTuple):
+    """POS terminals charged in one tier: ``escalao`` 0 counts the first POS
+    of each store, ``1`` the extra ones from 2 to 10 and ``2`` above 10."""
+
+    escalao: int
+    quantidade: int
+    preco_unidade: float
+    custo: float
+
+    @property
+    def descricao(self) -> str:
+        """Quote label of the tier, e.g. ``… - (3 Postos Adicionais - Escalão de 2 a 10)``."""
+        if self.escalao == 0:
+            return "1º Ponto de Venda (POS/Restauração)"
+        postos = "Posto Adicional" if self.quantidade == 1 else "Postos Adicionais"
+        escalao = "Escalão de 2 a 10" if self.escalao == 1 else "Escalão de 11 a 50"
+        return f"Ponto de Venda (POS/Restauração) - ({self.quantidade} {postos} - {escalao})"
+
+
+class LinhaLoja(NamedTuple):
+    """POS terminals of one store (``loja`` counts from 1) and their cost."""
+
+    loja: int
+    postos: int
+    ate_10: int
+    acima_10: int
+    custo: float
+
+
+class PosBreakdown(NamedTuple):
+    """POS terminals per tier over every store, with the tier prices.
+
+    The six fields are the historical ``pos_breakdown`` tuple. Quotes only
+    need :attr:`linhas`, one line per tier whatever the number of stores;
+    :meth:`por_loja` expands the ``pos_counts`` of the request into
+    per-store lines on demand.
+    """
+
+    num_primeiros: int
+    ate_10: int
+    acima_10: int
+    preco_primeiro: float
+    preco_2_10: float
+    preco_maior_10: float
+
+    @property
+    def linhas(self) -> tuple[LinhaPos, ...]:
+        """Non-empty tiers: ``0`` first POS per store, ``1`` 2 to 10, ``2`` above 10."""
+        return tuple(
+            LinhaPos(escalao, quantidade, preco, quantidade * preco)
+            for escalao, quantidade, preco in (
+                (0, self.num_primeiros, self.preco_primeiro),
+                (1, self.ate_10, self.preco_2_10),
+                (2, self.acima_10, self.preco_maior_10),
+            )
+            if quantidade
+        )
+
+    def por_loja(self, lojas: Iterable[int]) -> Iterator[LinhaLoja]:
+        """Yield the line of each store in ``lojas`` (its POS count), one at a time."""
+        for loja, postos in enumerate(lojas, 1):
+            extras = max(postos - 1, 0)
+            ate_10 = min(extras, 9)
+            acima_10 = extras - ate_10
+            custo = self.preco_primeiro + (ate_10 * self.preco_2_10 + acima_10 * self.preco_maior_10)
+            yield LinhaLoja(loja, postos, ate_10, acima_10, custo)
+
+
+class PackBancos(NamedTuple):
+    """Bank Connector packs added to a quote.
+
+    ``packs`` counts the packs of each size in ``BANK_PACK_PRICES`` (in
+    ascending size), ``bancos`` the banks they add and ``centimos`` their
+    price in cents.
+    """
+
+    packs: tuple[int, ...]
+    bancos: int
+    centimos: int
+
+    @property
+    def custo(self) -> float:
+        return euros(self.centimos)
+
+
+class PisoPlano(NamedTuple):
+    """Plan floor imposed by one rule; ``origem`` is the input that triggered it."""
+
+    regra: str
+    plano: int
+    origem: object = None
+
+
+def piso_determinante(pisos) -> PisoPlano | None:
+    """Return the floor that sets the plan (the first rule reaching the maximum)."""
+    determinante = None
+    for piso in pisos:
+        if determinante is None or piso.plano > determinante.plano:
+            determinante = piso
+    return determinante
+
+
+class PlanResult(Mapping):
+    """Result of :func:`phc_logic.calculate_plan`.
+
+    Amounts are kept as integer cents and converted to euros by the
+    properties. Module lines live in one flat ``array('q')`` with the five
+    ``modulos_detalhe`` values per module, next to the tuple of module
+    names; :attr:`tabela_modulos` is a NumPy view of it. Fields derived from
+    the lines are only built when read. Results are immutable and double as
+    a read-only mapping with the keys of the historical result dictionary;
+    :meth:`to_dict` returns that dictionary.
+    """
+
+    __slots__ = (
+        "plano",
+        "versao_precos",
+        "extras_utilizadores",
+        "extras_breakdown",
+        "extra_centimos",
+        "modulos",
+        "tabela",
+        "modulos_centimos",
+        "packs_bancos",
+        "bancos_base",
+        "pos_breakdown",
+        "warnings",
+        "pisos",
+        "_linhas",
+    )
+
+    def __init__(
+        self,
+        plano: PlanPrice,
+        versao_precos: str,
+        extras_utilizadores: int,
+        extras_breakdown: tuple[int, int, int],
+        extra_centimos: int,
+        modulos: tuple[str, ...],
+        tabela,
+        modulos_centimos: int,
+        packs_bancos: PackBancos,
+        bancos_base: int,
+        pos_breakdown: PosBreakdown | None,
+        warnings,
+        pisos: tuple = (),
+    ) -> None:
+        definir = object.__setattr__
+        definir(self, "plano", plano)
+        definir(self, "versao_precos", versao_precos)
+        definir(self, "extras_utilizadores", extras_utilizadores)
+        definir(self, "extras_breakdown", extras_breakdown)
+        definir(self, "extra_centimos", extra_centimos)
+        definir(self, "modulos", modulos)
+        # Row-major ``módulo × (base, desktop, web, qtd_desktop, qtd_web)``
+        definir(self, "tabela", tabela if isinstance(tabela, array) else array("q", tabela))
+        definir(self, "modulos_centimos", modulos_centimos)
+        definir(self, "packs_bancos", packs_bancos)
+        definir(self, "bancos_base", bancos_base)
+        definir(self, "pos_breakdown", pos_breakdown)
+        definir(self, "warnings", tuple(warnings))
+        definir(self, "pisos", tuple(pisos))
+        definir(self, "_linhas", None)
+
+    def __setattr__(self, nome: str, valor) -> None:
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    @classmethod
+    def from_lines(cls, linhas: Mapping[str, tuple], **campos) -> PlanResult:
+        """Build a result from ``modulos_detalhe``-style 5-tuples in cents."""
+        tabela: list[int] = []
+        for detalhe in linhas.values():
+            tabela.extend(detalhe)
+        return cls(modulos=tuple(linhas), tabela=tabela, **campos)
+
+    # -- plan fields -------------------------------------------------------
+
+    @property
+    def nome(self) -> str:
+        return self.plano.nome
+
+    @property
+    def plano_final(self) -> int:
+        return self.plano.plano_id
+
+    @property
+    def preco_base(self) -> float:
+        return self.plano.preco_base
+
+    @property
+    def precos_extras(self) -> tuple[float, float, float]:
+        plano = self.plano
+        return plano.preco_extra_ate_10, plano.preco_extra_ate_50, plano.preco_extra_acima_50
+
+    @property
+    def custo_extra_utilizadores(self) -> float:
+        return euros(self.extra_centimos)
+
+    @property
+    def custo_modulos(self) -> float:
+        return euros(self.modulos_centimos)
+
+    @property
+    def custo_estimado_centimos(self) -> int:
+        return self.plano.base_centimos + self.extra_centimos + self.modulos_centimos
+
+    @property
+    def custo_estimado(self) -> float:
+        return euros(self.custo_estimado_centimos)
+
+    @property
+    def piso_determinante(self) -> PisoPlano | None:
+        """Floor of the rule that set the plan, see :attr:`pisos`."""
+        return piso_determinante(self.pisos)
+
+    # -- banks -------------------------------------------------------------
+
+    @property
+    def bank_packs(self) -> tuple[int, ...]:
+        return self.packs_bancos.packs
+
+    @property
+    def bancos_total(self) -> int:
+        return self.bancos_base + self.packs_bancos.bancos
+
+    @property
+    def custo_bancos(self) -> float:
+        """Price of the extra Bank Connector packs (not in ``custo_estimado``)."""
+        return self.packs_bancos.custo
+
+    # -- lines -------------------------------------------------------------
+
+    @property
+    def linhas_modulos(self) -> tuple[LinhaModulo, ...]:
+        """Module cost lines in selection order."""
+        if self._linhas is None:
+            t = self.tabela
+            linhas = tuple(
+                LinhaModulo(modulo, euros(t[i]), euros(t[i + 1]), euros(t[i + 2]), t[i + 3], t[i + 4])
+                for modulo, i in zip(self.modulos, range(0, len(t), LARGURA_TABELA))
+            )
+            object.__setattr__(self, "_linhas", linhas)
+        return self._linhas
+
+    @property
+    def tabela_modulos(self) -> np.ndarray:
+        """Read-only ``módulo × 5`` ``int64`` view of the module lines (costs in cents)."""
+        tabela = np.frombuffer(self.tabela, dtype=np.int64).reshape(-1, LARGURA_TABELA)
+        tabela.setflags(write=False)
+        return tabela
+
+    @property
+    def linhas_utilizadores(self) -> tuple[LinhaEscalao, ...]:
+        """Extra-user charges per non-empty tier."""
+        return tuple(
+            LinhaEscalao(escalao, quantidade, preco, quantidade * preco)
+            for escalao, (quantidade, preco) in enumerate(zip(self.extras_breakdown, self.precos_extras))
+            if quantidade
+        )
+
+    @property
+    def linhas_pos(self) -> tuple[LinhaPos, ...]:
+        """POS charges per non-empty tier, see :class:`PosBreakdown`."""
+        return self.pos_breakdown.linhas if self.pos_breakdown is not None else ()
+
+    @property
+    def modulos_detalhe(self) -> dict[str, tuple[float, float, float, int, int]]:
+        return {linha.modulo: tuple(linha[1:]) for linha in self.linhas_modulos}
+
+    # -- mapping view ------------------------------------------------------
+
+    def __getitem__(self, chave: str):
+        if chave not in RESULT_KEYS:
+            raise KeyError(chave)
+        if chave == "warnings":
+            return list(self.warnings)
+        return getattr(self, chave)
+
+    def __iter__(self):
+        return iter(RESULT_KEYS)
+
+    def __len__(self) -> int:
+        return len(RESULT_KEYS)
+
+    def to_dict(self) -> dict:
+        """Return the result as the historical plain dictionary."""
+        return {chave: self[chave] for chave in RESULT_KEYS}
+
+    def __repr__(self) -> str:
+        return f"PlanResult(plano_final={self.plano_final}, nome={self.nome!r}, custo_estimado={self.custo_estimado!r})"
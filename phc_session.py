@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+from collections import Counter
+
+from phc_logic import (
+    BANCOS_INCLUIDOS,
+    PLANO_ATUAL_MINIMO,
+    PLANO_MODULOS,
+    POS_MODULE,
+    SEM_PACKS,
+    TIPO_GESTAO_MINIMO,
+    PedidoPlano,
+    _avaliar_pisos,
+    _avisos_dependencias,
+    _custo_utilizadores,
+    _linha_modulo,
+    _piso_pos,
+    solve_bank_packs,
+)
+from phc_pricebook import PriceBook, default_price_book, euros
+from phc_result import PlanResult
+
+
+class QuoteSession:
+    """Quote edited one field at a time, re-priced incrementally.
+
+    The session keeps the plan floor imposed by each rule and the cost line
+    of each selected module. ``set_module``, ``remove_module`` and
+    ``set_users`` only recompute what the change touches; every line is
+    re-priced only when the change moves ``plano_final``. :meth:`result`
+    returns the same dictionary as :func:`phc_logic.calculate_plan`.
+    """
+
+    def __init__(
+        self,
+        plano_atual: str,
+        tipo_gestao: str | None,
+        utilizadores_desktop: int = 0,
+        utilizadores_web: int = 0,
+        selecoes: dict[str, int] | None = None,
+        web_selecoes: dict[str, int] | None = None,
+        extras_importados: set[str] | None = None,
+        extras_planos: dict[str, int] | None = None,
+        pos_counts: list[int] | None = None,
+        price_book: PriceBook | None = None,
+    ) -> None:
+        self.price_book = price_book or default_price_book()
+        self.plano_atual = plano_atual
+        self.tipo_gestao = tipo_gestao
+        self.utilizadores_desktop = utilizadores_desktop
+        self.utilizadores_web = utilizadores_web
+        self.extras_importados = frozenset(extras_importados or ())
+        self.extras_planos = dict(extras_planos or {})
+
+        self._selecoes: dict[str, int] = dict(selecoes or {})
+        self._web_selecoes: dict[str, int] = dict(web_selecoes or {})
+        self._pos_counts = pos_counts
+
+        # Plan floor set by each rule; modules share one floor kept as a
+        # count of selected modules per required plan so removals are O(1).
+        self._pisos = {
+            "plano_atual": PLANO_ATUAL_MINIMO.get(plano_atual, 0),
+            "tipo_gestao": TIPO_GESTAO_MINIMO.get(tipo_gestao, 0) if plano_atual == "Corporate" else 0,
+            "utilizadores": self.price_book.plano_por_utilizadores(utilizadores_desktop, utilizadores_web),
+            "pos": 0,
+            "extras": max((self.extras_planos.get(extra, 0) for extra in self.extras_importados), default=0),
+        }
+        self._pisos_modulos: Counter[int] = Counter()
+        for modulo, quantidade in self._selecoes.items():
+            self._acrescentar_piso(modulo, quantidade)
+
+        self.plano_final = self._plano_minimo()
+        self._recalcular()
+
+    # -- floors ------------------------------------------------------------
+
+    def _acrescentar_piso(self, modulo: str, quantidade: int) -> None:
+        if modulo in PLANO_MODULOS:
+            self._pisos_modulos[PLANO_MODULOS[modulo]] += 1
+        if modulo == POS_MODULE:
+            self._pisos["pos"] = _piso_pos(quantidade) if quantidade else 0
+
+    def _retirar_piso(self, modulo: str) -> None:
+        if modulo in PLANO_MODULOS:
+            plano = PLANO_MODULOS[modulo]
+            self._pisos_modulos[plano] -= 1
+            if not self._pisos_modulos[plano]:
+                del self._pisos_modulos[plano]
+        if modulo == POS_MODULE:
+            self._pisos["pos"] = 0
+
+    @property
+    def pisos(self) -> dict[str, int]:
+        """Plan floor imposed by each rule (``0`` when the rule does not apply)."""
+        return {**self._pisos, "modulos": max(self._pisos_modulos, default=0)}
+
+    def _plano_minimo(self) -> int:
+        return max(self.pisos.values()) or 1
+
+    # -- costs -------------------------------------------------------------
+
+    def _recalcular(self) -> None:
+        """Re-price the plan, the extra users and every module line."""
+        self._plano = self.price_book.plano(self.plano_final)
+        self._recalcular_utilizadores()
+        self._linhas: dict[str, tuple[int, int, int, int, int]] = {}
+        self._modulos_centimos = 0
+        self._pos_breakdown = None
+        for modulo, quantidade in self._selecoes.items():
+            self._recalcular_linha(modulo, quantidade)
+
+    def _recalcular_utilizadores(self) -> None:
+        self._utilizadores = _custo_utilizadores(self._plano, self.utilizadores_desktop, self.utilizadores_web)
+
+    def _retirar_linha(self, modulo: str) -> None:
+        detalhe = self._linhas.pop(modulo, None)
+        if detalhe is not None:
+            self._modulos_centimos -= detalhe[0] + detalhe[1] + detalhe[2]
+        if modulo == POS_MODULE:
+            self._pos_breakdown = None
+
+    def _recalcular_linha(self, modulo: str, quantidade: int) -> None:
+        if modulo == "Bank Connector":
+            return
+        detalhe, breakdown = _linha_modulo(
+            modulo, quantidade, self.plano_final, self._web_selecoes, self._pos_counts, self.price_book
+        )
+        anterior = self._linhas.get(modulo)
+        if anterior is not None:
+            self._modulos_centimos -= anterior[0] + anterior[1] + anterior[2]
+        self._linhas[modulo] = detalhe
+        self._modulos_centimos += detalhe[0] + detalhe[1] + detalhe[2]
+        if modulo == POS_MODULE:
+            self._pos_breakdown = breakdown
+
+    def _atualizar(self, modulo: str | None = None) -> None:
+        """Re-price after a change: everything if the plan moved, else ``modulo``."""
+        plano_final = self._plano_minimo()
+        if plano_final != self.plano_final:
+            self.plano_final = plano_final
+            self._recalcular()
+        elif modulo is not None and modulo in self._selecoes:
+            self._recalcular_linha(modulo, self._selecoes[modulo])
+
+    # -- edits -------------------------------------------------------------
+
+    def set_module(
+        self,
+        modulo: str,
+        quantidade: int,
+        *,
+        web: int | None = None,
+        pos_counts: list[int] | None = None,
+    ) -> None:
+        """Select ``modulo`` (or change its quantity).
+
+        ``web`` sets the module's web users when given; ``pos_counts``
+        replaces the per-store POS terminals when ``modulo`` is the POS.
+        """
+        if modulo in self._selecoes:
+            self._retirar_piso(modulo)
+        self._selecoes[modulo] = quantidade
+        self._acrescentar_piso(modulo, quantidade)
+        if web is not None:
+            self._web_selecoes[modulo] = web
+        if modulo == POS_MODULE:
+            self._pos_counts = pos_counts
+        self._atualizar(modulo)
+
+    def remove_module(self, modulo: str) -> None:
+        """Drop ``modulo`` from the quote; unknown modules are ignored."""
+        if modulo not in self._selecoes:
+            return
+        del self._selecoes[modulo]
+        self._web_selecoes.pop(modulo, None)
+        self._retirar_piso(modulo)
+        self._retirar_linha(modulo)
+        self._atualizar()
+
+    def set_users(self, utilizadores_desktop: int, utilizadores_web: int) -> None:
+        """Change the desktop and web user counts."""
+        self.utilizadores_desktop = utilizadores_desktop
+        self.utilizadores_web = utilizadores_web
+        self._pisos["utilizadores"] = self.price_book.plano_por_utilizadores(utilizadores_desktop, utilizadores_web)
+        plano_final = self.plano_final
+        self._atualizar()
+        if plano_final == self.plano_final:
+            self._recalcular_utilizadores()
+
+    # -- results -----------------------------------------------------------
+
+    @property
+    def selecoes(self) -> dict[str, int]:
+        return dict(self._selecoes)
+
+    @property
+    def custo_estimado(self) -> float:
+        return euros(self._plano.base_centimos + self._utilizadores[2] + self._modulos_centimos)
+
+    def result(self) -> PlanResult:
+        """Return the quote as :func:`phc_logic.calculate_plan` would."""
+        extras, escaloes, extra_centimos = self._utilizadores
+        packs_bancos = SEM_PACKS
+        bancos_base = 0
+        if "Bank Connector" in self._selecoes:
+            packs_bancos = solve_bank_packs(self._selecoes["Bank Connector"])
+            bancos_base = BANCOS_INCLUIDOS.get(self.plano_final, 0)
+        return PlanResult.from_lines(
+            self._linhas,
+            plano=self._plano,
+            versao_precos=self.price_book.versao,
+            extras_utilizadores=extras,
+            extras_breakdown=escaloes,
+            extra_centimos=extra_centimos,
+            modulos_centimos=self._modulos_centimos,
+            packs_bancos=packs_bancos,
+            bancos_base=bancos_base,
+            pos_breakdown=self._pos_breakdown,
+            warnings=_avisos_dependencias(self._selecoes),
+            pisos=_avaliar_pisos(
+                PedidoPlano(
+                    self.plano_atual,
+                    self.tipo_gestao,
+                    self.utilizadores_desktop,
+                    self.utilizadores_web,
+                    self._selecoes,
+                    self.extras_importados,
+                    self.extras_planos,
+                    self.price_book,
+                )
+            ),
+        )
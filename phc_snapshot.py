@@ -0,0 +1,321 @@
+from __future__ import annotations
+
+import csv
+import io
+import json
+import os
+import struct
+import sys
+from bisect import bisect_left
+from collections.abc import Mapping, Sequence
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+from phc_pricebook import (
+    CENTIMOS,
+    PRECOS_PLANOS_CSV,
+    PRECOS_PRODUTOS_CSV,
+    PRECOS_SNAPSHOT,
+    PlanPrice,
+    PriceBook,
+    _assinatura,
+    _compilar,
+    euros,
+)
+
+# File layout: ``MAGIC``, the format and header size (``<8sII``), a JSON
+# header and the arrays, each starting on an ``ALINHAMENTO`` boundary. The
+# header keeps the signature (mtime, size) of every source CSV, the price
+# book version and, per array, its offset, dtype and shape. Strings are
+# stored as a UTF-8 blob (``<nome>``) plus ``int64`` offsets
+# (``<nome>.inicio``).
+MAGIC = b"PHCSNAP\0"
+FORMATO = 1
+ALINHAMENTO = 64
+_PREFIXO = struct.Struct("<8sII")
+
+# Legacy reference catalogs (``ref;design;Preco_Euros`` in latin-1) used by
+# the Task Force simulator to value the current PHC CS installation
+CATALOGOS = ("Precos2024", "Precos2025")
+
+
+def _alinhar(posicao: int) -> int:
+    return -(-posicao // ALINHAMENTO) * ALINHAMENTO
+
+
+def parse_preco_centimos(valor) -> int:
+    """Convert a price string like ``'136,00 €'`` to cents (``0`` when invalid)."""
+    if valor is None:
+        return 0
+    texto = str(valor).strip().replace("€", "").replace(" ", "")
+    texto = texto.replace(".", "").replace(",", ".")
+    try:
+        return round(float(texto) * CENTIMOS)
+    except ValueError:
+        return 0
+
+
+def _ler_catalogo(dados: bytes) -> dict[str, int]:
+    precos = {}
+    for row in csv.DictReader(io.StringIO(dados.decode("latin-1")), delimiter=";"):
+        ref = (row.get("ref") or "").strip()
+        if ref:
+            precos[ref] = parse_preco_centimos(row.get("Preco_Euros"))
+    return precos
+
+
+class TabelaTexto(Sequence):
+    """Read-only sequence of strings stored as a UTF-8 blob plus offsets."""
+
+    __slots__ = ("_dados", "_inicio")
+
+    def __init__(self, dados: np.ndarray, inicio: np.ndarray) -> None:
+        self._dados = dados
+        self._inicio = inicio
+
+    @staticmethod
+    def compilar(textos) -> tuple[np.ndarray, np.ndarray]:
+        """Return the ``(dados, inicio)`` arrays of ``textos``."""
+        codificados = [texto.encode("utf-8") for texto in textos]
+        inicio = np.zeros(len(codificados) + 1, dtype=np.int64)
+        np.cumsum([len(c) for c in codificados], out=inicio[1:])
+        return np.frombuffer(b"".join(codificados), dtype=np.uint8), inicio
+
+    def __len__(self) -> int:
+        return len(self._inicio) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self._dados[self._inicio[i] : self._inicio[i + 1]].tobytes().decode("utf-8")
+
+
+class CatalogoPrecos(Mapping):
+    """Reference → price in euros of a legacy catalog.
+
+    ``refs`` is sorted, so lookups are a bisect over the string table and
+    nothing is unpacked into a dictionary.
+    """
+
+    __slots__ = ("refs", "centimos")
+
+    def __init__(self, refs: Sequence[str], centimos) -> None:
+        self.refs = refs
+        self.centimos = centimos
+
+    @classmethod
+    def from_dict(cls, precos: Mapping[str, int]) -> CatalogoPrecos:
+        refs = sorted(precos)
+        return cls(refs, np.array([precos[ref] for ref in refs], dtype=np.int64))
+
+    def _posicao(self, ref) -> int:
+        i = bisect_left(self.refs, ref)
+        if i < len(self.refs) and self.refs[i] == ref:
+            return i
+        raise KeyError(ref)
+
+    def centimos_de(self, ref: str) -> int:
+        return int(self.centimos[self._posicao(ref)])
+
+    def __getitem__(self, ref: str) -> float:
+        return euros(self.centimos_de(ref))
+
+    def __contains__(self, ref) -> bool:
+        try:
+            self._posicao(ref)
+        except (KeyError, TypeError):
+            return False
+        return True
+
+    def __iter__(self):
+        return iter(self.refs)
+
+    def __len__(self) -> int:
+        return len(self.refs)
+
+
+def build_snapshot(destino: Path | str = PRECOS_SNAPSHOT, pasta: Path | str | None = None) -> Path:
+    """Compile every pricing CSV in ``pasta`` into the snapshot at ``destino``.
+
+    The file is written next to ``destino`` and renamed over it, so
+    processes that mapped the previous snapshot keep a consistent view.
+    """
+    destino = Path(destino)
+    pasta = Path(pasta) if pasta is not None else destino.parent
+    nomes = (PRECOS_PLANOS_CSV.name, PRECOS_PRODUTOS_CSV.name, *(f"{c}.csv" for c in CATALOGOS))
+    # Signatures are taken before reading, so an edit in between leaves a
+    # stale snapshot (and a CSV fallback) rather than a wrong one.
+    fontes = {nome: list(_assinatura(pasta / nome)) for nome in nomes}
+    dados = {nome: (pasta / nome).read_bytes() for nome in nomes}
+
+    book = _compilar([dados[PRECOS_PLANOS_CSV.name], dados[PRECOS_PRODUTOS_CSV.name]])
+    planos = list(book.planos.values())
+    produtos = sorted(book.produtos.items())
+    arrays: dict[str, np.ndarray] = {}
+
+    def textos(nome: str, valores) -> None:
+        arrays[nome], arrays[nome + ".inicio"] = TabelaTexto.compilar(valores)
+
+    arrays["planos.id"] = np.array([p.plano_id for p in planos], dtype=np.int64)
+    textos("planos.nome", (p.nome for p in planos))
+    arrays["planos.base"] = np.array([p.base_centimos for p in planos], dtype=np.int64)
+    arrays["planos.incluidos"] = np.array([p.utilizadores_incluidos for p in planos], dtype=np.int64)
+    arrays["planos.limite"] = np.array(
+        [-1 if p.limite_utilizadores is None else p.limite_utilizadores for p in planos], dtype=np.int64
+    )
+    arrays["planos.extras"] = np.array([p.extras_centimos for p in planos], dtype=np.int64).reshape(-1, 3)
+
+    textos("produtos.nome", (produto for (produto, _), _ in produtos))
+    arrays["produtos.plano"] = np.array([pid for (_, pid), _ in produtos], dtype=np.int64)
+    arrays["produtos.base"] = np.array([base for _, (base, _) in produtos], dtype=np.int64)
+    arrays["produtos.unidade"] = np.array([unidade for _, (_, unidade) in produtos], dtype=np.int64)
+
+    for catalogo in CATALOGOS:
+        precos = _ler_catalogo(dados[f"{catalogo}.csv"])
+        refs = sorted(precos)
+        textos(f"{catalogo}.ref", refs)
+        arrays[f"{catalogo}.preco"] = np.array([precos[ref] for ref in refs], dtype=np.int64)
+
+    indice = {}
+    posicao = 0
+    for nome, array in arrays.items():
+        posicao = _alinhar(posicao)
+        indice[nome] = [posicao, array.dtype.str, list(array.shape)]
+        posicao += array.nbytes
+    cabecalho = json.dumps(
+        {"fontes": fontes, "versao": book.versao, "arrays": indice}, ensure_ascii=False
+    ).encode("utf-8")
+    inicio = _alinhar(_PREFIXO.size + len(cabecalho))
+
+    temporario = destino.with_name(f"{destino.name}.{os.getpid()}.tmp")
+    with open(temporario, "wb") as f:
+        f.write(_PREFIXO.pack(MAGIC, FORMATO, len(cabecalho)))
+        f.write(cabecalho)
+        for nome, array in arrays.items():
+            f.seek(inicio + indice[nome][0])
+            f.write(np.ascontiguousarray(array).tobytes())
+        f.truncate(inicio + posicao)
+    os.replace(temporario, destino)
+    return destino
+
+
+class Snapshot:
+    """Memory-mapped view of a snapshot built by :func:`build_snapshot`.
+
+    Arrays are read-only views over one ``np.memmap``: processes mapping
+    the same file share its pages through the page cache and a table is
+    only paged in when used.
+    """
+
+    def __init__(self, caminho: Path | str) -> None:
+        self.caminho = Path(caminho)
+        with open(self.caminho, "rb") as f:
+            magic, formato, tamanho = _PREFIXO.unpack(f.read(_PREFIXO.size))
+            if magic != MAGIC or formato != FORMATO:
+                raise ValueError(f"{self.caminho} is not a format {FORMATO} price snapshot")
+            cabecalho = json.loads(f.read(tamanho))
+        self.fontes: dict[str, tuple[int, int]] = {
+            nome: tuple(assinatura) for nome, assinatura in cabecalho["fontes"].items()
+        }
+        self.versao: str = cabecalho["versao"]
+        self._indice = cabecalho["arrays"]
+        self._inicio = _alinhar(_PREFIXO.size + tamanho)
+        self._mapa = np.memmap(self.caminho, dtype=np.uint8, mode="r")
+
+    def __contains__(self, nome: str) -> bool:
+        return nome in self._indice
+
+    def array(self, nome: str) -> np.ndarray:
+        posicao, dtype, forma = self._indice[nome]
+        dtype = np.dtype(dtype)
+        inicio = self._inicio + posicao
+        tamanho = int(np.prod(forma, dtype=np.int64)) * dtype.itemsize
+        return np.asarray(self._mapa[inicio : inicio + tamanho]).view(dtype).reshape(forma)
+
+    def textos(self, nome: str) -> TabelaTexto:
+        return TabelaTexto(self.array(nome), self.array(nome + ".inicio"))
+
+    def fresco(self, caminhos) -> bool:
+        """Whether the snapshot was built from the current contents of ``caminhos``."""
+        try:
+            return all(self.fontes.get(Path(c).name) == _assinatura(Path(c)) for c in caminhos)
+        except OSError:
+            return False
+
+    def price_book(self) -> PriceBook:
+        """Rebuild the PHC Evolution :class:`PriceBook` stored in the snapshot."""
+        nomes = self.textos("planos.nome")
+        extras = self.array("planos.extras").tolist()
+        planos = {}
+        for i, (pid, base, incluidos, limite) in enumerate(
+            zip(
+                self.array("planos.id").tolist(),
+                self.array("planos.base").tolist(),
+                self.array("planos.incluidos").tolist(),
+                self.array("planos.limite").tolist(),
+            )
+        ):
+            planos[pid] = PlanPrice(pid, nomes[i], base, incluidos, None if limite < 0 else limite, tuple(extras[i]))
+
+        produtos = {
+            (produto, pid): (base, unidade)
+            for produto, pid, base, unidade in zip(
+                self.textos("produtos.nome"),
+                self.array("produtos.plano").tolist(),
+                self.array("produtos.base").tolist(),
+                self.array("produtos.unidade").tolist(),
+            )
+        }
+        return PriceBook.from_tables(planos, produtos, versao=self.versao)
+
+    def catalogo(self, nome: str) -> CatalogoPrecos:
+        return CatalogoPrecos(self.textos(f"{nome}.ref"), self.array(f"{nome}.preco"))
+
+
+@lru_cache(maxsize=2)
+def _abrir(caminho: Path, assinatura: tuple[int, int]) -> Snapshot:
+    # ``assinatura`` is only part of the cache key: a rebuilt file is re-mapped.
+    return Snapshot(caminho)
+
+
+def open_snapshot(caminho: Path | str = PRECOS_SNAPSHOT) -> Snapshot | None:
+    """Return the snapshot at ``caminho`` or ``None`` when missing or unreadable."""
+    caminho = Path(caminho)
+    try:
+        return _abrir(caminho, _assinatura(caminho))
+    except (OSError, ValueError, KeyError, struct.error):
+        return None
+
+
+@lru_cache(maxsize=4)
+def _catalogo_csv(caminho: Path, assinatura: tuple[int, int]) -> CatalogoPrecos:
+    return CatalogoPrecos.from_dict(_ler_catalogo(caminho.read_bytes()))
+
+
+def reference_prices(nome: str, snapshot: Path | str = PRECOS_SNAPSHOT) -> CatalogoPrecos:
+    """Prices of the legacy catalog ``nome`` (e.g. ``"Precos2024"``).
+
+    Read from the snapshot when it was built from the current
+    ``<nome>.csv`` next to it, otherwise parsed from that CSV (an empty
+    catalog if the CSV is missing too).
+    """
+    snapshot = Path(snapshot)
+    caminho = snapshot.parent / f"{nome}.csv"
+    aberto = open_snapshot(snapshot)
+    if aberto is not None and f"{nome}.ref" in aberto and aberto.fresco([caminho]):
+        return aberto.catalogo(nome)
+    try:
+        return _catalogo_csv(caminho, _assinatura(caminho))
+    except OSError:
+        return CatalogoPrecos((), np.zeros(0, dtype=np.int64))
+
+
+if __name__ == "__main__":
+    destino = build_snapshot(*sys.argv[1:2])
+    print(f"{destino}: versão {open_snapshot(destino).versao}, {destino.stat().st_size} bytes")
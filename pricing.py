@@ -0,0 +1,30 @@
+# Pricing API shared by the simulators and by batch or service workers.
+# Only calculators, catalogs and formatters live here so importing it never
+# loads Streamlit; the page helpers are in ``ui``.
+from phc_cache import cached_calculate_plan, plan_cache
+from phc_logic import (
+    BANK_PACK_PRICES,
+    MODULOS,
+    POS_LIMITS,
+    WEB_MODULES,
+    WEB_ONLY_MODULES,
+    calculate_plan,
+    load_precos_planos,
+    load_precos_produtos,
+    produtos,
+)
+from primavera_logic import (
+    PRIMAVERA_ADDONS,
+    PRIMAVERA_CLOUD_ALLOWED,
+    PRIMAVERA_ONPREM_MIN_PLAN,
+    PRIMAVERA_PLANS,
+    calculate_primavera_plan,
+    cheapest_primavera_plan,
+)
+
+
+def format_euro(valor: float, *, pdf: bool = False) -> str:
+    """Return ``valor`` formatted in euros."""
+    valor_str = f"{int(round(valor)):,}".replace(",", ".")
+    symbol = chr(128) if pdf else "€"
+    return f"{valor_str} {symbol}"
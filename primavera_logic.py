@@ -1,5 +1,12 @@
 from __future__ import annotations
 
+from dataclasses import dataclass
+from functools import cached_property
+from types import MappingProxyType
+from typing import Mapping
+
+import numpy as np
+
 PLAN_ORDER = ["Essentials", "Standard", "Plus", "Advanced", "Premium", "Ultimate"]
 PLAN_RANK = {name: idx + 1 for idx, name in enumerate(PLAN_ORDER)}
 
@@ -31,13 +38,6 @@ PRIMAVERA_ERP_EVOLUTION_CLOUD = {
         "Advanced": {"pvp": 79, "included_users": 2, "included_companies": 2, "max_users": 10, "max_companies": 10, "additional_user_price": 32, "additional_company_price": 16, "activation_fee": 99},
         "Premium": {"pvp": 150, "included_users": 2, "included_companies": 2, "max_users": 20, "max_companies": 20, "additional_user_price": 37, "additional_company_price": 21, "activation_fee": 199},
     },
-PRIMAVERA_PLANS = {
-    1: {"name": "Essentials", "price": 189, "included_users": 1, "max_users": 1, "included_companies": 1, "max_companies": 1},
-    2: {"name": "Standard", "price": 319, "included_users": 1, "max_users": 2, "included_companies": 1, "max_companies": 2},
-    3: {"name": "Plus", "price": 599, "included_users": 2, "max_users": 3, "included_companies": 2, "max_companies": 3},
-    4: {"name": "Advanced", "price": 849, "included_users": 2, "max_users": 10, "included_companies": 2, "max_companies": 10},
-    5: {"name": "Premium", "price": 1199, "included_users": 2, "max_users": 10, "included_companies": 2, "max_companies": 20},
-    6: {"name": "Ultimate", "price": 2609, "included_users": 3, "max_users": None, "included_companies": 3, "max_companies": None},
 }
 
 PRIMAVERA_ADDONS = {
@@ -155,6 +155,155 @@ CLOUD_OPTIONAL_PRICES = {
 }
 
 
+NO_USER_LIMIT = 2**62
+
+# Module users above which a plan only supports a module on a higher plan:
+# deployment → {min plan: (max users, required plan)}
+MODULE_USER_LIMITS = {
+    "on_premises": {"Advanced": (2, "Premium"), "Premium": (10, "Ultimate")},
+    "cloud": {"Advanced": (2, "Premium")},
+}
+
+
+@dataclass(frozen=True, eq=False)
+class AddonTable:
+    """Add-on and core-module availability of one deployment as integer tables.
+
+    Add-ons get ids in ``PRIMAVERA_ADDONS`` order plus a trailing id for
+    modules outside the catalog. ``min_rank`` holds each add-on's lowest
+    plan rank (0 = not sold in this deployment) and ``user_limit`` /
+    ``escalated_rank`` the users per module above which a higher rank is
+    required. A selection is a bitmask over the ids: ``allowed`` masks the
+    add-ons sold in the deployment and ``available[rank]`` those offered
+    from each plan rank, so blocked modules and plan coverage are ``&``/``~``
+    operations. One customer is priced from the tuples; the ``*_batch``
+    methods run the same rules as NumPy max/AND over many customers.
+    """
+
+    deployment: str
+    modules: tuple[str, ...]
+    ids: Mapping[str, int]
+    min_rank: tuple[int, ...]
+    user_limit: tuple[int, ...]
+    escalated_rank: tuple[int, ...]
+    allowed: int
+    available: tuple[int, ...]
+    base_rank: int
+    core_min_rank: Mapping[str, int]
+
+    @classmethod
+    def compile(cls, deployment: str) -> AddonTable:
+        if deployment == "on_premises":
+            catalog, min_plans, unknown = PRIMAVERA_ERP_EVOLUTION_ONPREM, PRIMAVERA_ONPREM_MIN_PLAN, "Ultimate"
+        else:
+            catalog, min_plans, unknown = PRIMAVERA_ERP_EVOLUTION_CLOUD, PRIMAVERA_CLOUD_MIN_PLAN, None
+        modules = tuple(dict.fromkeys([m for group in PRIMAVERA_ADDONS.values() for m in group] + list(min_plans)))
+        limits = MODULE_USER_LIMITS[deployment]
+
+        min_rank, user_limit, escalated_rank = [], [], []
+        for min_plan in [min_plans.get(m, unknown) for m in modules] + [unknown]:
+            limit, escalated = limits.get(min_plan, (NO_USER_LIMIT, min_plan))
+            min_rank.append(PLAN_RANK[min_plan] if min_plan else 0)
+            user_limit.append(limit)
+            escalated_rank.append(PLAN_RANK[escalated] if escalated else 0)
+
+        return cls(
+            deployment=deployment,
+            modules=modules,
+            ids=MappingProxyType({m: i for i, m in enumerate(modules)}),
+            min_rank=tuple(min_rank),
+            user_limit=tuple(user_limit),
+            escalated_rank=tuple(escalated_rank),
+            allowed=sum(1 << i for i, rank in enumerate(min_rank) if rank),
+            available=tuple(
+                sum(1 << i for i, minimo in enumerate(min_rank) if 0 < minimo <= rank)
+                for rank in range(len(PLAN_ORDER) + 1)
+            ),
+            base_rank=min(PLAN_RANK[plan] for plan in catalog["plans"]),
+            core_min_rank=MappingProxyType(
+                {m: PLAN_RANK[plan] for m, plan in PRIMAVERA_CORE_MODULE_MIN_PLAN[deployment].items()}
+            ),
+        )
+
+    @property
+    def unknown_id(self) -> int:
+        return len(self.modules)
+
+    def module_id(self, module: str) -> int:
+        """Id of ``module``; modules outside the catalog share ``unknown_id``."""
+        return self.ids.get(module, self.unknown_id)
+
+    def mask(self, modules) -> int:
+        mask = 0
+        for module in modules:
+            mask |= 1 << self.module_id(module)
+        return mask
+
+    def blocked(self, mask: int) -> int:
+        """Modules of ``mask`` not sold in this deployment."""
+        return mask & ~self.allowed
+
+    def lowest_rank_offering(self, mask: int) -> int:
+        """Lowest plan rank offering every sold module of ``mask`` (user limits aside)."""
+        mask &= self.allowed
+        return next(rank for rank, available in enumerate(self.available) if not mask & ~available)
+
+    def required_rank(self, module_id: int, users: int) -> int:
+        """Rank a module needs for ``users`` users (0 if it is not sold)."""
+        if users > self.user_limit[module_id]:
+            return self.escalated_rank[module_id]
+        return self.min_rank[module_id]
+
+    @cached_property
+    def arrays(self) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """``(min_rank, user_limit, escalated_rank, bit weights)`` as ``int64`` arrays."""
+        arrays = (
+            np.array(self.min_rank, dtype=np.int64),
+            np.array(self.user_limit, dtype=np.int64),
+            np.array(self.escalated_rank, dtype=np.int64),
+            np.left_shift(1, np.arange(self.unknown_id + 1, dtype=np.int64)),
+        )
+        for array in arrays:
+            array.setflags(write=False)
+        return arrays
+
+    def required_rank_batch(self, users, selected=None) -> np.ndarray:
+        """Required rank of many customers from a ``customers × (modules + 1)`` users matrix.
+
+        Columns follow the module ids; ``selected`` defaults to ``users > 0``.
+        Returns at least ``base_rank`` per customer, ignoring core modules.
+        """
+        min_rank, user_limit, escalated_rank, _ = self.arrays
+        users = np.asarray(users, dtype=np.int64)
+        selected = users > 0 if selected is None else np.asarray(selected, dtype=bool)
+        ranks = np.where(users > user_limit, escalated_rank, min_rank)
+        return np.maximum(np.where(selected, ranks, 0).max(axis=-1, initial=0), self.base_rank)
+
+    def mask_batch(self, selected) -> np.ndarray:
+        """Selection bitmask per row of a ``customers × (modules + 1)`` boolean matrix."""
+        return np.asarray(selected, dtype=bool) @ self.arrays[3]
+
+    def blocked_batch(self, selected) -> np.ndarray:
+        """Bitmask of the blocked modules per row of a selection matrix."""
+        return self.mask_batch(selected) & ~self.allowed
+
+
+# Deployment → compiled AddonTable
+ADDON_TABLES = MappingProxyType({d: AddonTable.compile(d) for d in ("on_premises", "cloud")})
+
+
+# Amounts are summed as integer cents and converted to euros on return.
+CENTS = 100
+
+
+def _cents(value) -> int:
+    return round(value * CENTS)
+
+
+def _euros(cents: int) -> float:
+    return cents / CENTS
+
+
 def _normalize_subscription(subscription_type: str) -> str:
     return "on_premises" if subscription_type.lower() in {"onprem", "on_premises", "on-premises"} else "cloud"
 
@@ -164,173 +313,138 @@ def _plan_rank(plan_name: str) -> int:
 
 
 def _supports_capacity(plan: dict, users: int, companies: int) -> bool:
-PRIMAVERA_ONPREM_MIN_PLAN = {
-    "Contabilidade Gestão": 5,
-    "Ativos": 5,
-    "Fiscal Reporting Manager": 5,
-    "Fiscal Automation": 5,
-    "Serviços Técnicos": 4,
-    "Projetos e Obras": 4,
-    "Produção + Track&Trace": 5,
-    "Produção + Planeamento": 5,
-    "Pre+Orç+Plan+AMed+Ccus": 5,
-    "Revisão de preços": 5,
-    "Gestão de contratos": 5,
-    "Controlo financeiro projetos": 5,
-    "RH": 5,
-    "Formação": 5,
-    "API": 4,
-    "Web API": 4,
-    "Webhooks": 4,
-    "Pex Advanced": 4,
-    "Multi-país": 4,
-    "Multi-P&T Manager": 1,
-    "Multi-P&T Manager Advanced": 1,
-}
-
-PRIMAVERA_CLOUD_ALLOWED = {
-    "Contabilidade Gestão",
-    "Ativos",
-    "Fiscal Reporting Manager",
-    "RH",
-    "Multi-país",
-    "Webhooks",
-    "Web API",
-}
-
-
-def _supports_capacity(plan_id: int, users: int, companies: int) -> bool:
-    plan = PRIMAVERA_PLANS[plan_id]
     user_ok = plan["max_users"] is None or users <= plan["max_users"]
     company_ok = plan["max_companies"] is None or companies <= plan["max_companies"]
     return user_ok and company_ok
 
 
-def _module_min_plan(deployment: str, module: str) -> str | None:
-    if deployment == "on_premises":
-        return PRIMAVERA_ONPREM_MIN_PLAN.get(module, "Ultimate")
-    return PRIMAVERA_CLOUD_MIN_PLAN.get(module)
-
-
-def _module_cost(deployment: str, module: str, module_users: int, plan_name: str) -> tuple[float, str | None]:
+def _module_cost(deployment: str, module: str, module_users: int, plan_name: str) -> tuple[int, str | None]:
+    """Return the module's price in cents and an optional warning."""
     prices = ONPREM_OPTIONAL_PRICES if deployment == "on_premises" else CLOUD_OPTIONAL_PRICES
     if module not in prices:
-        return 0.0, "Preço do módulo não mapeado (mantido a 0)."
+        return 0, "Preço do módulo não mapeado (mantido a 0)."
     cfg = prices[module]
 
     if "initial" in cfg:
-        initial = cfg["initial"]
+        initial = _cents(cfg["initial"])
         additional = cfg.get("additional")
         if additional is None:
-            return float(initial), None
-        return float(initial + max(0, module_users - 1) * additional), None
+            return initial, None
+        return initial + max(0, module_users - 1) * _cents(additional), None
 
     if "initial_post" in cfg:
-        return float(cfg["initial_post"] + max(0, module_users - 1) * cfg["additional_post"]), None
+        return _cents(cfg["initial_post"]) + max(0, module_users - 1) * _cents(cfg["additional_post"]), None
 
     plan_price = cfg.get(plan_name)
     if plan_price is None:
-        return 0.0, f"{module}: sem preço específico para o plano {plan_name}."
-    return float(plan_price), None
-def _module_plan_requirement(subscription_type: str, module: str) -> int | None:
-    if subscription_type == "Cloud":
-        if module not in PRIMAVERA_CLOUD_ALLOWED:
-            return None
-        return 5
-    return PRIMAVERA_ONPREM_MIN_PLAN.get(module, 6)
+        return 0, f"{module}: sem preço específico para o plano {plan_name}."
+    return _cents(plan_price), None
 
 
-def calculate_primavera_plan(
-    subscription_type: str,
-    users: int,
-    companies: int,
-    selected_modules: dict[str, int],
-    selected_core_modules: list[str] | None = None,
-    *,
-    include_activation_fee: bool = False,
-) -> dict:
-    """Calculate Primavera plan recommendation with 2026 pricing data."""
-    deployment = _normalize_subscription(subscription_type)
-    catalog = PRIMAVERA_ERP_EVOLUTION_ONPREM if deployment == "on_premises" else PRIMAVERA_ERP_EVOLUTION_CLOUD
-    plans = catalog["plans"]
-
+def _plan_requirements(
+    deployment: str, selected_modules: dict[str, int], selected_core_modules: list[str]
+) -> tuple[int, dict[str, str], list[str]]:
+    """Return the required plan rank, the blocked modules and the rank rules' warnings."""
+    table = ADDON_TABLES[deployment]
     warnings: list[str] = []
     blocked_modules: dict[str, str] = {}
-    selected_core_modules = selected_core_modules or []
 
-    required_rank = min(_plan_rank(p) for p in plans)
-    core_min_plan = PRIMAVERA_CORE_MODULE_MIN_PLAN[deployment]
+    required_rank = table.base_rank
     for core_module in selected_core_modules:
-        min_plan = core_min_plan.get(core_module)
-        if min_plan is None:
+        min_rank = table.core_min_rank.get(core_module)
+        if min_rank is None:
             warnings.append(f"{core_module}: módulo base sem mapeamento de plano mínimo.")
             continue
-        required_rank = max(required_rank, _plan_rank(min_plan))
+        required_rank = max(required_rank, min_rank)
 
+    blocked_mask = table.blocked(table.mask(selected_modules))
     for module, module_users in selected_modules.items():
-        min_plan = _module_min_plan(deployment, module)
-        if min_plan is None:
+        module_id = table.module_id(module)
+        if blocked_mask >> module_id & 1:
             blocked_modules[module] = "Indisponível no modelo Cloud atual."
             continue
-        required_rank = max(required_rank, _plan_rank(min_plan))
-
-        if min_plan == "Advanced" and module_users > 2:
-            required_rank = max(required_rank, _plan_rank("Premium"))
-            warnings.append(f"{module}: Advanced suporta até 2 utilizadores por módulo; recomendado Premium.")
-        if min_plan == "Premium" and module_users > 10 and deployment == "on_premises":
-            required_rank = max(required_rank, _plan_rank("Ultimate"))
-            warnings.append(f"{module}: Premium suporta até 10 utilizadores por módulo; recomendado Ultimate.")
-
-    candidate_plan_name = None
-    for plan_name in PLAN_ORDER:
-        if plan_name not in plans:
-            continue
-        if _plan_rank(plan_name) < required_rank:
-            continue
-        if _supports_capacity(plans[plan_name], users, companies):
-            candidate_plan_name = plan_name
-            break
-
-    if candidate_plan_name is None:
-        candidate_plan_name = max(plans.keys(), key=_plan_rank)
-        warnings.append("Capacidade acima dos limites standard; aplicado maior plano disponível.")
-
-    plan = plans[candidate_plan_name]
+        rank = table.required_rank(module_id, module_users)
+        required_rank = max(required_rank, rank)
+        if rank != table.min_rank[module_id]:
+            warnings.append(
+                f"{module}: {PLAN_ORDER[table.min_rank[module_id] - 1]} suporta até "
+                f"{table.user_limit[module_id]} utilizadores por módulo; recomendado {PLAN_ORDER[rank - 1]}."
+            )
+    return required_rank, blocked_modules, warnings
+
+
+def _feasible_plans(plans: dict, required_rank: int, users: int, companies: int) -> list[str]:
+    """Plans at or above ``required_rank`` that fit the users and companies, lowest first."""
+    return [
+        plan_name
+        for plan_name in PLAN_ORDER
+        if plan_name in plans
+        and _plan_rank(plan_name) >= required_rank
+        and _supports_capacity(plans[plan_name], users, companies)
+    ]
+
+
+def _plan_charges(plan: dict, users: int, companies: int, include_activation_fee: bool) -> tuple[int, int, int, int, int]:
+    """Return ``(extra users, extra companies, their costs, activation fee)``, costs in cents."""
     extra_users = max(0, users - plan["included_users"])
     extra_companies = max(0, companies - plan["included_companies"])
-    extra_user_cost = 0.0 if plan["additional_user_price"] is None else extra_users * plan["additional_user_price"]
-    extra_company_cost = 0.0 if plan["additional_company_price"] is None else extra_companies * plan["additional_company_price"]
+    user_price = plan["additional_user_price"]
+    company_price = plan["additional_company_price"]
+    extra_user_cents = 0 if user_price is None else extra_users * _cents(user_price)
+    extra_company_cents = 0 if company_price is None else extra_companies * _cents(company_price)
+    activation_fee_cents = _cents(plan.get("activation_fee") or 0) if include_activation_fee else 0
+    return extra_users, extra_companies, extra_user_cents, extra_company_cents, activation_fee_cents
 
-    modules_cost = 0.0
+
+def _price_plan(
+    deployment: str,
+    plan_name: str,
+    users: int,
+    companies: int,
+    selected_modules: dict[str, int],
+    selected_core_modules: list[str],
+    blocked_modules: dict[str, str],
+    warnings: list[str],
+    include_activation_fee: bool,
+) -> dict:
+    """Price the configuration under ``plan_name`` as ``calculate_primavera_plan`` reports it."""
+    catalog = PRIMAVERA_ERP_EVOLUTION_ONPREM if deployment == "on_premises" else PRIMAVERA_ERP_EVOLUTION_CLOUD
+    plan = catalog["plans"][plan_name]
+    warnings = list(warnings)
+    extra_users, extra_companies, extra_user_cents, extra_company_cents, activation_fee_cents = _plan_charges(
+        plan, users, companies, include_activation_fee
+    )
+
+    modules_cents = 0
     modules_breakdown: dict[str, float] = {}
     for module, module_users in selected_modules.items():
         if module in blocked_modules:
             continue
-        price, warning = _module_cost(deployment, module, module_users, candidate_plan_name)
-        modules_cost += price
-        modules_breakdown[module] = price
+        price, warning = _module_cost(deployment, module, module_users, plan_name)
+        modules_cents += price
+        modules_breakdown[module] = _euros(price)
         if warning:
             warnings.append(warning)
 
-    activation_fee = float(plan.get("activation_fee") or 0) if include_activation_fee else 0.0
-    total_price = float(plan["pvp"] + extra_user_cost + extra_company_cost + modules_cost + activation_fee)
+    total_cents = _cents(plan["pvp"]) + extra_user_cents + extra_company_cents + modules_cents + activation_fee_cents
 
     return {
         "deployment": deployment,
         "billing_period": catalog["billing_period"],
-        "plan_id": _plan_rank(candidate_plan_name),
-        "plan_name": candidate_plan_name,
+        "plan_id": _plan_rank(plan_name),
+        "plan_name": plan_name,
         "base_price": plan["pvp"],
         "included_users": plan["included_users"],
         "included_companies": plan["included_companies"],
         "extra_users": extra_users,
         "extra_companies": extra_companies,
-        "extra_user_cost": extra_user_cost,
-        "extra_company_cost": extra_company_cost,
-        "activation_fee": activation_fee,
-        "modules_cost": modules_cost,
+        "extra_user_cost": _euros(extra_user_cents),
+        "extra_company_cost": _euros(extra_company_cents),
+        "activation_fee": _euros(activation_fee_cents),
+        "modules_cost": _euros(modules_cents),
         "modules_breakdown": modules_breakdown,
-        "total_price": total_price,
+        "total_price": _euros(total_cents),
+        "total_price_cents": total_cents,
         "selected_modules": selected_modules,
         "selected_core_modules": selected_core_modules,
         "blocked_modules": blocked_modules,
@@ -338,6 +452,175 @@ def calculate_primavera_plan(
     }
 
 
+def calculate_primavera_plan(
+    subscription_type: str,
+    users: int,
+    companies: int,
+    selected_modules: dict[str, int],
+    selected_core_modules: list[str] | None = None,
+    *,
+    include_activation_fee: bool = False,
+) -> dict:
+    """Calculate Primavera plan recommendation with 2026 pricing data."""
+    deployment = _normalize_subscription(subscription_type)
+    plans = (PRIMAVERA_ERP_EVOLUTION_ONPREM if deployment == "on_premises" else PRIMAVERA_ERP_EVOLUTION_CLOUD)["plans"]
+    selected_core_modules = selected_core_modules or []
+
+    required_rank, blocked_modules, warnings = _plan_requirements(deployment, selected_modules, selected_core_modules)
+    feasible = _feasible_plans(plans, required_rank, users, companies)
+    if feasible:
+        candidate_plan_name = feasible[0]
+    else:
+        candidate_plan_name = max(plans.keys(), key=_plan_rank)
+        warnings.append("Capacidade acima dos limites standard; aplicado maior plano disponível.")
+
+    return _price_plan(
+        deployment,
+        candidate_plan_name,
+        users,
+        companies,
+        selected_modules,
+        selected_core_modules,
+        blocked_modules,
+        warnings,
+        include_activation_fee,
+    )
+
+
+def _plan_priced(deployment: str, module: str) -> bool:
+    """Whether ``module``'s price depends on the plan (e.g. API, Web API, Multi-país)."""
+    cfg = (ONPREM_OPTIONAL_PRICES if deployment == "on_premises" else CLOUD_OPTIONAL_PRICES).get(module, {})
+    return bool(cfg) and "initial" not in cfg and "initial_post" not in cfg
+
+
+def _missing_prices(
+    deployment: str, plan_name: str, selected_modules: dict[str, int], blocked_modules: dict[str, str]
+) -> list[str]:
+    """Plan-priced add-ons of the selection that have no price on ``plan_name``."""
+    prices = ONPREM_OPTIONAL_PRICES if deployment == "on_premises" else CLOUD_OPTIONAL_PRICES
+    return [
+        module
+        for module in selected_modules
+        if module not in blocked_modules
+        and _plan_priced(deployment, module)
+        and prices[module].get(plan_name) is None
+    ]
+
+
+def cheapest_primavera_plan(
+    subscription_type: str,
+    users: int,
+    companies: int,
+    selected_modules: dict[str, int],
+    selected_core_modules: list[str] | None = None,
+    *,
+    include_activation_fee: bool = False,
+    exhaustive: bool = False,
+) -> dict:
+    """Return the cheapest Primavera plan allowed for a configuration.
+
+    ``calculate_primavera_plan`` recommends the first plan meeting the rank
+    and capacity rules, but extra users and companies, activation fees and
+    the per-plan add-on prices differ per plan, so a higher tier can cost
+    less. Every feasible plan gets a lower bound (base price, extras, fee
+    and the add-ons priced the same on every plan); plans are priced in
+    bound order and the search stops once no bound can beat the best total
+    (ties keep the lower plan). ``exhaustive=True`` prices every feasible
+    plan. Plans missing the price of a selected add-on are left out of the
+    search: their total would only be low because the add-on counts as 0.
+
+    Returns ``plan_id``/``plan_name``/``total_price`` of the cheapest plan,
+    ``minimum_plan`` (the recommendation) and ``savings`` against it,
+    ``ranking`` as ``(plan_id, plan_name, total_price)`` from cheapest to
+    dearest, ``pruned`` as ``(plan_id, plan_name, lower_bound)`` and
+    ``unpriced`` as ``(plan_id, plan_name)`` for the plans left out and
+    ``result``, the ``calculate_primavera_plan``-style dictionary of the
+    cheapest plan. The recommendation is always priced, as the reference
+    for the savings, but ranks after every fully priced plan when it is
+    one of the unpriced plans.
+    """
+    deployment = _normalize_subscription(subscription_type)
+    plans = (PRIMAVERA_ERP_EVOLUTION_ONPREM if deployment == "on_premises" else PRIMAVERA_ERP_EVOLUTION_CLOUD)["plans"]
+    selected_core_modules = selected_core_modules or []
+
+    required_rank, blocked_modules, warnings = _plan_requirements(deployment, selected_modules, selected_core_modules)
+    feasible = _feasible_plans(plans, required_rank, users, companies)
+    unpriced = {
+        plan_name
+        for plan_name in feasible
+        if _missing_prices(deployment, plan_name, selected_modules, blocked_modules)
+    }
+    if not feasible:
+        # Nothing fits: the recommendation already falls back to the largest plan.
+        result = calculate_primavera_plan(
+            subscription_type,
+            users,
+            companies,
+            selected_modules,
+            selected_core_modules,
+            include_activation_fee=include_activation_fee,
+        )
+        feasible = [result["plan_name"]]
+        evaluated = {result["plan_name"]: result}
+        bounds = {result["plan_name"]: result["total_price_cents"]}
+    else:
+        same_on_every_plan = sum(
+            _module_cost(deployment, module, module_users, feasible[0])[0]
+            for module, module_users in selected_modules.items()
+            if module not in blocked_modules and not _plan_priced(deployment, module)
+        )
+        bounds = {
+            plan_name: _cents(plans[plan_name]["pvp"])
+            + sum(_plan_charges(plans[plan_name], users, companies, include_activation_fee)[2:])
+            + same_on_every_plan
+            for plan_name in feasible
+        }
+
+        def price(plan_name: str) -> dict:
+            return _price_plan(
+                deployment,
+                plan_name,
+                users,
+                companies,
+                selected_modules,
+                selected_core_modules,
+                blocked_modules,
+                warnings,
+                include_activation_fee,
+            )
+
+        # The recommendation is always priced: it is the reference for the savings.
+        evaluated = {feasible[0]: price(feasible[0])}
+        for plan_name in sorted(feasible, key=lambda p: (bounds[p], _plan_rank(p))):
+            if plan_name in evaluated or plan_name in unpriced:
+                continue
+            priced = [(r["total_price_cents"], r["plan_id"]) for p, r in evaluated.items() if p not in unpriced]
+            if not exhaustive and priced and (bounds[plan_name], _plan_rank(plan_name)) > min(priced):
+                break
+            evaluated[plan_name] = price(plan_name)
+
+    ranking = sorted(
+        evaluated.values(), key=lambda r: (r["plan_name"] in unpriced, r["total_price_cents"], r["plan_id"])
+    )
+    cheapest = ranking[0]
+    minimum = evaluated[feasible[0]]
+    return {
+        "plan_id": cheapest["plan_id"],
+        "plan_name": cheapest["plan_name"],
+        "total_price": cheapest["total_price"],
+        "minimum_plan": minimum["plan_name"],
+        "savings": _euros(minimum["total_price_cents"] - cheapest["total_price_cents"]),
+        "ranking": [(r["plan_id"], r["plan_name"], r["total_price"]) for r in ranking],
+        "pruned": [
+            (_plan_rank(plan_name), plan_name, _euros(bounds[plan_name]))
+            for plan_name in feasible
+            if plan_name not in evaluated and plan_name not in unpriced
+        ],
+        "unpriced": [(_plan_rank(plan_name), plan_name) for plan_name in feasible if plan_name in unpriced],
+        "result": cheapest,
+    }
+
+
 # Backward-compatible shape used by existing UI listing (id keyed)
 PRIMAVERA_PLANS = {
     PLAN_RANK[name]: {
@@ -348,52 +631,3 @@ PRIMAVERA_PLANS = {
     }
     for name, data in PRIMAVERA_ERP_EVOLUTION_ONPREM["plans"].items()
 }
-) -> dict:
-    """Calculate recommended Primavera Evolution plan and availability checks."""
-    warnings: list[str] = []
-    blocked_modules: dict[str, str] = {}
-
-    required_plan = 1
-    for module, module_users in selected_modules.items():
-        module_plan = _module_plan_requirement(subscription_type, module)
-        if module_plan is None:
-            blocked_modules[module] = "Indisponível no modelo Cloud atual."
-            continue
-        required_plan = max(required_plan, module_plan)
-
-        if module_plan == 4 and module_users > 2:
-            required_plan = max(required_plan, 5)
-            warnings.append(f"{module}: Advanced suporta até 2 users por módulo; recomendado Premium.")
-        if module_plan == 5 and module_users > 10:
-            required_plan = max(required_plan, 6)
-            warnings.append(f"{module}: Premium suporta até 10 users por módulo; recomendado Ultimate.")
-
-    recommended_plan_id = None
-    for plan_id in sorted(PRIMAVERA_PLANS):
-        if plan_id < required_plan:
-            continue
-        if _supports_capacity(plan_id, users, companies):
-            recommended_plan_id = plan_id
-            break
-
-    if recommended_plan_id is None:
-        recommended_plan_id = 6
-        warnings.append("Capacidade acima dos limites standard; aplicado Ultimate (ilimitado).")
-
-    plan = PRIMAVERA_PLANS[recommended_plan_id]
-
-    if recommended_plan_id == 4 and users > 10:
-        warnings.append("Advanced: limite prático de utilizadores adicionais pode ser insuficiente.")
-    if recommended_plan_id == 5 and users > 20:
-        warnings.append("Premium: validar limite de utilizadores por módulo no desenho final.")
-
-    return {
-        "plan_id": recommended_plan_id,
-        "plan_name": plan["name"],
-        "base_price": plan["price"],
-        "included_users": plan["included_users"],
-        "included_companies": plan["included_companies"],
-        "selected_modules": selected_modules,
-        "blocked_modules": blocked_modules,
-        "warnings": warnings,
-    }
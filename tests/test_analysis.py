@@ -0,0 +1,103 @@
+import phc_analysis
+import phc_logic
+
+
+def test_cheapest_plan_beats_floor():
+    result = phc_analysis.cheapest_plan("Advanced", None, 25, 25, {})
+    floor = phc_logic.calculate_plan("Advanced", None, 25, 25, {})
+    assert result["plano_minimo"] == floor["plano_final"] == 5
+    assert result["plano_final"] == 6
+    assert [pid for pid, _, _ in result["ranking"]] == [6, 5]
+    assert result["poupanca"] == floor["custo_estimado"] - result["custo_estimado"] > 0
+    assert result["resultado"]["custo_estimado"] == result["custo_estimado"]
+    assert result["resultado"]["plano_final"] == 6
+
+
+def test_cheapest_plan_keeps_floor_when_cheapest():
+    result = phc_analysis.cheapest_plan("Corporate", "Gestão Completo", 1, 1, {"CRM": 2})
+    expected = phc_logic.calculate_plan("Corporate", "Gestão Completo", 1, 1, {"CRM": 2})
+    assert result["plano_final"] == result["plano_minimo"] == 3
+    assert result["poupanca"] == 0
+    assert result["resultado"] == expected
+
+
+def test_user_sweep_matches_calculate_plan():
+    sweep = phc_analysis.user_sweep("Corporate", None, 60, {"CRM": 3})
+    assert list(sweep["utilizadores"]) == list(range(1, 61))
+    assert sweep["mudancas"] == [(6, 3, 4), (11, 4, 5), (51, 5, 6)]
+    for idx in (0, 4, 9, 30, 59):
+        users = int(sweep["utilizadores"][idx])
+        expected = phc_logic.calculate_plan("Corporate", None, users, 0, {"CRM": 3})
+        assert sweep["plano_final"][idx] == expected["plano_final"]
+        assert sweep["custo_recomendado"][idx] == expected["custo_estimado"]
+
+
+def test_upsell_matrix_matches_adding_each_module():
+    selecoes = {"CRM": 3, "Vencimento": 2}
+    upsell = phc_analysis.upsell_matrix("Corporate", "Gestão Clientes", 4, 1, selecoes, {"CRM": 1})
+    atual = phc_logic.calculate_plan("Corporate", "Gestão Clientes", 4, 1, selecoes, {"CRM": 1})
+    assert upsell["plano_minimo"] == atual["plano_final"]
+    assert upsell["custo_atual"] == atual["custo_estimado"]
+    assert set(upsell["modulos"]) == set(phc_logic.MODULOS) - set(selecoes)
+
+    for i, modulo in enumerate(upsell["modulos"]):
+        expected = phc_logic.calculate_plan(
+            "Corporate", "Gestão Clientes", 4, 1, {**selecoes, modulo: 1}, {"CRM": 1}
+        )
+        assert upsell["plano_final"][i] == expected["plano_final"]
+        assert upsell["muda_plano"][i] == (expected["plano_final"] != atual["plano_final"])
+        assert upsell["custo_estimado"][i] == expected["custo_estimado"]
+        assert upsell["custo_marginal_centimos"][i] == expected.custo_estimado_centimos - atual.custo_estimado_centimos
+
+    marginais = [custo for _, _, custo in upsell["ranking"]]
+    assert marginais == sorted(marginais)
+    assert upsell["muda_plano"][upsell["modulos"].index("Bank Connector")]
+
+
+def test_downgrade_options_list_minimal_changes_per_plan():
+    pos = phc_logic.POS_MODULE
+    selecoes = {"CRM": 2, pos: 14, "Bank Connector": 3}
+    opcoes = phc_analysis.downgrade_options("Corporate", None, 12, 3, selecoes, {"genai"}, {"genai": 2})
+    assert phc_logic.calculate_plan("Corporate", None, 12, 3, selecoes, None, {"genai"}, {"genai": 2})["plano_final"] == 5
+    assert [o.plano for o in opcoes] == [4, 3, 2, 1]
+
+    advanced, plus = opcoes[0], opcoes[1]
+    assert (advanced.modulos, advanced.utilizadores, advanced.pos) == ((), 10, 10)
+    assert (plus.modulos, plus.utilizadores, plus.pos) == (("Bank Connector",), 5, 5)
+    assert opcoes[-1].extras == ("genai",) and "CRM" in opcoes[-1].modulos
+
+    for opcao in opcoes:
+        reduzido = {m: q for m, q in selecoes.items() if m not in opcao.modulos}
+        if opcao.pos is not None:
+            reduzido[pos] = opcao.pos
+        utilizadores = min(12, opcao.utilizadores or 12), min(3, opcao.utilizadores or 3)
+        extras = {"genai"} - set(opcao.extras)
+        resultado = phc_logic.calculate_plan("Corporate", None, *utilizadores, reduzido, None, extras, {"genai": 2})
+        assert resultado["plano_final"] <= opcao.plano
+
+
+def test_downgrade_blocked_by_current_plan():
+    opcoes = phc_analysis.downgrade_options("Advanced", None, 25, 0, {"CRM": 1})
+    assert [o.plano for o in opcoes] == [4, 3, 2, 1]
+    assert opcoes[0].viavel and opcoes[0].utilizadores == 10
+    assert not opcoes[1].viavel and opcoes[1].bloqueios[0].regra == "plano_atual"
+
+
+def test_optimize_user_split_matches_exhaustive_search():
+    selecoes = {"CRM": 4, "Vencimento": 1, "Colaborador": 3}
+    otimo = phc_analysis.optimize_user_split("Corporate", None, 14, selecoes, web_minimo=2)
+    assert otimo["web_selecoes"] == {"CRM": 1, "Colaborador": 3}
+    assert otimo["utilizadores_desktop"] + otimo["utilizadores_web"] == 14
+    assert otimo["utilizadores_web"] >= 2
+    assert otimo["resultado"]["custo_estimado"] == otimo["custo_estimado"]
+
+    melhor = min(
+        phc_logic.calculate_plan("Corporate", None, desk, 14 - desk, selecoes, {"CRM": crm_web, "Colaborador": 3})[
+            "custo_estimado"
+        ]
+        for desk in range(0, 13)
+        for crm_web in range(0, 5)
+    )
+    assert otimo["custo_estimado"] == melhor
+    assert len(otimo["desktop"]) == len(otimo["custo_por_divisao"]) == 13
+    assert min(otimo["custo_por_divisao"]) == melhor
@@ -0,0 +1,79 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+import phc_logic
+
+
+SCENARIOS = [
+    ("Corporate", "Gestão Completo", 1, 1, {}, {}, None),
+    ("Advanced", None, 5, 3, {"CRM": 6, "Frota": 1}, {"CRM": 2}, None),
+    ("Enterprise", None, 60, 4, {"Colaborador": 5, "Vencimento": 20}, {"Colaborador": 5, "Vencimento": 3}, None),
+    ("Corporate", "Gestão Clientes", 1, 0, {"Ponto de Venda (POS/Restauração)": 14}, {}, [1, 13]),
+    ("Enterprise", None, 2, 0, {"Bank Connector": 7, "Logística": 1}, {}, None),
+    ("Corporate", None, 3, 0, {"SHST": 2, "Ocupação": 1}, {}, None),
+]
+
+
+def test_batch_matches_calculate_plan():
+    rows = []
+    for plano, gestao, desk, web, selecoes, web_selecoes, pos_counts in SCENARIOS:
+        row = {
+            "plano_atual": plano,
+            "tipo_gestao": gestao,
+            "utilizadores_desktop": desk,
+            "utilizadores_web": web,
+            "pos_counts": pos_counts,
+        }
+        row.update(selecoes)
+        row.update({f"web:{m}": q for m, q in web_selecoes.items()})
+        rows.append(row)
+
+    batch = phc_logic.calculate_plans_batch(pd.DataFrame(rows))
+
+    for (plano, gestao, desk, web, selecoes, web_selecoes, pos_counts), (_, row) in zip(SCENARIOS, batch.iterrows()):
+        expected = phc_logic.calculate_plan(plano, gestao, desk, web, selecoes, web_selecoes, pos_counts=pos_counts)
+        assert row["plano_final"] == expected["plano_final"]
+        assert row["custo_estimado"] == expected["custo_estimado"]
+        assert row["custo_extra_utilizadores"] == expected["custo_extra_utilizadores"]
+        assert (row["extras_ate_10"], row["extras_ate_50"], row["extras_acima_50"]) == expected["extras_breakdown"]
+        assert row["bancos_total"] == expected["bancos_total"]
+        assert row["custo_bancos"] == expected["custo_bancos"]
+        assert row["warnings"] == expected["warnings"]
+        for modulo, detalhe in expected["modulos_detalhe"].items():
+            assert row[f"custo:{modulo}"] == sum(detalhe[:3])
+
+
+def test_batch_and_interactive_totals_agree_to_the_cent():
+    import csv
+
+    from phc_pricebook import PriceBook
+
+    def read_rows(path):
+        with open(path, newline="", encoding="utf-8") as f:
+            return list(csv.DictReader(f))
+
+    planos = read_rows("precos_planos.csv")
+    for row in planos:
+        row["preco_base"] = "0.10"
+        row["preco_extra_ate_10"] = row["preco_extra_ate_50"] = row["preco_extra_acima_50"] = "0.20"
+    produtos = read_rows("precos_produtos.csv")
+    for row in produtos:
+        row["preco_base"] = "0.10"
+        row["preco_unidade"] = "0.20"
+    book = PriceBook.from_rows(planos, produtos)
+
+    rows = [
+        {"plano_atual": plano, "utilizadores_desktop": desk, **selecoes}
+        for plano, _, desk, _, selecoes, _, _ in SCENARIOS
+    ]
+    batch = phc_logic.calculate_plans_batch(pd.DataFrame(rows), price_book=book)
+
+    total = 0
+    for row, (_, linha) in zip(rows, batch.iterrows()):
+        selecoes = {k: v for k, v in row.items() if k not in ("plano_atual", "utilizadores_desktop")}
+        expected = phc_logic.calculate_plan(row["plano_atual"], None, row["utilizadores_desktop"], 0, selecoes, price_book=book)
+        assert linha["custo_estimado_centimos"] == expected.custo_estimado_centimos
+        assert linha["custo_estimado"] == expected["custo_estimado"] == expected.custo_estimado_centimos / 100
+        total += expected.custo_estimado_centimos
+    assert batch["custo_estimado_centimos"].sum() == total
@@ -1,35 +1,13 @@
-import types
 import csv
-import importlib
-import sys
 
 import pytest
 
 
-class DummyPandas(types.SimpleNamespace):
-    class DataFrame(list):
-        def iterrows(self):
-            for idx, row in enumerate(self):
-                yield idx, row
-
-    def read_csv(self, path, sep=","):
-        with open(path, newline="", encoding="utf-8") as f:
-            reader = csv.DictReader(f, delimiter=sep)
-            return self.DataFrame([row for row in reader])
-
-    def notna(self, value):
-        return value is not None and str(value).strip() != ""
-
-
 @pytest.fixture()
-def common(monkeypatch):
-    pd_stub = DummyPandas()
-    st_stub = types.SimpleNamespace()
-    monkeypatch.setitem(sys.modules, "pandas", pd_stub)
-    monkeypatch.setitem(sys.modules, "streamlit", st_stub)
-    import common as cm
-    importlib.reload(cm)
-    return cm
+def pricing():
+    import pricing
+
+    return pricing
 
 
 def read_plan_row(plan_id):
@@ -48,25 +26,25 @@ def read_module_row(product, plan_id):
     raise ValueError("module not found")
 
 
-def test_plan_selection(common):
-    result = common.calculate_plan("Corporate", "Gestão Completo", 1, 1, {})
+def test_plan_selection(pricing):
+    result = pricing.calculate_plan("Corporate", "Gestão Completo", 1, 1, {})
     plan = read_plan_row(3)
     assert result["plano_final"] == 3
     assert result["nome"] == plan["nome"]
 
 
-def test_platform_limits(common):
-    result = common.calculate_plan("Corporate", "Gestão Completo", 5, 5, {})
+def test_platform_limits(pricing):
+    result = pricing.calculate_plan("Corporate", "Gestão Completo", 5, 5, {})
     assert result["plano_final"] == 3
 
 
-def test_platform_limit_exceeded(common):
-    result = common.calculate_plan("Corporate", "Gestão Completo", 6, 5, {})
+def test_platform_limit_exceeded(pricing):
+    result = pricing.calculate_plan("Corporate", "Gestão Completo", 6, 5, {})
     assert result["plano_final"] == 4
 
 
-def test_additional_user_pricing(common):
-    result = common.calculate_plan("Advanced", None, 5, 3, {})
+def test_additional_user_pricing(pricing):
+    result = pricing.calculate_plan("Advanced", None, 5, 3, {})
     plan = read_plan_row(4)
     included = int(plan["utilizadores_incluidos"])
     extra_price = float(plan["preco_extra_ate_10"])
@@ -77,8 +55,8 @@ def test_additional_user_pricing(common):
     assert result["custo_extra_utilizadores"] == expected_cost
 
 
-def test_module_costs(common):
-    result = common.calculate_plan("Enterprise", None, 5, 0, {"CRM": 3})
+def test_module_costs(pricing):
+    result = pricing.calculate_plan("Enterprise", None, 5, 0, {"CRM": 3})
     plan = read_plan_row(6)
     module = read_module_row("CRM", 6)
     base = float(module["preco_base"])
@@ -96,8 +74,8 @@ def test_module_costs(common):
     assert result["custo_estimado"] == expected_total
 
 
-def test_web_module_allocation(common):
-    result = common.calculate_plan(
+def test_web_module_allocation(pricing):
+    result = pricing.calculate_plan(
         "Enterprise",
         None,
         5,
@@ -115,8 +93,8 @@ def test_web_module_allocation(common):
     )
 
 
-def test_web_only_module(common):
-    result = common.calculate_plan(
+def test_web_only_module(pricing):
+    result = pricing.calculate_plan(
         "Enterprise",
         None,
         5,
@@ -134,13 +112,13 @@ def test_web_only_module(common):
     )
 
 
-def test_zero_cost_module_included(common):
-    result = common.calculate_plan("Enterprise", None, 1, 0, {"Logística": 1})
+def test_zero_cost_module_included(pricing):
+    result = pricing.calculate_plan("Enterprise", None, 1, 0, {"Logística": 1})
     assert result["modulos_detalhe"]["Logística"] == (0, 0, 0, 0, 0)
 
 
-def test_pos_plan_limit(common):
-    result = common.calculate_plan(
+def test_pos_plan_limit(pricing):
+    result = pricing.calculate_plan(
         "Corporate",
         "Gestão Completo",
         1,
@@ -151,8 +129,8 @@ def test_pos_plan_limit(common):
     assert result["plano_final"] == 4
 
 
-def test_pos_restauracao_counts_separate(common):
-    result = common.calculate_plan(
+def test_pos_restauracao_counts_separate(pricing):
+    result = pricing.calculate_plan(
         "Enterprise",
         None,
         1,
@@ -174,3 +152,320 @@ def test_pos_restauracao_counts_separate(common):
     assert num_primeiros == 2
     assert ate_10 == 2
     assert acima_10 == 0
+
+
+def test_pos_chain_aggregated_and_per_store_lines(pricing):
+    pos_counts = [1, 12, 3] * 700
+    result = pricing.calculate_plan(
+        "Corporate",
+        None,
+        1,
+        0,
+        {"Ponto de Venda (POS/Restauração)": 12},
+        pos_counts=pos_counts,
+    )
+    pos = result["pos_breakdown"]
+    assert (pos.num_primeiros, pos.ate_10, pos.acima_10) == (2100, 700 * (9 + 2), 700 * 2)
+    assert [(linha.escalao, linha.quantidade) for linha in result.linhas_pos] == [
+        (0, 2100),
+        (1, 7700),
+        (2, 1400),
+    ]
+    assert [linha.descricao for linha in result.linhas_pos] == [
+        "1º Ponto de Venda (POS/Restauração)",
+        "Ponto de Venda (POS/Restauração) - (7700 Postos Adicionais - Escalão de 2 a 10)",
+        "Ponto de Venda (POS/Restauração) - (1400 Postos Adicionais - Escalão de 11 a 50)",
+    ]
+    detalhe = result["modulos_detalhe"]["Ponto de Venda (POS/Restauração)"]
+    assert sum(linha.custo for linha in result.linhas_pos) == detalhe[0] + detalhe[1]
+
+    assert len(pos) == 6
+    assert len(result.to_dict()["pos_breakdown"]) == 6
+    lojas = pos.por_loja(pos_counts)
+    assert next(lojas)[:4] == (1, 1, 0, 0)
+    assert next(lojas)[:4] == (2, 12, 9, 2)
+    assert sum(linha.custo for linha in pos.por_loja(pos_counts)) == sum(linha.custo for linha in result.linhas_pos)
+
+
+def read_rows(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f, delimiter=","))
+
+
+def test_custom_price_book(pricing):
+    from phc_pricebook import PriceBook
+
+    planos = read_rows("precos_planos.csv")
+    for row in planos:
+        if row["plano_id"] == "6":
+            row["preco_base"] = "5000"
+    book = PriceBook.from_rows(planos, read_rows("precos_produtos.csv"))
+    result = pricing.calculate_plan("Enterprise", None, 1, 0, {}, price_book=book)
+    assert result["preco_base"] == 5000
+    assert result["custo_estimado"] == 5000
+
+
+def test_price_book_user_breakpoints(pricing):
+    from phc_pricebook import PriceBook
+
+    book = PriceBook.from_rows(read_rows("precos_planos.csv"), read_rows("precos_produtos.csv"))
+    assert book.plano_por_utilizadores(0, 0) == 1
+    assert book.plano_por_utilizadores(3, 5) == 3
+    assert book.plano_por_utilizadores(11, 0) == 5
+    assert book.plano_por_utilizadores(51, 0) == 6
+
+
+def test_all_plans_cost_vector(pricing):
+    import phc_logic
+
+    selecoes = {"CRM": 4, "Vencimento": 3, "Ponto de Venda (POS/Restauração)": 3}
+    web = {"CRM": 2}
+    result = phc_logic.calculate_all_plans("Corporate", "Gestão Completo", 4, 2, selecoes, web)
+    assert list(result["planos"]) == [1, 2, 3, 4, 5, 6]
+    assert result["plano_final"] == 3
+    assert list(result["valido"]) == [False, False, True, True, True, True]
+    for idx, pid in enumerate(result["planos"]):
+        if not result["valido"][idx]:
+            continue
+        forced = pricing.calculate_plan(
+            "Corporate",
+            "Gestão Completo",
+            4,
+            2,
+            selecoes,
+            web,
+            extras_importados={"forced"},
+            extras_planos={"forced": int(pid)},
+        )
+        assert forced["plano_final"] == pid
+        assert result["custo_estimado"][idx] == forced["custo_estimado"]
+
+
+def test_plan_cache_counters_and_readonly(pricing):
+    from phc_cache import PlanCache
+
+    cache = PlanCache(maxsize=2)
+    first = cache.calculate_plan("Enterprise", None, 5, 0, {"CRM": 3})
+    again = cache.calculate_plan("Enterprise", None, 5, 0, {"CRM": 3}, web_selecoes={"Frota": 2})
+    assert again is first
+    expected = pricing.calculate_plan("Enterprise", None, 5, 0, {"CRM": 3})
+    assert first["custo_estimado"] == expected["custo_estimado"]
+    assert first["modulos_detalhe"] == expected["modulos_detalhe"]
+    with pytest.raises(TypeError):
+        first["custo_estimado"] = 0
+
+    cache.calculate_plan("Advanced", None, 1, 0, {})
+    cache.calculate_plan("Corporate", None, 1, 0, {})
+    info = cache.cache_info()
+    assert (info.hits, info.misses, info.evictions, info.currsize) == (1, 3, 1, 2)
+
+
+def test_plan_cache_keyed_by_price_book(pricing):
+    from phc_cache import PlanCache
+    from phc_pricebook import PriceBook
+
+    cache = PlanCache()
+    default = cache.calculate_plan("Enterprise", None, 1, 0, {})
+    planos = read_rows("precos_planos.csv")
+    for row in planos:
+        row["preco_base"] = "1"
+    book = PriceBook.from_rows(planos, read_rows("precos_produtos.csv"))
+    result = cache.calculate_plan("Enterprise", None, 1, 0, {}, price_book=book)
+    assert result["preco_base"] == 1
+    # Switching between books keeps both entries
+    assert cache.calculate_plan("Enterprise", None, 1, 0, {}) is default
+    assert cache.calculate_plan("Enterprise", None, 1, 0, {}, price_book=book) is result
+    assert cache.calculate_plan("Enterprise", None, 1, 0, {}, None, None, None, None, book) is result
+    info = cache.cache_info()
+    assert (info.hits, info.misses, info.invalidations) == (3, 2, 0)
+
+
+def test_plan_cache_invalidated_by_new_active_book(pricing, monkeypatch):
+    import phc_cache
+    from phc_pricebook import PriceBook
+
+    cache = phc_cache.PlanCache()
+    cache.calculate_plan("Enterprise", None, 1, 0, {})
+    planos = read_rows("precos_planos.csv")
+    for row in planos:
+        row["preco_base"] = "1"
+    book = PriceBook.from_rows(planos, read_rows("precos_produtos.csv"), versao="nova")
+    monkeypatch.setattr(phc_cache, "default_price_book", lambda: book)
+    result = cache.calculate_plan("Enterprise", None, 1, 0, {})
+    assert result["preco_base"] == 1
+    info = cache.cache_info()
+    assert (info.invalidations, info.currsize) == (1, 1)
+
+
+def test_module_registry(pricing):
+    modulos = pricing.MODULOS
+    assert [info.id for info in modulos.values()] == list(range(len(modulos)))
+    assert set(modulos) == {m for area in pricing.produtos.values() for m in area}
+    assert {m for m, info in modulos.items() if info.web} == pricing.WEB_MODULES
+    assert {m for m, info in modulos.items() if info.web_only} == pricing.WEB_ONLY_MODULES
+    assert modulos["OKR"].plano == 4
+    assert modulos["OKR"].area == "Recursos Humanos"
+
+
+def test_quote_session_matches_calculate_plan(pricing):
+    from phc_session import QuoteSession
+
+    pos = "Ponto de Venda (POS/Restauração)"
+    session = QuoteSession("Corporate", "Gestão Terceiros", 2, 1)
+    assert session.plano_final == 2
+
+    session.set_module("CRM", 4, web=2)
+    session.set_module(pos, 3, pos_counts=[2, 1])
+    session.set_module("Vencimento", 3)
+    session.set_users(12, 3)
+    selecoes = {"CRM": 4, pos: 3, "Vencimento": 3}
+    expected = pricing.calculate_plan(
+        "Corporate", "Gestão Terceiros", 12, 3, selecoes, {"CRM": 2}, pos_counts=[2, 1]
+    )
+    assert session.result() == expected
+    assert session.pisos["utilizadores"] == 5
+
+    session.remove_module(pos)
+    session.set_users(2, 1)
+    expected = pricing.calculate_plan("Corporate", "Gestão Terceiros", 2, 1, {"CRM": 4, "Vencimento": 3}, {"CRM": 2})
+    assert session.result() == expected
+    assert session.plano_final == expected["plano_final"]
+
+
+def test_price_book_registry_hot_reload(pricing, tmp_path):
+    import os
+    import shutil
+    import time
+
+    from phc_pricebook import PriceBookRegistry
+
+    planos = tmp_path / "precos_planos.csv"
+    produtos = tmp_path / "precos_produtos.csv"
+    shutil.copy("precos_planos.csv", planos)
+    shutil.copy("precos_produtos.csv", produtos)
+    registry = PriceBookRegistry(planos, produtos, intervalo=0)
+
+    first = registry.current()
+    result = pricing.calculate_plan("Enterprise", None, 1, 0, {}, price_book=first)
+    assert result["versao_precos"] == first.versao != ""
+
+    os.utime(planos, ns=(time.time_ns(), time.time_ns() + 10**9))
+    assert registry.reload() is first
+
+    planos.write_text(planos.read_text(encoding="utf-8").replace("3999", "4999"), encoding="utf-8")
+    deadline = time.monotonic() + 5
+    book = registry.current()
+    while book is first and time.monotonic() < deadline:
+        time.sleep(0.01)
+        book = registry.current()
+    assert book.versao != first.versao
+    assert book.plano(6).preco_base == 4999
+    assert first.plano(6).preco_base == 3999
+    assert registry.get(first.versao) is first
+    assert registry.versoes == (first.versao, book.versao)
+
+
+def test_calculate_plan_versions(pricing):
+    import phc_logic
+    from phc_pricebook import PriceBook
+
+    atual = PriceBook.from_csv("precos_planos.csv", "precos_produtos.csv")
+    planos = read_rows("precos_planos.csv")
+    for row in planos:
+        row["preco_base"] = str(float(row["preco_base"]) * 2)
+    seguinte = PriceBook.from_rows(planos, read_rows("precos_produtos.csv"), versao="2027")
+
+    args = ("Advanced", None, 7, 2, {"CRM": 3, "Vencimento": 2}, {"CRM": 1})
+    results = phc_logic.calculate_plan_versions(*args, price_books={"2026": atual, "2027": seguinte})
+    assert list(results) == ["2026", "2027"]
+    for key, book in (("2026", atual), ("2027", seguinte)):
+        assert results[key] == pricing.calculate_plan(*args, price_book=book)
+    assert results["2027"]["preco_base"] == 2 * results["2026"]["preco_base"]
+    assert results["2026"]["versao_precos"] == atual.versao
+
+    by_version = phc_logic.calculate_plan_versions(*args, price_books=[atual, seguinte])
+    assert set(by_version) == {atual.versao, "2027"}
+
+
+def test_plan_result_lines_and_dict_view(pricing):
+    result = pricing.calculate_plan("Advanced", None, 5, 3, {"CRM": 6, "Frota": 1}, {"CRM": 2})
+    legacy = result.to_dict()
+    assert type(legacy) is dict
+    assert list(legacy) == list(result)
+    assert legacy["modulos_detalhe"] == result["modulos_detalhe"]
+    assert not hasattr(result, "__dict__")
+
+    crm = result.linhas_modulos[0]
+    assert crm.modulo == "CRM"
+    assert (crm.utilizadores_desktop, crm.utilizadores_web) == (3, 1)
+    assert crm.custo_desktop == 3 * crm.preco_unidade_desktop
+    assert sum(linha.custo_total for linha in result.linhas_modulos) == result.custo_modulos
+    assert sum(linha.custo for linha in result.linhas_utilizadores) == result.custo_extra_utilizadores
+    with pytest.raises(AttributeError):
+        result.custo_modulos = 0
+
+
+def test_plan_floor_rules_record_binding_rule(pricing):
+    import phc_logic
+
+    pos = "Ponto de Venda (POS/Restauração)"
+    result = pricing.calculate_plan("Corporate", "Gestão Terceiros", 2, 0, {"CRM": 1, pos: 7})
+    assert result["plano_final"] == 4
+    assert result.piso_determinante == phc_logic.PisoPlano("pos", 4, 7)
+    regras = {piso.regra: piso.plano for piso in result.pisos}
+    assert regras["plano_atual"] == 1
+    assert regras["tipo_gestao"] == 2
+    assert regras["utilizadores"] == 1
+
+    floors = phc_logic.plan_floors("Advanced", None, 60, 0, {}, {"genai"}, {"genai": 2})
+    assert phc_logic.piso_determinante(floors) == phc_logic.PisoPlano("utilizadores", 6, 60)
+    assert phc_logic.PisoPlano("extra", 2, "genai") in floors
+    assert [phc_logic._piso_pos(q) for q in (1, 2, 3, 5, 6, 10, 11, 50, 51)] == [1, 2, 3, 3, 4, 4, 5, 5, 6]
+
+
+def test_dependency_graph_bitmasks(pricing):
+    import phc_logic
+
+    grafo = phc_logic.DependencyGraph.compile(
+        (
+            ("A", "B", "A requer B"),
+            ("B", "C", "B requer C"),
+            ("D", "C", "D requer C"),
+        ),
+        modulos={},
+    )
+    assert grafo.fecho[grafo.bits["A"]] == grafo.mascara({"B", "C"})
+    assert grafo.avisos(grafo.mascara({"A"})) == ["A requer B"]
+    assert grafo.resolver({"A"}) == ["B", "C"]
+    assert grafo.resolver({"A", "B", "C"}) == []
+    mascaras = grafo.mascaras([{"A"}, {"D", "C"}, {"B", "D"}])
+    assert grafo.avisos_lote(mascaras) == [["A requer B"], [], ["B requer C", "D requer C"]]
+
+    assert pricing.calculate_plan("Corporate", None, 1, 0, {"SHST": 1, "Ocupação": 1})["warnings"] == [
+        "O módulo SHST requer Vencimento",
+        "O módulo Ocupação faz parte do Inventário Avançado",
+    ]
+    assert phc_logic.resolve_dependencies({"Colaborador": 2, "SHST": 1}) == ["Vencimento"]
+
+
+def test_bank_pack_table_finds_cheapest_mix(pricing):
+    import phc_logic
+
+    resultado = pricing.calculate_plan("Corporate", None, 1, 0, {"Bank Connector": 25})
+    assert resultado["bank_packs"] == (1, 2)
+    assert resultado["bancos_total"] == resultado["bancos_base"] + 25
+    assert resultado["custo_bancos"] == 200 + 2 * 380
+
+    assert phc_logic.solve_bank_packs(0) == ((0, 0), 0, 0)
+    assert phc_logic.solve_bank_packs(2) == ((1, 0), 5, 20000)
+    assert phc_logic.solve_bank_packs(2).custo == 200
+
+    # Greedy on the largest pack (3 × 10 for 21 banks) is not the cheapest.
+    tabela = phc_logic.BankPackTable.compile({5: 200, 10: 380, 25: 900}, maximo=100)
+    assert tabela.resolver(21) == ((0, 0, 1), 25, 90000)
+    assert tabela.resolver(34) == ((0, 1, 1), 35, 128000)
+    assert tabela.resolver(1000) == ((0, 0, 40), 1000, 3600000)
+    packs, bancos, centimos = tabela.resolver_lote([21, 34, 1000])
+    assert packs.tolist() == [[0, 0, 1], [0, 1, 1], [0, 0, 40]]
+    assert bancos.tolist() == [25, 35, 1000] and centimos.tolist() == [90000, 128000, 3600000]
+    assert centimos.dtype == "int64"
@@ -0,0 +1,47 @@
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Seconds allowed for ``import phc_logic`` plus the first quote in a fresh
+# interpreter; numpy accounts for most of it, pandas alone would exceed it.
+COLD_IMPORT_BUDGET = 0.35
+
+SCRIPT = """
+import sys, time
+inicio = time.perf_counter()
+import phc_logic
+phc_logic.calculate_plan("Corporate", None, 3, 0, {"CRM": 2})
+print(time.perf_counter() - inicio)
+print(",".join(m for m in ("pandas", "streamlit") if m in sys.modules))
+"""
+
+
+def cold_import():
+    saida = subprocess.run(
+        [sys.executable, "-c", SCRIPT], cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout.splitlines()
+    return float(saida[0]), saida[1]
+
+
+def test_pricing_core_does_not_import_pandas():
+    _, carregados = cold_import()
+    assert carregados == ""
+
+
+def test_pricing_api_does_not_import_streamlit():
+    saida = subprocess.run(
+        [sys.executable, "-c", "import sys, pricing; print('streamlit' in sys.modules)"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    assert saida.strip() == "False"
+
+
+def test_cold_import_budget():
+    # Best of three runs to keep a busy machine from failing the budget.
+    duracao = min(cold_import()[0] for _ in range(3))
+    assert duracao < COLD_IMPORT_BUDGET, f"import phc_logic took {duracao:.3f}s"
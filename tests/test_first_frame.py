@@ -0,0 +1,33 @@
+import pytest
+
+pytest.importorskip("streamlit.testing.v1")
+
+import import_profile
+from lazy import LazyModule, lazy_import
+
+
+@pytest.mark.parametrize("entrada", sorted(import_profile.FIRST_FRAME_BUDGETS))
+def test_first_frame_within_budget(entrada):
+    frame = import_profile.profile_first_frame(entrada)
+    assert frame.excecoes == ()
+    assert frame.carregados == (), f"{entrada} imports {frame.carregados} before its first frame"
+    orcamento = import_profile.FIRST_FRAME_BUDGETS[entrada]
+    assert frame.segundos < orcamento, f"{entrada} took {frame.segundos:.3f}s"
+
+
+def test_lazy_import_defers_until_first_use():
+    modulo = lazy_import("colorsys")
+    assert isinstance(modulo, LazyModule) and not modulo.carregado
+    assert modulo.rgb_to_hsv(1, 0, 0) == (0.0, 1.0, 1)
+    assert modulo.carregado
+    assert lazy_import("modulo_que_nao_existe") is None
+
+
+def test_parse_importtime_keeps_top_level_imports():
+    texto = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |   pandas._config\n"
+        "import time:       300 |       5000 | pandas\n"
+        "import time:        40 |         40 | lazy\n"
+    )
+    assert import_profile.parse_importtime(texto) == (("pandas", 5000), ("lazy", 40))
@@ -1,39 +1,15 @@
-import types
-import importlib
-import sys
-import csv
-
 import pytest
 
 
-class DummyPandas(types.SimpleNamespace):
-    class DataFrame(list):
-        def iterrows(self):
-            for idx, row in enumerate(self):
-                yield idx, row
-
-    def read_csv(self, path, sep=","):
-        with open(path, newline="", encoding="utf-8") as f:
-            reader = csv.DictReader(f, delimiter=sep)
-            return self.DataFrame([row for row in reader])
+@pytest.fixture()
+def pricing():
+    import pricing
 
-    def notna(self, value):
-        return value is not None and str(value).strip() != ""
+    return pricing
 
 
-@pytest.fixture()
-def common(monkeypatch):
-    pd_stub = DummyPandas()
-    st_stub = types.SimpleNamespace(markdown=lambda *args, **kwargs: None)
-    monkeypatch.setitem(sys.modules, "pandas", pd_stub)
-    monkeypatch.setitem(sys.modules, "streamlit", st_stub)
-    import common as cm
-    importlib.reload(cm)
-    return cm
-
-
-def test_primavera_onprem_reaches_premium_for_finance_modules(common):
-    result = common.calculate_primavera_plan(
+def test_primavera_onprem_reaches_premium_for_finance_modules(pricing):
+    result = pricing.calculate_primavera_plan(
         subscription_type="OnPrem",
         users=4,
         companies=2,
@@ -42,8 +18,8 @@ def test_primavera_onprem_reaches_premium_for_finance_modules(common):
     assert result["plan_name"] == "Premium"
 
 
-def test_primavera_cloud_blocks_unavailable_modules(common):
-    result = common.calculate_primavera_plan(
+def test_primavera_cloud_blocks_unavailable_modules(pricing):
+    result = pricing.calculate_primavera_plan(
         subscription_type="Cloud",
         users=4,
         companies=2,
@@ -52,8 +28,8 @@ def test_primavera_cloud_blocks_unavailable_modules(common):
     assert "API" in result["blocked_modules"]
 
 
-def test_primavera_ultimate_required_for_high_module_users(common):
-    result = common.calculate_primavera_plan(
+def test_primavera_ultimate_required_for_high_module_users(pricing):
+    result = pricing.calculate_primavera_plan(
         subscription_type="OnPrem",
         users=12,
         companies=3,
@@ -62,8 +38,8 @@ def test_primavera_ultimate_required_for_high_module_users(common):
     assert result["plan_name"] == "Ultimate"
 
 
-def test_primavera_core_modules_keep_essentials_when_only_sales_and_receivables(common):
-    result = common.calculate_primavera_plan(
+def test_primavera_core_modules_keep_essentials_when_only_sales_and_receivables(pricing):
+    result = pricing.calculate_primavera_plan(
         subscription_type="OnPrem",
         users=1,
         companies=1,
@@ -73,8 +49,8 @@ def test_primavera_core_modules_keep_essentials_when_only_sales_and_receivables(
     assert result["plan_name"] == "Essentials"
 
 
-def test_primavera_core_modules_upgrade_to_plus_when_buying_is_selected(common):
-    result = common.calculate_primavera_plan(
+def test_primavera_core_modules_upgrade_to_plus_when_buying_is_selected(pricing):
+    result = pricing.calculate_primavera_plan(
         subscription_type="OnPrem",
         users=2,
         companies=2,
@@ -82,3 +58,83 @@ def test_primavera_core_modules_upgrade_to_plus_when_buying_is_selected(common):
         selected_core_modules=["Vendas", "Contas Correntes", "Compras"],
     )
     assert result["plan_name"] == "Plus"
+
+
+def test_primavera_addon_tables_batch_matches_single_plan():
+    import random
+
+    import numpy as np
+
+    import primavera_logic
+
+    rng = random.Random(3)
+    for deployment, subscription in (("on_premises", "OnPrem"), ("cloud", "Cloud")):
+        table = primavera_logic.ADDON_TABLES[deployment]
+        clientes = [
+            {m: rng.randint(0, 12) for m in rng.sample(table.modules, rng.randint(0, 5))} for _ in range(50)
+        ]
+        users = np.zeros((len(clientes), table.unknown_id + 1), dtype=np.int64)
+        selected = np.zeros_like(users, dtype=bool)
+        for row, modulos in enumerate(clientes):
+            for modulo, qtd in modulos.items():
+                users[row, table.ids[modulo]] = qtd
+                selected[row, table.ids[modulo]] = True
+
+        ranks = table.required_rank_batch(users, selected)
+        blocked = table.blocked_batch(selected)
+        for row, modulos in enumerate(clientes):
+            result = primavera_logic.calculate_primavera_plan(subscription, 1, 1, modulos)
+            assert {table.modules[i] for i in range(table.unknown_id) if blocked[row] >> i & 1} == set(
+                result["blocked_modules"]
+            )
+            assert result["plan_id"] == ranks[row]
+
+
+def test_primavera_availability_masks():
+    import primavera_logic
+
+    onprem = primavera_logic.ADDON_TABLES["on_premises"]
+    cloud = primavera_logic.ADDON_TABLES["cloud"]
+    mask = onprem.mask(["API", "Multi-P&T Manager"])
+    assert onprem.lowest_rank_offering(mask) == primavera_logic.PLAN_RANK["Advanced"]
+    assert onprem.lowest_rank_offering(onprem.mask(["Módulo novo"])) == primavera_logic.PLAN_RANK["Ultimate"]
+    assert cloud.blocked(cloud.mask(["API", "Web API"])) == 1 << cloud.ids["API"]
+    assert cloud.lowest_rank_offering(cloud.mask(["Web API"])) == primavera_logic.PLAN_RANK["Plus"]
+
+
+def test_primavera_cheapest_plan_beats_recommendation(pricing):
+    recommended = pricing.calculate_primavera_plan("Cloud", 2, 2, {})
+    cheapest = pricing.cheapest_primavera_plan("Cloud", 2, 2, {})
+    assert recommended["plan_name"] == cheapest["minimum_plan"] == "Standard"
+    assert cheapest["plan_name"] == "Plus"
+    assert cheapest["ranking"][:2] == [(3, "Plus", 68.0), (2, "Standard", recommended["total_price"])]
+    assert cheapest["savings"] == recommended["total_price"] - 68.0 > 0
+    assert cheapest["result"]["plan_name"] == "Plus"
+    assert cheapest["result"]["total_price"] == cheapest["total_price"] == 68.0
+    assert cheapest["result"].keys() == recommended.keys()
+
+
+def test_primavera_cheapest_plan_pruning_matches_exhaustive_search(pricing):
+    args = ("OnPrem", 3, 3, {"Multi-país": 1, "API": 1}, ["Vendas"])
+    pruned = pricing.cheapest_primavera_plan(*args)
+    exhaustive = pricing.cheapest_primavera_plan(*args, exhaustive=True)
+    assert pruned["result"] == exhaustive["result"]
+    assert pruned["pruned"] and not exhaustive["pruned"]
+    totals = {name: total for _, name, total in exhaustive["ranking"]}
+    assert {name for _, name, _ in pruned["ranking"]} | {name for _, name, _ in pruned["pruned"]} == set(totals)
+    for _, name, bound in pruned["pruned"]:
+        assert pruned["total_price"] <= bound <= totals[name]
+
+
+def test_primavera_cheapest_plan_skips_plans_without_addon_price(pricing, monkeypatch):
+    import primavera_logic
+
+    # Without an Advanced price, Webhooks would count as 0 there and win.
+    monkeypatch.setitem(primavera_logic.ONPREM_OPTIONAL_PRICES, "Webhooks", {"Premium": 135, "Ultimate": 135})
+    for exhaustive in (False, True):
+        cheapest = pricing.cheapest_primavera_plan("OnPrem", 4, 2, {"Webhooks": 1}, exhaustive=exhaustive)
+        assert cheapest["minimum_plan"] == "Advanced"
+        assert cheapest["unpriced"] == [(4, "Advanced")]
+        assert cheapest["plan_name"] == "Premium"
+        assert cheapest["ranking"][-1][1] == "Advanced"
+        assert cheapest["ranking"][-1][2] < cheapest["total_price"]
@@ -0,0 +1,74 @@
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+
+import phc_snapshot
+from phc_pricebook import PRECOS_PLANOS_CSV, PRECOS_PRODUTOS_CSV, PriceBookRegistry, _compilar
+
+ROOT = Path(__file__).resolve().parents[1]
+FONTES = ("precos_planos.csv", "precos_produtos.csv", "Precos2024.csv", "Precos2025.csv")
+
+
+@pytest.fixture
+def pasta(tmp_path):
+    for nome in FONTES:
+        shutil.copy2(ROOT / nome, tmp_path / nome)
+    return tmp_path
+
+
+def registry(pasta):
+    return PriceBookRegistry(
+        pasta / PRECOS_PLANOS_CSV.name, pasta / PRECOS_PRODUTOS_CSV.name, snapshot=pasta / "precos.snapshot"
+    )
+
+
+def test_snapshot_price_book_matches_csv(pasta):
+    destino = phc_snapshot.build_snapshot(pasta / "precos.snapshot")
+    esperado = _compilar([(pasta / "precos_planos.csv").read_bytes(), (pasta / "precos_produtos.csv").read_bytes()])
+
+    book = phc_snapshot.open_snapshot(destino).price_book()
+    assert book.versao == esperado.versao
+    assert book.planos == esperado.planos
+    assert dict(book.produtos) == dict(esperado.produtos)
+    assert book.limites == esperado.limites
+    carregador = registry(pasta)
+    assert carregador._do_snapshot(carregador._ler_assinaturas()) is not None
+    assert carregador.reload().versao == esperado.versao
+
+
+def test_snapshot_catalogs_match_csv(pasta):
+    destino = phc_snapshot.build_snapshot(pasta / "precos.snapshot")
+    for nome in phc_snapshot.CATALOGOS:
+        catalogo = phc_snapshot.reference_prices(nome, destino)
+        assert isinstance(catalogo.refs, phc_snapshot.TabelaTexto)
+        esperado = phc_snapshot._ler_catalogo((pasta / f"{nome}.csv").read_bytes())
+        assert len(catalogo) == len(esperado)
+        assert {ref: catalogo.centimos_de(ref) for ref in catalogo} == esperado
+    assert catalogo.get("referência inexistente", 0) == 0
+    assert phc_snapshot.parse_preco_centimos("1.136,50 €") == 113650
+
+
+def test_stale_or_missing_snapshot_falls_back_to_csv(pasta):
+    destino = phc_snapshot.build_snapshot(pasta / "precos.snapshot")
+    planos = pasta / "precos_planos.csv"
+    original = registry(pasta).reload().versao
+
+    planos.write_bytes(planos.read_bytes().replace(b"Essentials", b"Essencial", 1))
+    os.utime(planos, ns=(0, 0))
+    book = registry(pasta).reload()
+    assert book.versao != original
+    assert "Essencial" in {p.nome for p in book.planos.values()}
+
+    destino.unlink()
+    assert phc_snapshot.open_snapshot(destino) is None
+    assert registry(pasta).reload().versao == book.versao
+    assert len(phc_snapshot.reference_prices("Precos2024", destino)) > 0
+
+
+def test_corrupt_snapshot_is_ignored(pasta):
+    destino = pasta / "precos.snapshot"
+    destino.write_bytes(b"not a snapshot")
+    assert phc_snapshot.open_snapshot(destino) is None
+    assert registry(pasta).reload().planos
@@ -0,0 +1,27 @@
+from functools import lru_cache
+from pathlib import Path
+
+import streamlit as st
+
+_BASE_DIR = Path(__file__).resolve().parent
+
+
+@lru_cache(maxsize=None)
+def _load_style(dark: bool) -> str:
+    style_file = "style_dark.css" if dark else "style.css"
+    return (_BASE_DIR / style_file).read_text(encoding="utf-8")
+
+
+IMAGES_DIR = _BASE_DIR / "images"
+LOGO_LIGHT_PATH = IMAGES_DIR / "PHC Evolution.svg"
+LOGO_DARK_PATH = IMAGES_DIR / "PHC Evolution_white.svg"
+
+
+def setup_page(dark: bool = False) -> None:
+    """Apply common Streamlit styling and logo."""
+    style = _load_style(dark)
+    logo_path = LOGO_DARK_PATH if dark else LOGO_LIGHT_PATH
+    st.markdown(style, unsafe_allow_html=True)
+    with open(logo_path, encoding="utf-8") as f:
+        logo_svg = f.read()
+    st.markdown(f'<div class="logo-container">{logo_svg}</div>', unsafe_allow_html=True)